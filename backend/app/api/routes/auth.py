@@ -1,18 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, Any
-from jose import JWTError, jwt
+from typing import Dict, Any, Optional
+from jose import JWTError
 import logging
 import os
 import uuid
 from sqlalchemy import select
-from app.utils.security import get_password_hash, create_access_token
+from app.utils.security import PasswordHasherBusyError, create_access_token, password_hasher
+from app.config import ADMIN_EMAILS
 
-from app.db.database import get_db
+from app.db.database import get_db, session_scope
 from app.models.user import UserCreate, User, Token, TokenData, DBUser
 from app.services.auth_service import AuthService
+from app.services.principal_cache import principal_cache
 from app.db.repositories.user_repository import UserRepository
 
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -42,7 +44,7 @@ async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
             )
 
         user_id = str(uuid.uuid4())
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
 
         new_user = DBUser(
             id=user_id,
@@ -68,6 +70,12 @@ async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
             }
         }
 
+    except PasswordHasherBusyError as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": str(e)},
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         logger.error(f"Signup error: {str(e)}")
         await db.rollback()  # ✅ Now db is an AsyncSession
@@ -106,6 +114,12 @@ async def login(
             }
         }
         
+    except PasswordHasherBusyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         raise HTTPException(
@@ -123,28 +137,60 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub") 
-        if email is None:
-            raise credentials_exception
-            
-        token_data = TokenData(email=email)
-        
-    except JWTError:
+
+    # Cached per token and user: hot requests skip the signature check and the users lookup
+    user = await AuthService(UserRepository(db)).verify_token(token)
+    if user is None:
         raise credentials_exception
-        
+    return user
+
+def is_admin(user: DBUser) -> bool:
+    return user.email.lower() in ADMIN_EMAILS
+
+async def get_admin_user(current_user: DBUser = Depends(get_current_user)) -> DBUser:
+
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+async def get_websocket_user(websocket: WebSocket) -> Optional[DBUser]:
+    """
+    User authenticated by a socket's ?token= query parameter (browsers
+    cannot set headers on a WebSocket) or Authorization header, checked
+    before the socket is accepted. None when no token is sent; an invalid
+    token refuses the connection.
+    """
+    token = websocket.query_params.get("token")
+    authorization = websocket.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[len("bearer "):].strip()
+    if not token:
+        return None
+
+    async with session_scope() as db:
+        user = await AuthService(UserRepository(db)).verify_token(token)
+    if user is None:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+    return user
+
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+   
     try:
-        user_repository = UserRepository(db)
-        user = await user_repository.get_user_by_email(token_data.email)
-        if user is None:
-            raise credentials_exception
-        return user
-        
-    except Exception as e:
-        logger.error(f"Error getting user: {str(e)}")
-        raise credentials_exception
+        claims = principal_cache.decode(token, SECRET_KEY, ALGORITHM)
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # Tokens issued without a jti cannot be revoked; they stay valid until they expire
+    expires_at = principal_cache.revoke(claims)
+    if expires_at is None:
+        return {"revoked": False}
+    # Persisted so other workers, and this one after a restart, deny it too
+    await UserRepository(db).revoke_token(claims["jti"], expires_at)
+    return {"revoked": True}
 
 @router.get("/me", response_model=Dict[str, Any]) 
 async def get_current_user_info(current_user: DBUser = Depends(get_current_user)):
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import logging
+import time
+
+from app.api.routes.auth import get_current_user
+from app.config import HISTORY_PAGE_DEFAULT_LIMIT, HISTORY_PAGE_MAX_LIMIT
+from app.db.database import get_db
+from app.db.repositories.search_repository import SearchRepository, SearchUnavailableError
+from app.models.search import SearchResults
+from app.models.user import DBUser
+from app.utils.metrics import metrics
+from app.utils.pagination import decode_rank_cursor, encode_rank_cursor
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+
+@router.get("", response_model=SearchResults)
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(default=HISTORY_PAGE_DEFAULT_LIMIT, ge=1, le=HISTORY_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        after = decode_rank_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    start = time.perf_counter()
+    try:
+        hits = await SearchRepository(db).search_messages(current_user.id, q, limit, after)
+    except SearchUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    metrics.increment("search.queries")
+    metrics.observe("search.query_ms", (time.perf_counter() - start) * 1000)
+
+    next_cursor = None
+    if len(hits) == limit:
+        next_cursor = encode_rank_cursor(hits[-1].rank, hits[-1].message_id)
+    return SearchResults(query=q, items=hits, next_cursor=next_cursor)
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import Optional
+import logging
+
+from app.api.routes.auth import get_admin_user, get_current_user, is_admin
+from app.db.database import get_db
+from app.db.repositories.chat_repository import ChatRepository
+from app.db.repositories.usage_repository import UsageRepository
+from app.models.usage import UsageReport
+from app.models.user import DBUser
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/usage", tags=["usage"])
+
+
+async def _report(db: AsyncSession, group_by: tuple, **filters) -> UsageReport:
+    # Reads what has been flushed; usage recorded since the last flush shows up after the next one
+    usage_repository = UsageRepository(db)
+    rows = await usage_repository.get_usage(group_by, **filters)
+    return UsageReport(totals=usage_repository.totals(rows), rows=rows)
+
+
+@router.get("/users/{user_id}", response_model=UsageReport)
+async def get_user_usage(
+    user_id: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if user_id != current_user.id and not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Not allowed to read this user's usage")
+    return await _report(db, ("day", "model"), user_id=user_id, start=start, end=end)
+
+
+@router.get("/sessions/{session_id}", response_model=UsageReport)
+async def get_session_usage(
+    session_id: str,
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not is_admin(current_user):
+        session = await ChatRepository(db).get_session(session_id)
+        if session is None or session.user_id != current_user.id:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+    return await _report(db, ("day", "model"), session_id=session_id)
+
+
+@router.get("/daily", response_model=UsageReport)
+async def get_daily_usage(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    _: DBUser = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await _report(db, ("day",), start=start, end=end)
+
+
+@router.get("/top-users", response_model=UsageReport)
+async def get_top_users(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(default=20, ge=1, le=500),
+    _: DBUser = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await _report(db, ("user_id",), start=start, end=end, order_by_tokens=True, limit=limit)
@@ -0,0 +1,398 @@
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncContextManager, AsyncIterator, Callable, Dict, List, Optional
+import logging
+import uuid
+
+from fastapi import WebSocket
+
+from app.api.websockets.protocol import PROTOCOL_JSON, available_protocols, create_encoder
+from app.api.websockets.stream_pump import StreamPump, register_stream_stats, unregister_stream_stats
+from app.api.websockets.stream_registry import ResumableStream, stream_registry
+from app.config import WS_MAX_CONCURRENT_GENERATIONS
+from app.models.chat import ChatMessage
+from app.services.chat_service import ChatService
+from app.services.context_builder import ContextBuilder
+from app.services.groq_service import GroqService
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Generations whose socket went away; kept referenced until they finish.
+_detached_generations = set()
+
+
+class ChatConnection:
+    """
+    State for one /ws/chat socket.
+
+    The route's receive loop hands every incoming frame to handle_frame, which
+    returns immediately: each chat turn runs as its own task keyed by
+    request_id, so "cancel" frames and new turns are read while answers
+    stream.
+
+    Generations outlive the socket that started them. A client that
+    reconnects sends a "resume" frame with its session_id and the last
+    offset it saw, gets the missed text replayed, and then follows the live
+    stream.
+
+    Frames are encoded by the protocol negotiated at connect time, either
+    with a ?protocol= query parameter or a {"type": "hello"} frame.
+    Plain JSON stays the default, so existing clients are unaffected.
+
+    user_id is the user authenticated when the socket connected, or None
+    for an anonymous socket. It owns the messages and sessions written here;
+    sessions owned by someone else, or by no one when the socket is signed
+    in, can be neither appended to nor resumed.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        connection_id: str,
+        chat_service_scope: Callable[[], AsyncContextManager[ChatService]],
+        groq_service: GroqService,
+        context_builder: ContextBuilder,
+        max_generations: int = WS_MAX_CONCURRENT_GENERATIONS,
+        user_id: Optional[str] = None
+    ):
+        self.websocket = websocket
+        self.connection_id = connection_id
+        self.user_id = user_id
+        self.chat_service_scope = chat_service_scope
+        self.groq_service = groq_service
+        self.context_builder = context_builder
+        self.max_generations = max_generations
+        self.stream_stats = register_stream_stats()
+        self.generations: Dict[str, asyncio.Task] = {}
+        self.following: Dict[str, ResumableStream] = {}
+        self.encoder = create_encoder(PROTOCOL_JSON)
+        self._send_lock = asyncio.Lock()
+
+    async def accept(self):
+        await self.websocket.accept()
+
+        requested = self.websocket.query_params.get("protocol")
+        if requested:
+            self.encoder = create_encoder(requested)
+
+        extensions = self.websocket.headers.get("sec-websocket-extensions", "")
+        await self.websocket.send_json({
+            "type": "connection_established",
+            "session_id": self.connection_id,
+            "protocol": self.encoder.name,
+            "protocols": available_protocols(),
+            "deflate": "permessage-deflate" in extensions
+        })
+
+    async def send(self, payload: Dict[str, Any]):
+        async with self._send_lock:
+            for frame in self.encoder.encode(payload):
+                if isinstance(frame, bytes):
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+
+    async def handle_frame(self, data: Any):
+        if not isinstance(data, dict):
+            raise ValueError("Invalid message format")
+
+        if data.get("type") == "cancel":
+            await self.cancel(data.get("request_id"))
+            return
+
+        if data.get("type") == "hello":
+            # Acknowledged in plain JSON; later frames use the new encoding.
+            encoder = create_encoder(data.get("protocol"))
+            async with self._send_lock:
+                await self.websocket.send_json({"type": "protocol_ack", "protocol": encoder.name})
+                self.encoder = encoder
+            return
+
+        if data.get("type") == "resume":
+            await self.resume(data.get("session_id"), int(data.get("offset") or 0))
+            return
+
+        if 'message' not in data:
+            raise ValueError("No message content provided")
+
+        request_id = str(data.get("request_id") or uuid.uuid4())
+        session_id = data.get("session_id", self.connection_id)
+        # Rate limit queues are fair per user; anonymous sockets count as one user each.
+        # A user_id field in the frame is not trusted for either.
+        user_id = self.user_id or self.connection_id
+
+        if await self._check_capacity(request_id, session_id):
+            self._spawn(request_id, self._run_generation(request_id, session_id, data['message'], user_id, self.user_id))
+
+    async def _check_capacity(self, request_id: str, session_id: str) -> bool:
+        if request_id in self.generations:
+            raise ValueError(f"Request {request_id} is already running")
+
+        if len(self.generations) >= self.max_generations:
+            metrics.increment("ws.generations_rejected")
+            await self.send({
+                "type": "error",
+                "message": f"Too many concurrent generations (limit {self.max_generations})",
+                "session_id": session_id,
+                "request_id": request_id
+            })
+            return False
+        return True
+
+    def _spawn(self, request_id: str, coro):
+        task = asyncio.create_task(coro)
+        self.generations[request_id] = task
+
+        def _done(_):
+            self.generations.pop(request_id, None)
+            self.following.pop(request_id, None)
+
+        task.add_done_callback(_done)
+        return task
+
+    async def cancel(self, request_id: Optional[str] = None):
+        """Cancel one generation, or every generation on the socket when request_id is None."""
+        if request_id is None:
+            request_ids = list(self.generations)
+        else:
+            request_ids = [request_id] if request_id in self.generations else []
+
+        tasks = []
+        for rid in request_ids:
+            # A resumed stream is owned by the task of the socket that started
+            # it; cancelling that task also ends this socket's follower.
+            stream = self.following.get(rid)
+            task = stream.task if stream is not None and stream.task is not None else self.generations[rid]
+            task.cancel()
+            tasks.append(self.generations[rid])
+
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def resume(self, session_id: Optional[str], offset: int):
+        stream = stream_registry.get(session_id) if session_id else None
+        if stream is not None and stream.owner_id != self.user_id:
+            # Reported like a missing stream, so session ids cannot be probed
+            metrics.increment("ws.session_access_denied")
+            stream = None
+        if stream is None:
+            await self.send({"type": "resume_failed", "session_id": session_id, "reason": "not_found"})
+            return
+
+        request_id = stream.request_id
+        missed = stream.since(offset)
+        if missed is None:
+            metrics.increment("ws.resumes_expired")
+            await self.send({
+                "type": "resume_failed",
+                "session_id": session_id,
+                "request_id": request_id,
+                "reason": "expired"
+            })
+            return
+
+        if not await self._check_capacity(request_id, session_id):
+            return
+
+        # since() and subscribe() run without an await in between, so no
+        # token can slip between the replayed text and the live stream.
+        live = stream.subscribe()
+        metrics.increment("ws.resumes")
+        await self.send({
+            "type": "resumed",
+            "session_id": session_id,
+            "request_id": request_id,
+            "offset": offset
+        })
+        self.following[request_id] = stream
+        self._spawn(request_id, self._follow(stream, missed, live, offset))
+
+    async def close(self):
+        """Detach from the socket; generations started here keep running for resume."""
+        followers = [self.generations[rid] for rid in self.following if rid in self.generations]
+        for task in followers:
+            task.cancel()
+        for rid, task in self.generations.items():
+            if rid not in self.following:
+                _detached_generations.add(task)
+                task.add_done_callback(_detached_generations.discard)
+        if followers:
+            await asyncio.gather(*followers, return_exceptions=True)
+        unregister_stream_stats(self.stream_stats)
+
+    async def _load_history(self, session_id: str, limit: int) -> List[ChatMessage]:
+        async with self.chat_service_scope() as chat_service:
+            return await chat_service.get_recent_history(session_id, limit)
+
+    async def _check_session_owner(self, session_id: str):
+        async with self.chat_service_scope() as chat_service:
+            session = await chat_service.get_session(session_id)
+        # Sessions without an owner take writes from anonymous sockets only
+        if session is not None and session.user_id != self.user_id:
+            metrics.increment("ws.session_access_denied")
+            raise PermissionError("Chat session belongs to another user")
+
+    async def _save(self, message: ChatMessage):
+        # A session is checked out only for this write, so idle sockets hold
+        # no pooled connection.
+        async with self.chat_service_scope() as chat_service:
+            await chat_service.save_message(message)
+
+    async def _run_generation(
+        self,
+        request_id: str,
+        session_id: str,
+        content: str,
+        user_id: str,
+        owner_id: Optional[str] = None
+    ):
+        metrics.increment("ws.generations_started")
+        try:
+            await self._check_session_owner(session_id)
+            user_message = ChatMessage(
+                session_id=session_id,
+                user_id=owner_id,
+                content=content,
+                is_user=True,
+                created_at=datetime.utcnow()
+            )
+            await self._save(user_message)
+
+            await self.send({
+                "type": "message_received",
+                "session_id": session_id,
+                "request_id": request_id
+            })
+
+            history = await self.context_builder.build(session_id, user_message, self._load_history)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            await self._send_error(request_id, session_id, e)
+            return
+
+        stream = stream_registry.start(session_id, request_id, owner_id)
+        stream.task = asyncio.current_task()
+
+        pump = StreamPump(
+            self.groq_service.stream_completion(
+                content,
+                history=history,
+                user_id=user_id,
+                on_queued=self._queued_sender(request_id, session_id),
+                session_id=session_id
+            ),
+            self._token_sender(request_id, session_id, 0),
+            self.stream_stats,
+            on_drop=self._close_socket,
+            on_token=stream.append
+        )
+
+        status = "error"
+        try:
+            try:
+                full_response = await pump.run()
+                status = "completion"
+            except asyncio.CancelledError:
+                status = "cancelled"
+                full_response = pump.response_text
+                metrics.increment("ws.generations_cancelled")
+                logger.info(f"Generation {request_id} cancelled after {len(full_response)} chars")
+            except Exception as e:
+                await self._send_error(request_id, session_id, e)
+                return
+
+            try:
+                self.context_builder.record_reply(session_id, full_response)
+                if full_response:
+                    await self._save(ChatMessage(
+                        session_id=session_id,
+                        user_id=owner_id,
+                        content=full_response,
+                        is_user=False,
+                        created_at=datetime.utcnow()
+                    ))
+
+                if not self.stream_stats.dropped:
+                    await self.send({
+                        "type": status,
+                        "session_id": session_id,
+                        "request_id": request_id
+                    })
+            except Exception as e:
+                logger.error(f"Error finishing generation {request_id}: {str(e)}")
+        finally:
+            stream_registry.finish(stream, status)
+
+    async def _follow(self, stream: ResumableStream, missed: str, live: AsyncIterator[str], offset: int):
+        async def tokens():
+            if missed:
+                yield missed
+            async for token in live:
+                yield token
+
+        pump = StreamPump(
+            tokens(),
+            self._token_sender(stream.request_id, stream.session_id, offset),
+            self.stream_stats,
+            on_drop=self._close_socket
+        )
+        try:
+            await pump.run()
+        finally:
+            await live.aclose()
+
+        if self.stream_stats.dropped:
+            return
+        if stream.status == "error":
+            await self._send_error(stream.request_id, stream.session_id, RuntimeError("Error generating response"))
+        else:
+            await self.send({
+                "type": stream.status,
+                "session_id": stream.session_id,
+                "request_id": stream.request_id
+            })
+
+    def _queued_sender(self, request_id: str, session_id: str):
+        async def send_queued(position: int, estimated_wait: float):
+            await self.send({
+                "type": "queued",
+                "session_id": session_id,
+                "request_id": request_id,
+                "position": position,
+                "estimated_wait_ms": int(estimated_wait * 1000)
+            })
+
+        return send_queued
+
+    def _token_sender(self, request_id: str, session_id: str, offset: int):
+        sent = offset
+
+        async def send_token(chunk: str):
+            nonlocal sent
+            sent += len(chunk)
+            await self.send({
+                "type": "token",
+                "content": chunk,
+                "session_id": session_id,
+                "request_id": request_id,
+                "offset": sent
+            })
+
+        return send_token
+
+    async def _close_socket(self):
+        await self.websocket.close(code=1013)
+
+    async def _send_error(self, request_id: str, session_id: str, error: Exception):
+        logger.error(f"Error processing message: {str(error)}")
+        try:
+            await self.send({
+                "type": "error",
+                "message": str(error),
+                "session_id": session_id,
+                "request_id": request_id
+            })
+        except Exception:
+            pass
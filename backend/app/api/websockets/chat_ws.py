@@ -45,30 +45,18 @@ class ChatWebSocketHandler:
 
                 await websocket.send_json({"type": "message_received"})
 
+                # Retries and model fallback happen inside GroqService, before
+                # the first token; an error here means the turn really failed.
                 try:
-                    failed = False
                     response_text = ""
-                    
                     async for token in self.groq_service.stream_completion(user_message):
-                        if token.startswith("Error:"):
-                            failed = True
-                            break
-                        
                         response_text += token
                         await websocket.send_json({
                             "type": "token",
                             "content": token
                         })
-                    
-                    if failed:
-                        response_text = await self.groq_service.get_completion(user_message)
-                        if not response_text.startswith("Error:"):
-                            await websocket.send_json({
-                                "type": "token",
-                                "content": response_text
-                            })
 
-                    if response_text and not response_text.startswith("Error:"):
+                    if response_text:
                         await self.chat_service.save_message(ChatMessage(
                             session_id=session_id,
                             is_user=False,
@@ -0,0 +1,120 @@
+import asyncio
+from typing import AsyncIterator, List, Optional
+import logging
+
+from app.config import WS_COALESCE_ENABLED, WS_COALESCE_WINDOW_MS, WS_COALESCE_MAX_BYTES
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingStats:
+    def __init__(self):
+        self.tokens = 0
+        self.frames = 0
+        self.bytes = 0
+
+    @property
+    def bytes_per_frame(self) -> float:
+        return self.bytes / self.frames if self.frames else 0.0
+
+    def record(self):
+        metrics.increment("ws.responses")
+        metrics.observe("ws.frames_per_response", self.frames)
+        metrics.observe("ws.tokens_per_response", self.tokens)
+        if self.frames:
+            metrics.observe("ws.bytes_per_frame", self.bytes_per_frame)
+
+
+class TokenCoalescer:
+    """
+    Batches tokens from an upstream stream into larger chunks.
+
+    The first token is always emitted on its own so time-to-first-token is
+    unaffected. After that, tokens are buffered until the time window since
+    the first buffered token elapses, the buffer reaches max_bytes, or the
+    upstream stream ends.
+    """
+
+    def __init__(
+        self,
+        window_ms: int = WS_COALESCE_WINDOW_MS,
+        max_bytes: int = WS_COALESCE_MAX_BYTES,
+        enabled: bool = WS_COALESCE_ENABLED
+    ):
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self.enabled = enabled and window_ms > 0
+        self.stats = CoalescingStats()
+
+    def _emit(self, parts: List[str]) -> str:
+        chunk = "".join(parts)
+        self.stats.frames += 1
+        self.stats.bytes += len(chunk.encode("utf-8"))
+        return chunk
+
+    async def coalesce(self, tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+        iterator = tokens.__aiter__()
+
+        if not self.enabled:
+            async for token in iterator:
+                self.stats.tokens += 1
+                yield self._emit([token])
+            return
+
+        loop = asyncio.get_running_loop()
+        buffer: List[str] = []
+        buffered_bytes = 0
+        deadline = 0.0
+        first = True
+        pending: Optional[asyncio.Future] = None
+
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+
+                timeout = max(0.0, deadline - loop.time()) if buffer else None
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+
+                if not done:
+                    yield self._emit(buffer)
+                    buffer, buffered_bytes = [], 0
+                    continue
+
+                try:
+                    token = pending.result()
+                except StopAsyncIteration:
+                    pending = None
+                    break
+                pending = None
+
+                self.stats.tokens += 1
+                if first:
+                    first = False
+                    yield self._emit([token])
+                    continue
+
+                if not buffer:
+                    deadline = loop.time() + self.window
+                buffer.append(token)
+                buffered_bytes += len(token.encode("utf-8"))
+
+                if buffered_bytes >= self.max_bytes:
+                    yield self._emit(buffer)
+                    buffer, buffered_bytes = [], 0
+
+            if buffer:
+                yield self._emit(buffer)
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+                try:
+                    await pending
+                except (asyncio.CancelledError, StopAsyncIteration):
+                    pass
+                except Exception as e:
+                    logger.debug(f"Upstream error after coalescer shutdown: {str(e)}")
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
@@ -0,0 +1,116 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+PROTOCOL_JSON = "json"
+PROTOCOL_COMPACT = "compact"
+PROTOCOL_MSGPACK = "msgpack"
+
+Frame = Union[str, bytes]
+
+# Short codes used by the compact encodings
+TYPE_CODES = {
+    "token": "k",
+    "message_received": "a",
+    "completion": "c",
+    "cancelled": "x",
+    "error": "e",
+    "resumed": "r",
+    "resume_failed": "f",
+    "stream": "s",
+    "queued": "q",
+}
+# Frames after which a stream sends nothing more
+FINAL_TYPES = ("completion", "cancelled", "error")
+
+FIELD_CODES = {
+    "type": "t",
+    "content": "c",
+    "offset": "o",
+    "message": "m",
+    "reason": "r",
+}
+
+
+def available_protocols() -> List[str]:
+    protocols = [PROTOCOL_JSON, PROTOCOL_COMPACT]
+    if msgpack is not None:
+        protocols.append(PROTOCOL_MSGPACK)
+    return protocols
+
+
+class JsonFrameEncoder:
+    """The original verbose frames, byte-for-byte what send_json produces."""
+
+    name = PROTOCOL_JSON
+
+    def encode(self, payload: Dict[str, Any]) -> List[Frame]:
+        return [json.dumps(payload, separators=(",", ":"))]
+
+
+class CompactFrameEncoder:
+    """
+    Short type codes and field names, with the session_id/request_id pair
+    replaced by a per-connection integer stream id.
+
+    The first frame for a new pair is preceded by a declaration frame
+    {"t": "s", "s": <id>, "session_id": ..., "request_id": ...}. Ids are
+    never reused, and a pair is forgotten after its final frame, so a
+    long-lived connection only remembers the streams still running.
+    """
+
+    name = PROTOCOL_COMPACT
+
+    def __init__(self):
+        self._stream_ids: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+        self._last_stream_id = 0
+
+    def _compact(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        frames = []
+        compact: Dict[str, Any] = {}
+
+        key = (payload.get("session_id"), payload.get("request_id"))
+        if key != (None, None):
+            stream_id = self._stream_ids.get(key)
+            if stream_id is None:
+                self._last_stream_id += 1
+                stream_id = self._stream_ids[key] = self._last_stream_id
+                frames.append({"t": TYPE_CODES["stream"], "s": stream_id, "session_id": key[0], "request_id": key[1]})
+            compact["s"] = stream_id
+            if payload.get("type") in FINAL_TYPES:
+                del self._stream_ids[key]
+
+        for field, value in payload.items():
+            if field in ("session_id", "request_id"):
+                continue
+            if field == "type":
+                value = TYPE_CODES.get(value, value)
+            compact[FIELD_CODES.get(field, field)] = value
+
+        frames.append(compact)
+        return frames
+
+    def encode(self, payload: Dict[str, Any]) -> List[Frame]:
+        return [json.dumps(frame, separators=(",", ":"), ensure_ascii=False) for frame in self._compact(payload)]
+
+
+class MsgpackFrameEncoder(CompactFrameEncoder):
+    """Compact frames packed as MessagePack binary messages."""
+
+    name = PROTOCOL_MSGPACK
+
+    def encode(self, payload: Dict[str, Any]) -> List[Frame]:
+        return [msgpack.packb(frame, use_bin_type=True) for frame in self._compact(payload)]
+
+
+def create_encoder(protocol: Optional[str]):
+    """Encoder for a requested protocol name; unknown or unavailable names fall back to JSON."""
+    if protocol == PROTOCOL_COMPACT:
+        return CompactFrameEncoder()
+    if protocol == PROTOCOL_MSGPACK and msgpack is not None:
+        return MsgpackFrameEncoder()
+    return JsonFrameEncoder()
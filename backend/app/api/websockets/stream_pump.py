@@ -0,0 +1,235 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+import itertools
+import logging
+import time
+
+from app.api.websockets.coalescer import TokenCoalescer
+from app.config import WS_STREAM_BUFFER_SIZE, WS_SLOW_CONSUMER_POLICY
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+POLICY_BLOCK = "block"
+POLICY_COALESCE = "coalesce"
+POLICY_DROP = "drop"
+SLOW_CONSUMER_POLICIES = (POLICY_BLOCK, POLICY_COALESCE, POLICY_DROP)
+
+
+class StreamStats:
+    """Per-connection view of the socket writer buffer; connection_id is only a label."""
+
+    def __init__(self, connection_id: str):
+        self.connection_id = connection_id
+        self.buffer_depth = 0
+        self.max_buffer_depth = 0
+        self.stall_seconds = 0.0
+        self.stalls = 0
+        self.coalesced_tokens = 0
+        self.dropped = False
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "buffer_depth": self.buffer_depth,
+            "max_buffer_depth": self.max_buffer_depth,
+            "stall_seconds": round(self.stall_seconds, 3),
+            "stalls": self.stalls,
+            "coalesced_tokens": self.coalesced_tokens,
+            "dropped": self.dropped,
+        }
+
+
+_active_stats: Dict[str, StreamStats] = {}
+# Stats are labelled by a counter: a socket's own id doubles as its default
+# session id, which must not show up in /metrics.
+_stats_ids = itertools.count(1)
+
+
+def register_stream_stats() -> StreamStats:
+    stats = StreamStats(f"c{next(_stats_ids)}")
+    _active_stats[stats.connection_id] = stats
+    return stats
+
+
+def unregister_stream_stats(stats: StreamStats):
+    _active_stats.pop(stats.connection_id, None)
+
+
+metrics.register_collector(
+    "connections",
+    lambda: {connection_id: stats.snapshot() for connection_id, stats in list(_active_stats.items())}
+)
+
+
+class TokenBuffer:
+    """
+    Bounded FIFO between the upstream reader and the socket writer.
+
+    What happens when the buffer is full depends on the policy: "block"
+    pauses the upstream reader, "coalesce" appends the token to the newest
+    buffered entry, and "drop" tells the caller to give up on the client.
+    """
+
+    def __init__(self, maxsize: int, policy: str, stats: StreamStats):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.stats = stats
+        self._items: Deque[str] = deque()
+        self._closed = False
+        self._changed = asyncio.Condition()
+        self._full_since: Optional[float] = None
+        self._reported_depth = 0
+
+    def _update_depth(self):
+        # Several generations can share one connection, so the connection
+        # depth is the sum over all of its buffers.
+        depth = len(self._items)
+        self.stats.buffer_depth += depth - self._reported_depth
+        self._reported_depth = depth
+        if self.stats.buffer_depth > self.stats.max_buffer_depth:
+            self.stats.max_buffer_depth = self.stats.buffer_depth
+
+        if depth >= self.maxsize:
+            if self._full_since is None:
+                self._full_since = time.perf_counter()
+                self.stats.stalls += 1
+        elif self._full_since is not None:
+            self.stats.stall_seconds += time.perf_counter() - self._full_since
+            self._full_since = None
+
+    async def put(self, token: str) -> bool:
+        async with self._changed:
+            if len(self._items) >= self.maxsize:
+                if self.policy == POLICY_DROP:
+                    return False
+                if self.policy == POLICY_COALESCE:
+                    self._items[-1] += token
+                    self.stats.coalesced_tokens += 1
+                    return True
+                await self._changed.wait_for(lambda: len(self._items) < self.maxsize or self._closed)
+
+            self._items.append(token)
+            self._update_depth()
+            self._changed.notify_all()
+            return True
+
+    async def close(self):
+        async with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+    def release(self):
+        self._items.clear()
+        self._update_depth()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._items or self._closed)
+            if not self._items:
+                raise StopAsyncIteration
+            token = self._items.popleft()
+            self._update_depth()
+            self._changed.notify_all()
+            return token
+
+
+class StreamPump:
+    """
+    Runs the upstream reader and the socket writer as separate tasks.
+
+    The reader always consumes the upstream stream to the end and returns the
+    full response, even if the client is dropped or the socket fails, so the
+    answer can still be persisted.
+    """
+
+    def __init__(
+        self,
+        tokens: AsyncIterator[str],
+        send: Callable[[str], Awaitable[None]],
+        stats: StreamStats,
+        on_drop: Optional[Callable[[], Awaitable[None]]] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        maxsize: int = WS_STREAM_BUFFER_SIZE,
+        policy: str = WS_SLOW_CONSUMER_POLICY
+    ):
+        self.tokens = tokens
+        self.send = send
+        self.stats = stats
+        self.on_drop = on_drop
+        self.on_token = on_token
+        self.buffer = TokenBuffer(maxsize, policy, stats)
+        self.coalescer = TokenCoalescer()
+        self.parts: List[str] = []
+        self._writer: Optional[asyncio.Task] = None
+
+    @property
+    def response_text(self) -> str:
+        """Everything read from upstream so far, including after a cancel."""
+        return "".join(self.parts)
+
+    async def _drop_client(self, reason: str, slow_consumer: bool):
+        if self.stats.dropped:
+            return
+        self.stats.dropped = True
+        if slow_consumer:
+            metrics.increment("ws.slow_consumers_dropped")
+            logger.warning(f"Dropping client {self.stats.connection_id}: {reason}")
+        else:
+            # The client went away (or the socket broke); nothing to do with its speed
+            metrics.increment("ws.send_failures")
+            logger.info(f"Lost client {self.stats.connection_id}: {reason}")
+        await self.buffer.close()
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        if self.on_drop is not None:
+            try:
+                await self.on_drop()
+            except Exception as e:
+                logger.debug(f"Error closing dropped client: {str(e)}")
+
+    async def _read(self) -> str:
+        try:
+            async for token in self.tokens:
+                self.parts.append(token)
+                if self.on_token is not None:
+                    self.on_token(token)
+                if not self.stats.dropped and not await self.buffer.put(token):
+                    await self._drop_client("stream buffer full", slow_consumer=True)
+        finally:
+            await self.buffer.close()
+            aclose = getattr(self.tokens, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        return self.response_text
+
+    async def _write(self):
+        chunks = self.coalescer.coalesce(self.buffer)
+        try:
+            async for chunk in chunks:
+                await self.send(chunk)
+        except Exception as e:
+            await self._drop_client(f"send failed: {str(e)}", slow_consumer=False)
+        finally:
+            await chunks.aclose()
+
+    async def run(self) -> str:
+        reader = asyncio.create_task(self._read())
+        self._writer = asyncio.create_task(self._write())
+        try:
+            await asyncio.wait({reader})
+            await asyncio.wait({self._writer})
+            return reader.result()
+        finally:
+            pending = [task for task in (reader, self._writer) if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            self.coalescer.stats.record()
+            self.buffer.release()
@@ -0,0 +1,122 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+import logging
+
+from app.config import WS_RESUME_BUFFER_TOKENS, WS_RESUME_TTL_SECONDS
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+STATUS_STREAMING = "streaming"
+
+
+class ResumableStream:
+    """
+    Bounded record of the tokens produced by one in-flight generation.
+
+    Tokens are addressed by character offset into the answer, which is what
+    clients see as "offset" on token frames. Only the newest capacity tokens
+    are kept, so a client that fell too far behind has to reload the
+    history instead.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        request_id: str,
+        capacity: int = WS_RESUME_BUFFER_TOKENS,
+        owner_id: Optional[str] = None
+    ):
+        self.session_id = session_id
+        self.request_id = request_id
+        # User who started the generation; only they may resume it (None: anyone)
+        self.owner_id = owner_id
+        self.task: Optional[asyncio.Task] = None
+        self.status = STATUS_STREAMING
+        self.offset = 0
+        self._tokens: Deque[Tuple[int, str]] = deque(maxlen=max(1, capacity))
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def done(self) -> bool:
+        return self.status != STATUS_STREAMING
+
+    def append(self, token: str):
+        self._tokens.append((self.offset, token))
+        self.offset += len(token)
+        for queue in self._subscribers:
+            queue.put_nowait(token)
+
+    def since(self, offset: int) -> Optional[str]:
+        """Text emitted after offset, or None if part of it was already evicted."""
+        if offset >= self.offset:
+            return ""
+        if offset < 0 or not self._tokens or self._tokens[0][0] > offset:
+            return None
+
+        parts: List[str] = []
+        for start, token in self._tokens:
+            end = start + len(token)
+            if end <= offset:
+                continue
+            parts.append(token[max(0, offset - start):])
+        return "".join(parts)
+
+    def finish(self, status: str):
+        self.status = status
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+        self._subscribers.clear()
+
+    def subscribe(self) -> AsyncIterator[str]:
+        """Live tokens appended from now on; ends when the generation finishes."""
+        queue: asyncio.Queue = asyncio.Queue()
+        if self.done:
+            queue.put_nowait(None)
+        else:
+            self._subscribers.add(queue)
+        return self._follow(queue)
+
+    async def _follow(self, queue: asyncio.Queue) -> AsyncIterator[str]:
+        try:
+            while True:
+                token = await queue.get()
+                if token is None:
+                    return
+                yield token
+        finally:
+            self._subscribers.discard(queue)
+
+
+class StreamRegistry:
+    """Latest resumable generation per chat session, kept for a TTL after it ends."""
+
+    def __init__(self, ttl_seconds: float = WS_RESUME_TTL_SECONDS):
+        self.ttl = ttl_seconds
+        self._streams: Dict[str, ResumableStream] = {}
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def start(self, session_id: str, request_id: str, owner_id: Optional[str] = None) -> ResumableStream:
+        stream = ResumableStream(session_id, request_id, owner_id=owner_id)
+        self._streams[session_id] = stream
+        return stream
+
+    def get(self, session_id: str) -> Optional[ResumableStream]:
+        return self._streams.get(session_id)
+
+    def finish(self, stream: ResumableStream, status: str):
+        stream.finish(status)
+        asyncio.get_running_loop().call_later(self.ttl, self._evict, stream)
+
+    def _evict(self, stream: ResumableStream):
+        if self._streams.get(stream.session_id) is stream:
+            del self._streams[stream.session_id]
+            metrics.increment("ws.resume_buffers_evicted")
+
+
+stream_registry = StreamRegistry()
+
+metrics.register_collector("resumable_streams", lambda: len(stream_registry))
@@ -1 +1,138 @@
-# Configuration settings (env vars, constants)
\ No newline at end of file
+# Configuration settings (env vars, constants)
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _get_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# WebSocket token coalescing
+WS_COALESCE_ENABLED = _get_bool("WS_COALESCE_ENABLED", True)
+WS_COALESCE_WINDOW_MS = int(os.getenv("WS_COALESCE_WINDOW_MS", "20"))
+WS_COALESCE_MAX_BYTES = int(os.getenv("WS_COALESCE_MAX_BYTES", "512"))
+
+# Write-behind message persistence
+PERSISTENCE_WRITE_BEHIND = _get_bool("PERSISTENCE_WRITE_BEHIND", False)
+PERSISTENCE_BATCH_SIZE = int(os.getenv("PERSISTENCE_BATCH_SIZE", "100"))
+PERSISTENCE_FLUSH_INTERVAL_MS = int(os.getenv("PERSISTENCE_FLUSH_INTERVAL_MS", "50"))
+PERSISTENCE_MAX_PENDING = int(os.getenv("PERSISTENCE_MAX_PENDING", "5000"))
+PERSISTENCE_ENQUEUE_TIMEOUT_MS = int(os.getenv("PERSISTENCE_ENQUEUE_TIMEOUT_MS", "5000"))  # wait for room when full
+PERSISTENCE_MAX_RETRIES = int(os.getenv("PERSISTENCE_MAX_RETRIES", "3"))  # failed inserts of one row before it is dropped
+
+# Backpressure between the upstream stream and the socket writer
+WS_STREAM_BUFFER_SIZE = int(os.getenv("WS_STREAM_BUFFER_SIZE", "256"))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "coalesce").strip().lower()
+
+# Concurrent generations per WebSocket connection
+WS_MAX_CONCURRENT_GENERATIONS = int(os.getenv("WS_MAX_CONCURRENT_GENERATIONS", "3"))
+
+# Resumable streams after reconnect
+WS_RESUME_BUFFER_TOKENS = int(os.getenv("WS_RESUME_BUFFER_TOKENS", "4096"))
+WS_RESUME_TTL_SECONDS = float(os.getenv("WS_RESUME_TTL_SECONDS", "120"))
+
+# bcrypt hashing/verification thread pool; calls beyond workers + max queue fail fast (0 workers: inline)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+# Per-process cache of authenticated users (by token subject) and decoded tokens; revoked jtis are denied until expiry
+PRINCIPAL_CACHE_ENABLED = _get_bool("PRINCIPAL_CACHE_ENABLED", True)
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+TOKEN_DECODE_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_DECODE_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+# How often each worker reloads the revoked_tokens table (0: on every authenticated request)
+REVOKED_TOKENS_SYNC_SECONDS = float(os.getenv("REVOKED_TOKENS_SYNC_SECONDS", "5"))
+
+# Conversation context assembly
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_HISTORY_LIMIT = int(os.getenv("CONTEXT_HISTORY_LIMIT", "50"))
+CONTEXT_CACHE_MAX_SESSIONS = int(os.getenv("CONTEXT_CACHE_MAX_SESSIONS", "10000"))
+CONTEXT_CACHE_IDLE_SECONDS = float(os.getenv("CONTEXT_CACHE_IDLE_SECONDS", "1800"))
+
+# Completion response cache (opt-in): none | memory | sqlite
+COMPLETION_CACHE_BACKEND = os.getenv("COMPLETION_CACHE_BACKEND", "none").strip().lower()
+COMPLETION_CACHE_TTL_SECONDS = float(os.getenv("COMPLETION_CACHE_TTL_SECONDS", "3600"))
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "10000"))
+COMPLETION_CACHE_MAX_BYTES = int(os.getenv("COMPLETION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+COMPLETION_CACHE_PATH = os.getenv("COMPLETION_CACHE_PATH", "./completion_cache.db")
+COMPLETION_CACHE_REPLAY_CHUNK_CHARS = int(os.getenv("COMPLETION_CACHE_REPLAY_CHUNK_CHARS", "16"))
+COMPLETION_CACHE_REPLAY_DELAY_MS = int(os.getenv("COMPLETION_CACHE_REPLAY_DELAY_MS", "10"))
+
+# Share one upstream stream between identical concurrent requests
+GROQ_SINGLE_FLIGHT = _get_bool("GROQ_SINGLE_FLIGHT", True)
+
+# Client-side Groq rate limiting (requests and tokens per minute)
+GROQ_RATE_LIMIT_ENABLED = _get_bool("GROQ_RATE_LIMIT_ENABLED", True)
+GROQ_RPM_LIMIT = int(os.getenv("GROQ_RPM_LIMIT", "30"))
+GROQ_TPM_LIMIT = int(os.getenv("GROQ_TPM_LIMIT", "6000"))
+GROQ_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("GROQ_COMPLETION_TOKEN_ESTIMATE", "512"))
+
+# Groq retries, hedging and circuit breaker
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+GROQ_FALLBACK_MODEL = os.getenv("GROQ_FALLBACK_MODEL", "llama-3.1-8b-instant").strip()
+GROQ_RETRY_ATTEMPTS = int(os.getenv("GROQ_RETRY_ATTEMPTS", "2"))
+GROQ_RETRY_BASE_MS = int(os.getenv("GROQ_RETRY_BASE_MS", "200"))
+GROQ_RETRY_MAX_MS = int(os.getenv("GROQ_RETRY_MAX_MS", "2000"))
+GROQ_HEDGE_ENABLED = _get_bool("GROQ_HEDGE_ENABLED", False)
+GROQ_HEDGE_PERCENTILE = float(os.getenv("GROQ_HEDGE_PERCENTILE", "0.95"))
+GROQ_HEDGE_MIN_SAMPLES = int(os.getenv("GROQ_HEDGE_MIN_SAMPLES", "20"))
+GROQ_HEDGE_MIN_DELAY_MS = int(os.getenv("GROQ_HEDGE_MIN_DELAY_MS", "250"))
+GROQ_HEDGE_MAX_RATIO = float(os.getenv("GROQ_HEDGE_MAX_RATIO", "0.1"))
+GROQ_BREAKER_FAILURE_THRESHOLD = int(os.getenv("GROQ_BREAKER_FAILURE_THRESHOLD", "5"))
+GROQ_BREAKER_RESET_SECONDS = float(os.getenv("GROQ_BREAKER_RESET_SECONDS", "30"))
+
+# LLM backend: groq | mock
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").strip().lower()
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "").strip()
+
+# Mock provider behaviour (LLM_PROVIDER=mock and benchmarks/mock_llm_server.py)
+MOCK_LLM_TTFT_MS = float(os.getenv("MOCK_LLM_TTFT_MS", "200"))
+MOCK_LLM_INTER_TOKEN_MS = float(os.getenv("MOCK_LLM_INTER_TOKEN_MS", "20"))
+MOCK_LLM_ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+MOCK_LLM_MIN_TOKENS = int(os.getenv("MOCK_LLM_MIN_TOKENS", "20"))
+MOCK_LLM_MAX_TOKENS = int(os.getenv("MOCK_LLM_MAX_TOKENS", "200"))
+MOCK_LLM_SEED = int(os.getenv("MOCK_LLM_SEED", "0"))
+
+# Batch completion endpoint
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+# Token usage accounting
+USAGE_TRACKING_ENABLED = _get_bool("USAGE_TRACKING_ENABLED", True)
+USAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "30"))
+# Accounts allowed to read everyone's usage (comma-separated emails)
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+# Keyset pagination of /api/chats and /api/chats/{session_id}/messages
+HISTORY_PAGE_DEFAULT_LIMIT = int(os.getenv("HISTORY_PAGE_DEFAULT_LIMIT", "50"))
+HISTORY_PAGE_MAX_LIMIT = int(os.getenv("HISTORY_PAGE_MAX_LIMIT", "500"))
+HISTORY_EXPORT_BATCH_SIZE = int(os.getenv("HISTORY_EXPORT_BATCH_SIZE", "1000"))
+# Serve JSON pages of those endpoints from column rows encoded directly (orjson if installed)
+HISTORY_FAST_JSON = _get_bool("HISTORY_FAST_JSON", True)
+# Sessions are titled with the start of their first user message
+SESSION_TITLE_MAX_CHARS = int(os.getenv("SESSION_TITLE_MAX_CHARS", "60"))
+
+# Per-process cache of recent session histories, appended to as messages are saved
+HISTORY_CACHE_ENABLED = _get_bool("HISTORY_CACHE_ENABLED", True)
+HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+HISTORY_CACHE_MAX_MESSAGES = int(os.getenv("HISTORY_CACHE_MAX_MESSAGES", "500"))  # newest kept per session
+HISTORY_CACHE_MAX_SESSIONS = int(os.getenv("HISTORY_CACHE_MAX_SESSIONS", "10000"))
+HISTORY_CACHE_TTL_SECONDS = float(os.getenv("HISTORY_CACHE_TTL_SECONDS", "60"))  # bounds staleness across workers
+
+# Full-text message search
+SEARCH_LANGUAGE = os.getenv("SEARCH_LANGUAGE", "english")  # Postgres text search configuration
+SEARCH_SNIPPET_TOKENS = int(os.getenv("SEARCH_SNIPPET_TOKENS", "16"))
+
+# Background summarization of long sessions
+COMPACTION_ENABLED = _get_bool("COMPACTION_ENABLED", True)
+COMPACTION_THRESHOLD_TOKENS = int(os.getenv("COMPACTION_THRESHOLD_TOKENS", "2400"))
+COMPACTION_KEEP_RECENT_MESSAGES = int(os.getenv("COMPACTION_KEEP_RECENT_MESSAGES", "6"))
+COMPACTION_SUMMARY_MAX_TOKENS = int(os.getenv("COMPACTION_SUMMARY_MAX_TOKENS", "400"))
+# Longer spans are summarized in chunks of at most this many (estimated) tokens
+COMPACTION_CHUNK_MAX_TOKENS = int(os.getenv("COMPACTION_CHUNK_MAX_TOKENS", "6000"))
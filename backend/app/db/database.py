@@ -1,20 +1,74 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, AsyncEngine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from contextlib import asynccontextmanager
 import os
+import time
 from dotenv import load_dotenv
 
+from app.utils.metrics import metrics
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./chatbot.db")
 
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe("db.pool_checkout_wait_ms", (time.perf_counter() - start) * 1000)
+
+
+def _pool_options(url: str) -> dict:
+    # In-memory SQLite must keep its single shared connection
+    if url.startswith("sqlite") and ":memory:" in url:
+        return {}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": not url.startswith("sqlite"),
+    }
+
+
 # Create async SQLAlchemy engine
 engine = create_async_engine(
     DATABASE_URL, 
-    echo=True,  
-    future=True  
+    echo=DB_ECHO,  
+    future=True,
+    **_pool_options(DATABASE_URL)
 )
 
+
+def _pool_status() -> dict:
+    pool = engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+    }
+
+
+metrics.register_collector("db_pool", _pool_status)
+
 # Create session factory
 AsyncSessionLocal = sessionmaker(
     engine, 
@@ -26,12 +80,10 @@ AsyncSessionLocal = sessionmaker(
 Base = declarative_base()
 
 async def init_db():
-   
-    from app.models.user import DBUser
-    from app.models.chat import DBChatSession, DBChatMessage
-    
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    """Create or upgrade the schema; see app.db.migrations."""
+    from app.db.migrations import run_migrations
+
+    return await run_migrations(engine)
 
 async def get_db():
 
@@ -39,4 +91,10 @@ async def get_db():
         try:
             yield db
         finally:
-            await db.close()
\ No newline at end of file
+            await db.close()
+
+@asynccontextmanager
+async def session_scope():
+    """Short-lived session for one unit of work outside of a request dependency."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,331 @@
+"""
+Versioned schema migrations.
+
+The applied version is kept in a one-row schema_version table. At startup
+run_migrations reads it with a single query and returns straight away when
+the database is current. Otherwise:
+
+  - an empty database gets the whole schema from the models, plus the
+    migrations marked on_create, and is stamped with the latest version;
+  - an existing database (including one created by create_all before
+    versioning existed, which counts as version 0) gets every pending
+    migration in order, in one transaction with the version bump.
+
+Migrations must leave the schema matching the models, and are written to
+tolerate objects that already exist, since pre-versioning databases were
+created from whatever the models looked like at the time.
+"""
+from typing import Callable, List, NamedTuple, Optional
+import logging
+import time
+
+from sqlalchemy import Connection, inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateColumn
+
+from app.config import SESSION_TITLE_MAX_CHARS, SEARCH_LANGUAGE
+from app.db.database import Base, engine as default_engine
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+    # Also run on a brand-new database, for objects the models cannot
+    # declare (triggers, virtual tables, dialect-specific columns)
+    on_create: bool = False
+
+
+def _load_models():
+    # Every table has to be registered on Base.metadata before create_all
+    import app.models.user  # noqa: F401
+    import app.models.chat  # noqa: F401
+    import app.models.usage  # noqa: F401
+
+
+def _add_column(conn: Connection, table_name: str, column_name: str):
+    """
+    Add a column as the model declares it (type, server default and NOT NULL,
+    rendered as create_all would), if the table does not have it yet.
+    """
+    if column_name in {column["name"] for column in inspect(conn).get_columns(table_name)}:
+        return
+    column = Base.metadata.tables[table_name].columns[column_name]
+    if not column.nullable and column.server_default is None:
+        # Existing rows need a value; SQLite refuses NOT NULL without a default outright
+        raise ValueError(f"{table_name}.{column_name} is NOT NULL and needs a server_default to be added")
+    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}"))
+
+
+def _create_index(conn: Connection, table_name: str, index_name: str):
+    """Create an index as the model declares it, if it does not exist yet."""
+    if index_name in {index["name"] for index in inspect(conn).get_indexes(table_name)}:
+        return
+    index = next(i for i in Base.metadata.tables[table_name].indexes if i.name == index_name)
+    index.create(conn)
+
+
+def _create_missing_tables(conn: Connection):
+    Base.metadata.create_all(conn)
+
+
+def _message_kinds(conn: Connection):
+    _add_column(conn, "chat_messages", "kind")
+    _add_column(conn, "chat_messages", "summary_until")
+
+
+def _history_indexes(conn: Connection):
+    _create_index(conn, "chat_messages", "ix_chat_messages_session_created_at_id")
+    _create_index(conn, "chat_messages", "ix_chat_messages_session_kind_summary_until")
+    # The session indexes this migration created are replaced by migration 4
+
+
+def _drop_index(conn: Connection, table_name: str, index_name: str):
+    if index_name in {index["name"] for index in inspect(conn).get_indexes(table_name)}:
+        conn.execute(text(f"DROP INDEX {index_name}"))
+
+
+def _session_summaries(conn: Connection):
+    _add_column(conn, "chat_sessions", "title")
+    _add_column(conn, "chat_sessions", "message_count")
+    _add_column(conn, "chat_sessions", "last_message_at")
+
+    # Sessions used to be created only implicitly by their messages
+    conn.execute(text("""
+        INSERT INTO chat_sessions (id, user_id, created_at, updated_at, message_count)
+        SELECT session_id, MAX(user_id), MIN(created_at), MAX(created_at), 0
+        FROM chat_messages
+        WHERE session_id IS NOT NULL AND session_id NOT IN (SELECT id FROM chat_sessions)
+        GROUP BY session_id
+    """))
+    conn.execute(text(f"""
+        UPDATE chat_sessions SET
+            message_count = (
+                SELECT COUNT(*) FROM chat_messages m
+                WHERE m.session_id = chat_sessions.id AND m.kind = 'message'
+            ),
+            last_message_at = (
+                SELECT MAX(m.created_at) FROM chat_messages m
+                WHERE m.session_id = chat_sessions.id AND m.kind = 'message'
+            ),
+            title = (
+                SELECT SUBSTR(m.content, 1, {SESSION_TITLE_MAX_CHARS}) FROM chat_messages m
+                WHERE m.session_id = chat_sessions.id AND m.kind = 'message' AND m.is_user
+                ORDER BY m.created_at LIMIT 1
+            )
+    """))
+    conn.execute(text(
+        "UPDATE chat_sessions SET updated_at = COALESCE(last_message_at, updated_at, created_at)"
+    ))
+
+    _drop_index(conn, "chat_sessions", "ix_chat_sessions_created_at_id")
+    _drop_index(conn, "chat_sessions", "ix_chat_sessions_user_id_updated_at")
+    _create_index(conn, "chat_sessions", "ix_chat_sessions_updated_at_id")
+    _create_index(conn, "chat_sessions", "ix_chat_sessions_user_id_updated_at_id")
+
+
+def _search_index(conn: Connection):
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        if not conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar():
+            logger.warning("SQLite was built without FTS5; message search is unavailable")
+            return
+        # External-content index over chat_messages, kept in sync by triggers
+        # in the same transaction as every write. user_id is indexed too, so
+        # a search can be narrowed to one user inside the index.
+        conn.execute(text("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chat_messages_fts USING fts5(
+                content, user_id,
+                content='chat_messages', content_rowid='rowid',
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+        """))
+        # Rank by content alone: the user_id term matches every row searched
+        conn.execute(text("INSERT INTO chat_messages_fts (chat_messages_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')"))
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS chat_messages_fts_insert AFTER INSERT ON chat_messages
+            WHEN new.kind = 'message' BEGIN
+                INSERT INTO chat_messages_fts (rowid, content, user_id)
+                VALUES (new.rowid, new.content, new.user_id);
+            END
+        """))
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS chat_messages_fts_delete AFTER DELETE ON chat_messages
+            WHEN old.kind = 'message' BEGIN
+                INSERT INTO chat_messages_fts (chat_messages_fts, rowid, content, user_id)
+                VALUES ('delete', old.rowid, old.content, old.user_id);
+            END
+        """))
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS chat_messages_fts_update AFTER UPDATE OF content, user_id, kind ON chat_messages
+            BEGIN
+                INSERT INTO chat_messages_fts (chat_messages_fts, rowid, content, user_id)
+                SELECT 'delete', old.rowid, old.content, old.user_id WHERE old.kind = 'message';
+                INSERT INTO chat_messages_fts (rowid, content, user_id)
+                SELECT new.rowid, new.content, new.user_id WHERE new.kind = 'message';
+            END
+        """))
+        conn.execute(text("INSERT INTO chat_messages_fts (chat_messages_fts) VALUES ('delete-all')"))
+        conn.execute(text("""
+            INSERT INTO chat_messages_fts (rowid, content, user_id)
+            SELECT rowid, content, user_id FROM chat_messages WHERE kind = 'message'
+        """))
+    elif dialect == "postgresql":
+        # A generated column is maintained by every INSERT/UPDATE
+        conn.execute(text(f"""
+            ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('{SEARCH_LANGUAGE}', coalesce(content, ''))) STORED
+        """))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_chat_messages_search_vector ON chat_messages USING GIN (search_vector)"
+        ))
+    else:
+        logger.warning(f"No full-text index for dialect {dialect}; message search is unavailable")
+
+
+def _stable_search_rowids(conn: Connection):
+    """
+    Key the SQLite index on chat_messages.search_rowid instead of the implicit
+    rowid. chat_messages has a string primary key, so its rowid is not an
+    alias for any column and VACUUM may renumber it, silently pointing index
+    entries at the wrong messages. search_rowid is assigned once per message
+    (one past the largest so far) and never changes.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    if not conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar():
+        return
+
+    for trigger in ("insert", "delete", "update"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS chat_messages_fts_{trigger}"))
+    conn.execute(text("DROP TABLE IF EXISTS chat_messages_fts"))
+
+    if "search_rowid" not in {column["name"] for column in inspect(conn).get_columns("chat_messages")}:
+        conn.execute(text("ALTER TABLE chat_messages ADD COLUMN search_rowid INTEGER"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_chat_messages_search_rowid ON chat_messages (search_rowid)"
+    ))
+    conn.execute(text("UPDATE chat_messages SET search_rowid = rowid WHERE kind = 'message' AND search_rowid IS NULL"))
+
+    conn.execute(text("""
+        CREATE VIRTUAL TABLE chat_messages_fts USING fts5(
+            content, user_id,
+            content='chat_messages', content_rowid='search_rowid',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+    """))
+    conn.execute(text("INSERT INTO chat_messages_fts (chat_messages_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')"))
+    # Updating only search_rowid does not fire the update trigger below
+    conn.execute(text("""
+        CREATE TRIGGER chat_messages_fts_insert AFTER INSERT ON chat_messages
+        WHEN new.kind = 'message' BEGIN
+            UPDATE chat_messages
+            SET search_rowid = (SELECT COALESCE(MAX(search_rowid), 0) + 1 FROM chat_messages)
+            WHERE rowid = new.rowid;
+            INSERT INTO chat_messages_fts (rowid, content, user_id)
+            SELECT search_rowid, content, user_id FROM chat_messages WHERE rowid = new.rowid;
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER chat_messages_fts_delete AFTER DELETE ON chat_messages
+        WHEN old.search_rowid IS NOT NULL BEGIN
+            INSERT INTO chat_messages_fts (chat_messages_fts, rowid, content, user_id)
+            VALUES ('delete', old.search_rowid, old.content, old.user_id);
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER chat_messages_fts_update AFTER UPDATE OF content, user_id ON chat_messages
+        WHEN old.search_rowid IS NOT NULL BEGIN
+            INSERT INTO chat_messages_fts (chat_messages_fts, rowid, content, user_id)
+            VALUES ('delete', old.search_rowid, old.content, old.user_id);
+            INSERT INTO chat_messages_fts (rowid, content, user_id)
+            VALUES (new.search_rowid, new.content, new.user_id);
+        END
+    """))
+    conn.execute(text("INSERT INTO chat_messages_fts (chat_messages_fts) VALUES ('rebuild')"))
+
+
+def _revoked_tokens(conn: Connection):
+    Base.metadata.tables["revoked_tokens"].create(conn, checkfirst=True)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create tables added since the initial schema", _create_missing_tables),
+    Migration(2, "chat_messages.kind and summary_until for compaction summaries", _message_kinds),
+    Migration(3, "composite indexes for history, summaries and session listings", _history_indexes),
+    Migration(4, "denormalized title, message_count and last_message_at on chat_sessions", _session_summaries),
+    Migration(5, "full-text index over chat_messages.content", _search_index, on_create=True),
+    Migration(6, "key the SQLite full-text index on a stable chat_messages.search_rowid", _stable_search_rowids,
+              on_create=True),
+    Migration(7, "revoked_tokens denylist shared by every worker", _revoked_tokens),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def _read_version(conn: Connection) -> Optional[int]:
+    """Applied version, 0 for an unversioned database with tables, None for an empty one."""
+    tables = inspect(conn).get_table_names()
+    if "schema_version" in tables:
+        return conn.execute(text("SELECT version FROM schema_version")).scalar_one_or_none() or 0
+    return 0 if tables else None
+
+
+def _set_version(conn: Connection, version: int):
+    if conn.execute(text("UPDATE schema_version SET version = :version"), {"version": version}).rowcount == 0:
+        conn.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": version})
+
+
+def _upgrade(conn: Connection) -> int:
+    if conn.dialect.name == "postgresql":
+        # Serialize concurrently booting workers; released at commit
+        conn.execute(text("SELECT pg_advisory_xact_lock(872341)"))
+
+    # Read again under the lock, another worker may have just migrated
+    version = _read_version(conn)
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+
+    if version is None:
+        _create_missing_tables(conn)
+        for migration in MIGRATIONS:
+            if migration.on_create:
+                migration.upgrade(conn)
+        _set_version(conn, LATEST_VERSION)
+        logger.info(f"Created schema at version {LATEST_VERSION}")
+        return LATEST_VERSION
+
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        logger.info(f"Applying migration {migration.version}: {migration.description}")
+        migration.upgrade(conn)
+        _set_version(conn, migration.version)
+        version = migration.version
+    return version
+
+
+async def run_migrations(engine: AsyncEngine = default_engine) -> int:
+    """Bring the database to LATEST_VERSION; returns the version it is at."""
+    _load_models()
+    start = time.perf_counter()
+
+    # The common case: one query finds the schema current
+    try:
+        async with engine.connect() as conn:
+            version = (await conn.execute(text("SELECT version FROM schema_version"))).scalar_one_or_none()
+    except Exception:
+        version = None
+
+    if version != LATEST_VERSION:
+        if version is not None and version > LATEST_VERSION:
+            raise RuntimeError(
+                f"Database schema version {version} is newer than this code ({LATEST_VERSION})"
+            )
+        async with engine.begin() as conn:
+            version = await conn.run_sync(_upgrade)
+
+    metrics.observe("db.migration_check_ms", (time.perf_counter() - start) * 1000)
+    return version
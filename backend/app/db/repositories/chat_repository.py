@@ -1,35 +1,192 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import Select, select, delete, insert, update, or_, case, func
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
-from app.models.chat import ChatMessage, ChatSession, DBChatSession, DBChatMessage
+from app.config import SESSION_TITLE_MAX_CHARS
+from app.models.chat import ChatMessage, ChatSession, DBChatSession, DBChatMessage, MESSAGE_KIND, SUMMARY_KIND
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 from uuid import uuid4
 import logging
 
+from app.utils.pagination import Cursor
+
 logger = logging.getLogger(__name__)
 
+
+def session_title(content: str) -> str:
+    """First line-ish of a message, whitespace collapsed, cut to SESSION_TITLE_MAX_CHARS."""
+    title = " ".join(content.split())
+    if len(title) > SESSION_TITLE_MAX_CHARS:
+        title = title[:SESSION_TITLE_MAX_CHARS - 1].rstrip() + "\u2026"
+    return title
+
+
+def _session_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-session deltas for a batch of message rows: count, newest time, title candidate, creator."""
+    sessions: Dict[str, Dict[str, Any]] = {}
+    for row in sorted(rows, key=lambda row: row["created_at"]):
+        if row["kind"] != MESSAGE_KIND:
+            continue
+        session = sessions.get(row["session_id"])
+        if session is None:
+            session = sessions[row["session_id"]] = {
+                "id": row["session_id"],
+                "user_id": row["user_id"],
+                "created_at": row["created_at"],
+                "updated_at": row["created_at"],
+                "title": None,
+                "message_count": 0,
+                "last_message_at": row["created_at"],
+            }
+        session["message_count"] += 1
+        session["last_message_at"] = session["updated_at"] = row["created_at"]
+        if session["title"] is None and row["is_user"] and row["content"]:
+            session["title"] = session_title(row["content"])
+    return list(sessions.values())
+
+
+def _to_session(session: DBChatSession) -> ChatSession:
+    return ChatSession(
+        id=session.id,
+        user_id=session.user_id,
+        created_at=session.created_at,
+        updated_at=session.updated_at,
+        title=session.title,
+        message_count=session.message_count,
+        last_message_at=session.last_message_at
+    )
+
+
+def _to_message(message: DBChatMessage) -> ChatMessage:
+    return ChatMessage(
+        id=message.id,
+        session_id=message.session_id,
+        user_id=message.user_id,
+        is_user=message.is_user,
+        content=message.content,
+        created_at=message.created_at,
+        kind=message.kind,
+        summary_until=message.summary_until
+    )
+
+
+# Columns behind each field of the API models, for reads that skip the ORM
+MESSAGE_COLUMNS = tuple(DBChatMessage.__table__.c[name] for name in ChatMessage.model_fields)
+SESSION_COLUMNS = tuple(DBChatSession.__table__.c[name] for name in ChatSession.model_fields)
+
+
+def _rows(result) -> List[Dict[str, Any]]:
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+def _messages_page_query(query: Select, session_id: str, limit: int, cursor: Optional[Cursor]) -> Select:
+    query = query.filter(
+        DBChatMessage.session_id == session_id,
+        DBChatMessage.kind == MESSAGE_KIND
+    )
+    if cursor is not None:
+        created_at, message_id = cursor
+        # The leading >= lets the index seek straight to the cursor
+        query = query.filter(
+            DBChatMessage.created_at >= created_at,
+            or_(DBChatMessage.created_at > created_at, DBChatMessage.id > message_id)
+        )
+    return query.order_by(DBChatMessage.created_at, DBChatMessage.id).limit(limit)
+
+
+def _sessions_page_query(query: Select, limit: int, cursor: Optional[Cursor], user_id: Optional[str]) -> Select:
+    if user_id:
+        query = query.filter(DBChatSession.user_id == user_id)
+    if cursor is not None:
+        updated_at, session_id = cursor
+        query = query.filter(
+            DBChatSession.updated_at <= updated_at,
+            or_(DBChatSession.updated_at < updated_at, DBChatSession.id < session_id)
+        )
+    return query.order_by(DBChatSession.updated_at.desc(), DBChatSession.id.desc()).limit(limit)
+
+
 class ChatRepository:
     def __init__(self, db: AsyncSession):
        
         self.db = db
         logger.info("ChatRepository initialized with database session")
 
+    async def _upsert_sessions(self, rows: List[Dict[str, Any]]):
+        """
+        Create or update the sessions the message rows belong to, in the
+        caller's transaction: counts are added, the newest message time
+        wins, and the title is only filled in when still empty. The owner
+        is whoever wrote the first message and never changes afterwards.
+        """
+        sessions = _session_rows(rows)
+        if not sessions:
+            return
+
+        dialect = self.db.bind.dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            insert_fn = sqlite.insert if dialect == "sqlite" else postgresql.insert
+            stmt = insert_fn(DBChatSession).values(sessions)
+            newest = case(
+                (
+                    or_(
+                        DBChatSession.last_message_at.is_(None),
+                        stmt.excluded.last_message_at > DBChatSession.last_message_at
+                    ),
+                    stmt.excluded.last_message_at
+                ),
+                else_=DBChatSession.last_message_at
+            )
+            await self.db.execute(stmt.on_conflict_do_update(
+                index_elements=["id"],
+                set_={
+                    "message_count": DBChatSession.message_count + stmt.excluded.message_count,
+                    "last_message_at": newest,
+                    "updated_at": newest,
+                    "title": func.coalesce(DBChatSession.title, stmt.excluded.title),
+                }
+            ))
+            return
+
+        for session in sessions:
+            newest = case(
+                (DBChatSession.last_message_at > session["last_message_at"], DBChatSession.last_message_at),
+                else_=session["last_message_at"]
+            )
+            result = await self.db.execute(
+                update(DBChatSession)
+                .where(DBChatSession.id == session["id"])
+                .values(
+                    message_count=DBChatSession.message_count + session["message_count"],
+                    last_message_at=newest,
+                    updated_at=newest,
+                    title=func.coalesce(DBChatSession.title, session["title"])
+                )
+            )
+            if result.rowcount == 0:
+                await self.db.execute(insert(DBChatSession).values(session))
+
+    def _message_row(self, message: ChatMessage) -> Dict[str, Any]:
+        return {
+            "id": message.id or str(uuid4()),
+            "session_id": message.session_id or str(uuid4()),
+            "user_id": message.user_id,
+            "is_user": message.is_user,
+            "content": message.content,
+            "created_at": message.created_at or datetime.utcnow(),
+            "kind": message.kind,
+            "summary_until": message.summary_until
+        }
+
     async def add_message(self, message: ChatMessage) -> ChatMessage:
         
         try:
-            message_id = message.id or str(uuid4())
-            session_id = message.session_id or str(uuid4())
-            
-            db_message = DBChatMessage(
-                id=message_id,
-                session_id=session_id,
-                user_id=message.user_id,
-                is_user=message.is_user,
-                content=message.content,
-                created_at=message.created_at or datetime.utcnow()
-            )
-            
-            self.db.add(db_message)
+            row = self._message_row(message)
+            # Session first, so the message's foreign key is satisfied
+            await self._upsert_sessions([row])
+            await self.db.execute(insert(DBChatMessage).values([row]))
             await self.db.commit()
             
             return message
@@ -38,48 +195,182 @@ class ChatRepository:
             logger.error(f"Error adding message: {str(e)}")
             raise
 
-    async def get_messages_by_session(self, session_id: str):
+    async def add_messages(self, messages: List[ChatMessage]) -> List[ChatMessage]:
+        
+        if not messages:
+            return messages
+
+        try:
+            rows = [self._message_row(message) for message in messages]
+            # One session upsert per batch, in the same transaction as the rows
+            await self._upsert_sessions(rows)
+            await self.db.execute(insert(DBChatMessage).values(rows))
+            await self.db.commit()
+            return messages
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Error adding messages: {str(e)}")
+            raise
+
+    async def add_session(self, session: ChatSession) -> ChatSession:
+        
+        try:
+            self.db.add(DBChatSession(
+                id=session.id or str(uuid4()),
+                user_id=session.user_id,
+                created_at=session.created_at or datetime.utcnow(),
+                updated_at=session.updated_at or session.created_at or datetime.utcnow(),
+                title=session.title,
+                message_count=session.message_count,
+                last_message_at=session.last_message_at
+            ))
+            await self.db.commit()
+            return session
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Error adding session: {str(e)}")
+            raise
+
+    async def get_session(self, session_id: str) -> Optional[ChatSession]:
+        
+        try:
+            result = await self.db.execute(select(DBChatSession).filter(DBChatSession.id == session_id))
+            session = result.scalars().first()
+            return _to_session(session) if session is not None else None
+        except Exception as e:
+            logger.error(f"Error getting session: {str(e)}")
+            raise
+
+    async def get_messages_by_session(self, session_id: str, after: Optional[datetime] = None):
        
         try:
-            result = await self.db.execute(
-                select(DBChatMessage)
-                .filter(DBChatMessage.session_id == session_id)
-                .order_by(DBChatMessage.created_at)
+            query = select(DBChatMessage).filter(
+                DBChatMessage.session_id == session_id,
+                DBChatMessage.kind == MESSAGE_KIND
             )
+            if after is not None:
+                query = query.filter(DBChatMessage.created_at > after)
+            result = await self.db.execute(query.order_by(DBChatMessage.created_at))
             
             db_messages = result.scalars().all()
             
-            return [
-                ChatMessage(
-                    id=msg.id,
-                    session_id=msg.session_id,
-                    user_id=msg.user_id,
-                    is_user=msg.is_user,
-                    content=msg.content,
-                    created_at=msg.created_at
-                ) for msg in db_messages
-            ]
+            return [_to_message(msg) for msg in db_messages]
         except Exception as e:
             logger.error(f"Error getting messages: {str(e)}")
             raise
 
-    async def get_all_sessions(self):
+    async def get_recent_messages(
+        self,
+        session_id: str,
+        limit: int,
+        after: Optional[datetime] = None
+    ) -> List[ChatMessage]:
+        
+        try:
+            query = select(DBChatMessage).filter(
+                DBChatMessage.session_id == session_id,
+                DBChatMessage.kind == MESSAGE_KIND
+            )
+            if after is not None:
+                query = query.filter(DBChatMessage.created_at > after)
+            result = await self.db.execute(
+                query.order_by(DBChatMessage.created_at.desc()).limit(limit)
+            )
+
+            db_messages = result.scalars().all()
+
+            return [_to_message(msg) for msg in reversed(db_messages)]
+        except Exception as e:
+            logger.error(f"Error getting recent messages: {str(e)}")
+            raise
+
+    async def get_latest_summary(self, session_id: str) -> Optional[ChatMessage]:
+        
+        try:
+            result = await self.db.execute(
+                select(DBChatMessage)
+                .filter(DBChatMessage.session_id == session_id, DBChatMessage.kind == SUMMARY_KIND)
+                .order_by(DBChatMessage.summary_until.desc())
+                .limit(1)
+            )
+            msg = result.scalars().first()
+            return _to_message(msg) if msg is not None else None
+        except Exception as e:
+            logger.error(f"Error getting summary: {str(e)}")
+            raise
+
+    async def get_messages_page(
+        self,
+        session_id: str,
+        limit: int,
+        cursor: Optional[Cursor] = None
+    ) -> List[ChatMessage]:
+        """Up to `limit` messages ordered by (created_at, id), starting after cursor."""
+        try:
+            result = await self.db.execute(_messages_page_query(select(DBChatMessage), session_id, limit, cursor))
+
+            return [_to_message(msg) for msg in result.scalars().all()]
+        except Exception as e:
+            logger.error(f"Error getting messages page: {str(e)}")
+            raise
+
+    async def get_message_rows_page(
+        self,
+        session_id: str,
+        limit: int,
+        cursor: Optional[Cursor] = None
+    ) -> List[Dict[str, Any]]:
+        """get_messages_page as plain dicts of the ChatMessage fields, without ORM objects."""
+        try:
+            result = await self.db.execute(_messages_page_query(select(*MESSAGE_COLUMNS), session_id, limit, cursor))
+            return _rows(result)
+        except Exception as e:
+            logger.error(f"Error getting message rows page: {str(e)}")
+            raise
+
+    async def get_sessions_page(
+        self,
+        limit: int,
+        cursor: Optional[Cursor] = None,
+        user_id: Optional[str] = None
+    ) -> List[ChatSession]:
+        """
+        Up to `limit` sessions, most recently active first by (updated_at, id),
+        starting after cursor. Served from chat_sessions alone.
+        """
+        try:
+            result = await self.db.execute(_sessions_page_query(select(DBChatSession), limit, cursor, user_id))
+
+            return [_to_session(session) for session in result.scalars().all()]
+        except Exception as e:
+            logger.error(f"Error getting sessions page: {str(e)}")
+            raise
+
+    async def get_session_rows_page(
+        self,
+        limit: int,
+        cursor: Optional[Cursor] = None,
+        user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """get_sessions_page as plain dicts of the ChatSession fields, without ORM objects."""
+        try:
+            result = await self.db.execute(_sessions_page_query(select(*SESSION_COLUMNS), limit, cursor, user_id))
+            return _rows(result)
+        except Exception as e:
+            logger.error(f"Error getting session rows page: {str(e)}")
+            raise
+
+    async def get_all_sessions(self, user_id: Optional[str] = None) -> List[ChatSession]:
        
         try:
+            query = select(DBChatSession)
+            if user_id:
+                query = query.filter(DBChatSession.user_id == user_id)
             result = await self.db.execute(
-                select(DBChatSession).order_by(DBChatSession.created_at.desc())
+                query.order_by(DBChatSession.updated_at.desc(), DBChatSession.id.desc())
             )
             
-            db_sessions = result.scalars().all()
-            
-            return [
-                ChatSession(
-                    id=session.id,
-                    user_id=session.user_id,
-                    created_at=session.created_at,
-                    updated_at=session.updated_at
-                ) for session in db_sessions
-            ]
+            return [_to_session(session) for session in result.scalars().all()]
         except Exception as e:
             logger.error(f"Error getting sessions: {str(e)}")
             raise
@@ -0,0 +1,153 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.config import SEARCH_LANGUAGE, SEARCH_SNIPPET_TOKENS
+from app.models.search import SearchHit
+from app.utils.pagination import RankCursor
+from typing import List, Optional
+import html
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Match markers put around hits by snippet()/ts_headline(), swapped for
+# <mark> tags once the rest of the text has been HTML-escaped
+_START, _STOP = "\x02", "\x03"
+
+_TERM = re.compile(r"(\w+)(\*?)", re.UNICODE)
+
+
+class SearchUnavailableError(Exception):
+    """The database has no full-text index (unsupported dialect or SQLite without FTS5)."""
+
+
+def fts5_query(query: str, user_id: str) -> Optional[str]:
+    """
+    Build an FTS5 MATCH expression from free text: every word must occur,
+    a trailing * makes a word a prefix, and everything else is treated as
+    plain text rather than query syntax. None if there are no words.
+    """
+    terms = [f'"{word}"{star}' for word, star in _TERM.findall(query)]
+    if not terms:
+        return None
+    owner = '"' + user_id.replace('"', '""') + '"'
+    return f"user_id : {owner} AND content : ({' AND '.join(terms)})"
+
+
+def _highlight(snippet: Optional[str]) -> str:
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+class SearchRepository:
+    def __init__(self, db: AsyncSession):
+
+        self.db = db
+
+    async def search_messages(
+        self,
+        user_id: str,
+        query: str,
+        limit: int,
+        cursor: Optional[RankCursor] = None
+    ) -> List[SearchHit]:
+        """
+        The user's messages matching query, most relevant first, as
+        (rank, id)-ordered keyset pages starting after cursor.
+        """
+        dialect = self.db.bind.dialect.name
+        try:
+            if dialect == "sqlite":
+                rows = await self._search_sqlite(user_id, query, limit, cursor)
+            elif dialect == "postgresql":
+                rows = await self._search_postgresql(user_id, query, limit, cursor)
+            else:
+                raise SearchUnavailableError(f"Full-text search is not supported on {dialect}")
+        except OperationalError as e:
+            if "chat_messages_fts" in str(e):
+                raise SearchUnavailableError("The full-text index has not been created")
+            logger.error(f"Error searching messages: {str(e)}")
+            raise
+        except SearchUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Error searching messages: {str(e)}")
+            raise
+
+        return [
+            SearchHit(
+                message_id=row.id,
+                session_id=row.session_id,
+                session_title=row.title,
+                is_user=bool(row.is_user),
+                created_at=row.created_at,
+                snippet=_highlight(row.snippet),
+                rank=row.rank
+            ) for row in rows
+        ]
+
+    async def _search_sqlite(self, user_id: str, query: str, limit: int, cursor: Optional[RankCursor]):
+        match = fts5_query(query, user_id)
+        if match is None:
+            return []
+
+        params = {"match": match, "user_id": user_id, "limit": limit, "tokens": SEARCH_SNIPPET_TOKENS}
+        after = ""
+        if cursor is not None:
+            after = "AND (f.rank > :rank OR (f.rank = :rank AND m.id > :after_id))"
+            params["rank"], params["after_id"] = cursor
+
+        # bm25 rank: lower is more relevant. The MATCH narrows to the user
+        # inside the index; the m.user_id check makes the scoping exact.
+        result = await self.db.execute(text(f"""
+            SELECT m.id, m.session_id, m.is_user, m.created_at, s.title,
+                   snippet(chat_messages_fts, 0, char(2), char(3), '…', :tokens) AS snippet,
+                   f.rank AS rank
+            FROM chat_messages_fts AS f
+            JOIN chat_messages AS m ON m.search_rowid = f.rowid
+            LEFT JOIN chat_sessions AS s ON s.id = m.session_id
+            WHERE chat_messages_fts MATCH :match AND m.user_id = :user_id {after}
+            ORDER BY f.rank, m.id
+            LIMIT :limit
+        """), params)
+        return result.all()
+
+    async def _search_postgresql(self, user_id: str, query: str, limit: int, cursor: Optional[RankCursor]):
+        params = {
+            "query": query,
+            "language": SEARCH_LANGUAGE,
+            "user_id": user_id,
+            "limit": limit,
+            "headline": f"StartSel={_START}, StopSel={_STOP}, MaxWords={SEARCH_SNIPPET_TOKENS}, "
+                        f"MinWords={max(1, SEARCH_SNIPPET_TOKENS // 2)}, MaxFragments=1",
+        }
+        after = ""
+        if cursor is not None:
+            after = "WHERE rank > :rank OR (rank = :rank AND id > :after_id)"
+            params["rank"], params["after_id"] = cursor
+
+        # ts_rank is negated so lower is more relevant, as with bm25, and
+        # headlines are only built for the rows on the page.
+        result = await self.db.execute(text(f"""
+            WITH q AS (
+                SELECT websearch_to_tsquery(CAST(:language AS regconfig), :query) AS query
+            ), hits AS (
+                SELECT m.id, -ts_rank(m.search_vector, q.query)::float8 AS rank
+                FROM chat_messages AS m, q
+                WHERE m.search_vector @@ q.query AND m.user_id = :user_id AND m.kind = 'message'
+            ), page AS (
+                SELECT id, rank FROM hits {after}
+                ORDER BY rank, id
+                LIMIT :limit
+            )
+            SELECT m.id, m.session_id, m.is_user, m.created_at, s.title,
+                   ts_headline(CAST(:language AS regconfig), m.content, q.query, :headline) AS snippet,
+                   page.rank
+            FROM page
+            JOIN chat_messages AS m ON m.id = page.id
+            CROSS JOIN q
+            LEFT JOIN chat_sessions AS s ON s.id = m.session_id
+            ORDER BY page.rank, page.id
+        """), params)
+        return result.all()
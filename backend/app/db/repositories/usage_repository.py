@@ -0,0 +1,121 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, insert, func
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.usage import DBUsageRollup, UsageRow, UsageTotals
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_KEY_COLUMNS = ("day", "user_id", "session_id", "model")
+_SUM_COLUMNS = ("requests", "prompt_tokens", "completion_tokens", "total_tokens", "latency_ms")
+
+
+class UsageRepository:
+    def __init__(self, db: AsyncSession):
+
+        self.db = db
+
+    async def upsert_rollups(self, rows: List[Dict[str, Any]]):
+        """Add each row's counters onto the stored rollup with the same key, creating it if needed."""
+        if not rows:
+            return
+
+        try:
+            dialect = self.db.bind.dialect.name
+            if dialect in ("sqlite", "postgresql"):
+                insert_fn = sqlite.insert if dialect == "sqlite" else postgresql.insert
+                stmt = insert_fn(DBUsageRollup).values(rows)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=list(_KEY_COLUMNS),
+                    set_={
+                        column: getattr(DBUsageRollup, column) + getattr(stmt.excluded, column)
+                        for column in _SUM_COLUMNS
+                    }
+                )
+                await self.db.execute(stmt)
+            else:
+                for row in rows:
+                    result = await self.db.execute(
+                        update(DBUsageRollup)
+                        .where(*(getattr(DBUsageRollup, column) == row[column] for column in _KEY_COLUMNS))
+                        .values({
+                            column: getattr(DBUsageRollup, column) + row[column]
+                            for column in _SUM_COLUMNS
+                        })
+                    )
+                    if result.rowcount == 0:
+                        await self.db.execute(insert(DBUsageRollup).values(row))
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Error saving usage rollups: {str(e)}")
+            raise
+
+    async def get_usage(
+        self,
+        group_by: Tuple[str, ...],
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        order_by_tokens: bool = False,
+        limit: Optional[int] = None
+    ) -> List[UsageRow]:
+        """Summed usage grouped by any of day, user_id, session_id and model."""
+        try:
+            keys = [getattr(DBUsageRollup, column) for column in group_by]
+            total_tokens = func.sum(DBUsageRollup.total_tokens).label("total_tokens")
+            query = select(
+                *keys,
+                func.sum(DBUsageRollup.requests).label("requests"),
+                func.sum(DBUsageRollup.prompt_tokens).label("prompt_tokens"),
+                func.sum(DBUsageRollup.completion_tokens).label("completion_tokens"),
+                total_tokens,
+                func.sum(DBUsageRollup.latency_ms).label("latency_ms")
+            )
+
+            if user_id is not None:
+                query = query.where(DBUsageRollup.user_id == user_id)
+            if session_id is not None:
+                query = query.where(DBUsageRollup.session_id == session_id)
+            if start is not None:
+                query = query.where(DBUsageRollup.day >= start)
+            if end is not None:
+                query = query.where(DBUsageRollup.day <= end)
+
+            if keys:
+                query = query.group_by(*keys)
+            query = query.order_by(total_tokens.desc()) if order_by_tokens else query.order_by(*keys)
+            if limit is not None:
+                query = query.limit(limit)
+
+            result = await self.db.execute(query)
+            rows = []
+            for row in result.mappings():
+                if not row["requests"]:
+                    continue
+                rows.append(UsageRow(
+                    **{column: row[column] for column in group_by},
+                    requests=row["requests"],
+                    prompt_tokens=row["prompt_tokens"],
+                    completion_tokens=row["completion_tokens"],
+                    total_tokens=row["total_tokens"],
+                    avg_latency_ms=round(row["latency_ms"] / row["requests"], 1)
+                ))
+            return rows
+        except Exception as e:
+            logger.error(f"Error getting usage: {str(e)}")
+            raise
+
+    @staticmethod
+    def totals(rows: List[UsageRow]) -> UsageTotals:
+        requests = sum(row.requests for row in rows)
+        return UsageTotals(
+            requests=requests,
+            prompt_tokens=sum(row.prompt_tokens for row in rows),
+            completion_tokens=sum(row.completion_tokens for row in rows),
+            total_tokens=sum(row.total_tokens for row in rows),
+            avg_latency_ms=round(sum(row.avg_latency_ms * row.requests for row in rows) / requests, 1) if requests else 0.0
+        )
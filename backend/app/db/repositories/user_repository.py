@@ -1,12 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.exc import SQLAlchemyError  
 import logging
-from typing import Optional
+from typing import Dict, Optional
+import time
 import uuid
 
-from app.models.user import DBUser, UserCreate
-from app.utils.security import get_password_hash
+from app.models.user import DBRevokedToken, DBUser, UserCreate
+from app.services.principal_cache import principal_cache
+from app.utils.security import password_hasher
 
 logger = logging.getLogger(__name__)
 
@@ -48,7 +50,7 @@ class UserRepository:
                 user_id = str(uuid.uuid4())
                 
             # Hash the password  
-            hashed_password = get_password_hash(user_data.password)
+            hashed_password = await password_hasher.hash(user_data.password)
             
             # Create new user
             db_user = DBUser(
@@ -78,12 +80,14 @@ class UserRepository:
             if not user:
                 return None
                 
+            previous_email = user.email
             for key, value in update_data.items():
                 if hasattr(user, key):
                     setattr(user, key, value)
             
             await self.db.commit()
             await self.db.refresh(user)
+            principal_cache.evict(previous_email, user.email)
             return user
         
         except SQLAlchemyError as e:
@@ -103,6 +107,8 @@ class UserRepository:
             user.is_active = False
             await self.db.commit()
             await self.db.refresh(user)
+            # Cached principals would keep authenticating the account until they expire
+            principal_cache.evict(user.email)
             return user
         
         except SQLAlchemyError as e:
@@ -130,14 +136,42 @@ class UserRepository:
             if not user:
                 return None
             
-            hashed_password = get_password_hash(new_password)
+            hashed_password = await password_hasher.hash(new_password)
             user.hashed_password = hashed_password
             await self.db.commit()
             await self.db.refresh(user)
+            principal_cache.evict(user.email)
             return user
         
         except SQLAlchemyError as e:
             await self.db.rollback()
             logger.error(f"Database error in change_password: {str(e)}")
             raise
-            
+
+    async def revoke_token(self, jti: str, expires_at: float):
+        """
+        Persist a revoked jti so every worker, and this one after a restart,
+        denies it; rows of tokens that have expired since are dropped.
+        """
+        try:
+            await self.db.execute(delete(DBRevokedToken).where(DBRevokedToken.expires_at <= time.time()))
+            await self.db.merge(DBRevokedToken(jti=jti, expires_at=expires_at))
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Database error in revoke_token: {str(e)}")
+            raise
+
+    async def get_revoked_tokens(self) -> Dict[str, float]:
+        """
+        Revoked jtis of tokens that have not expired yet, with their expiry
+        """
+        try:
+            query = select(DBRevokedToken.jti, DBRevokedToken.expires_at).where(
+                DBRevokedToken.expires_at > time.time()
+            )
+            result = await self.db.execute(query)
+            return {jti: expires_at for jti, expires_at in result.all()}
+        except SQLAlchemyError as e:
+            logger.error(f"Database error in get_revoked_tokens: {str(e)}")
+            raise
@@ -1,21 +1,44 @@
 # app/main.py
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from app.services.groq_service import GroqService
 from app.services.chat_service import ChatService
+from app.services.message_write_queue import MessageWriteQueue
+from app.services.context_builder import ContextBuilder
+from app.services.compaction import ConversationCompactor
+from app.services.history_cache import HistoryCache
+from app.services.batch_service import BatchCompletionService
+from app.services.usage_tracker import usage_tracker
+from app.services.principal_cache import principal_cache
+from app.services.history_export import next_cursor, page_json, stream_ndjson
 from app.db.repositories.chat_repository import ChatRepository
-from app.models.chat import ChatMessage, ChatSession
-from app.db.database import init_db, get_db, engine
-from app.api.routes.auth import router as auth_router
+from app.models.chat import ChatMessagePage, ChatSessionPage
+from app.models.batch import BatchCompletionRequest
+from app.db.database import init_db, get_db, session_scope
+from app.api.routes.auth import router as auth_router, get_admin_user, get_current_user, get_websocket_user
+from app.api.routes.usage import router as usage_router
+from app.api.routes.search import router as search_router
+from app.api.websockets.chat_connection import ChatConnection
+from app.utils.metrics import metrics
+from app.utils.security import password_hasher
+from app.config import (
+    PERSISTENCE_WRITE_BEHIND,
+    HISTORY_CACHE_ENABLED,
+    HISTORY_FAST_JSON,
+    HISTORY_PAGE_DEFAULT_LIMIT,
+    HISTORY_PAGE_MAX_LIMIT
+)
+from app.utils.pagination import decode_cursor
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import DBUser  
 from app.models.chat import DBChatSession, DBChatMessage  
 
-from typing import List
+from typing import Optional
+from contextlib import asynccontextmanager
 import logging
 import uuid
 import traceback
-from datetime import datetime
 
 logging.basicConfig(
     level=logging.INFO,
@@ -38,89 +61,69 @@ app.add_middleware(
 )
 
 app.include_router(auth_router)
+app.include_router(usage_router)
+app.include_router(search_router)
 
 groq_service = GroqService()
+message_write_queue = MessageWriteQueue() if PERSISTENCE_WRITE_BEHIND else None
+context_builder = ContextBuilder()
+metrics.register_collector("context_cache", context_builder.stats)
+history_cache = HistoryCache() if HISTORY_CACHE_ENABLED else None
+if history_cache is not None:
+    metrics.register_collector("history_cache", history_cache.stats)
+metrics.register_collector("password_hasher", password_hasher.stats)
+metrics.register_collector("principal_cache", principal_cache.stats)
 
 @app.on_event("startup")
 async def startup_event():
    
-    async with engine.begin() as conn:
-        from app.models.user import DBUser
-        from app.models.chat import DBChatSession, DBChatMessage
-        
-        await conn.run_sync(DBUser.metadata.create_all)
-        await conn.run_sync(DBChatSession.metadata.create_all)
-        await conn.run_sync(DBChatMessage.metadata.create_all)
-    
-    logger.info("Database tables created successfully")
+    version = await init_db()
+    logger.info(f"Database schema at version {version}")
 
-@app.websocket("/ws/chat")
-async def chat_websocket(websocket: WebSocket, db: AsyncSession = Depends(get_db)):
-    chat_repository = ChatRepository(db)
-    chat_service = ChatService(chat_repository)
+    if message_write_queue is not None:
+        await message_write_queue.start()
+    await usage_tracker.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if message_write_queue is not None:
+        await message_write_queue.stop()
+    await usage_tracker.stop()
+    password_hasher.shutdown()
 
+@asynccontextmanager
+async def chat_service_scope():
+    async with session_scope() as db:
+        yield ChatService(ChatRepository(db), write_queue=message_write_queue, history_cache=history_cache)
+
+compactor = ConversationCompactor(groq_service, chat_service_scope, context_builder)
+context_builder.on_compaction_needed = compactor.schedule
+metrics.register_collector("compaction", compactor.stats)
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket, user: Optional[DBUser] = Depends(get_websocket_user)):
     session_id = str(uuid.uuid4())
+    connection = ChatConnection(
+        websocket, session_id, chat_service_scope, groq_service, context_builder,
+        user_id=user.id if user is not None else None
+    )
     
     try:
-        await websocket.accept()
-        
-        await websocket.send_json({
-            "type": "connection_established",
-            "session_id": session_id
-        })
+        await connection.accept()
         
         while True:
             try:
+                # Malformed JSON and binary frames get an error frame; the socket stays open
                 data = await websocket.receive_json()
-                
-                if not isinstance(data, dict):
-                    raise ValueError("Invalid message format")
-                
-                if 'message' not in data:
-                    raise ValueError("No message content provided")
-                
-                current_session_id = data.get('session_id', session_id)
-                
-                user_message = ChatMessage(
-                    session_id=current_session_id,
-                    content=data['message'],
-                    is_user=True,
-                    created_at=datetime.utcnow()
-                )
-                await chat_service.save_message(user_message)
-                
-                await websocket.send_json({
-                    "type": "message_received", 
-                    "session_id": current_session_id
-                })
-                
-                full_response = ""
-                async for token in groq_service.stream_completion(data['message']):
-                    await websocket.send_json({
-                        "type": "token",
-                        "content": token,
-                        "session_id": current_session_id
-                    })
-                    full_response += token
-                
-                ai_message = ChatMessage(
-                    session_id=current_session_id,
-                    content=full_response,
-                    is_user=False,
-                    created_at=datetime.utcnow()
-                )
-                await chat_service.save_message(ai_message)
-                
-                await websocket.send_json({
-                    "type": "completion", 
-                    "session_id": current_session_id
-                })
-                
+                await connection.handle_frame(data)
+
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
                 logger.error(f"Error processing message: {str(e)}")
                 logger.error(traceback.format_exc())
                 
-                await websocket.send_json({
+                await connection.send({
                     "type": "error",
                     "message": str(e),
                     "session_id": session_id
@@ -132,25 +135,100 @@ async def chat_websocket(websocket: WebSocket, db: AsyncSession = Depends(get_db
         logger.error(f"Unexpected WebSocket error: {str(e)}")
         logger.error(traceback.format_exc())
     finally:
+        await connection.close()
         try:
             await websocket.close()
         except Exception:
             pass
 
-@app.get("/api/chats", response_model=List[ChatSession])
-async def get_chat_sessions(db: AsyncSession = Depends(get_db)):
-    chat_repository = ChatRepository(db)
-    chat_service = ChatService(chat_repository)
-    return await chat_service.get_all_sessions()
-
-@app.get("/api/chats/{session_id}/messages", response_model=List[ChatMessage])
-async def get_chat_messages(session_id: str, db: AsyncSession = Depends(get_db)):
-    chat_repository = ChatRepository(db)
-    chat_service = ChatService(chat_repository)
-    messages = await chat_service.get_chat_history(session_id)
-    if not messages:
+def _parse_cursor(cursor: Optional[str]):
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/chats", response_model=ChatSessionPage)
+async def get_chat_sessions(
+    cursor: Optional[str] = None,
+    limit: int = Query(HISTORY_PAGE_DEFAULT_LIMIT, ge=1, le=HISTORY_PAGE_MAX_LIMIT),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # The signed-in user's sessions, most recently active first; pass next_cursor back to get the following page
+    start = _parse_cursor(cursor)
+    user_id = current_user.id
+
+    if format == "ndjson":
+        async def fetch_page(page_cursor, page_limit):
+            async with chat_service_scope() as chat_service:
+                return await chat_service.get_sessions_page(page_limit, page_cursor, user_id)
+
+        return StreamingResponse(stream_ndjson(fetch_page, start), media_type="application/x-ndjson")
+
+    chat_service = ChatService(ChatRepository(db), write_queue=message_write_queue, history_cache=history_cache)
+    if HISTORY_FAST_JSON:
+        # Same body as ChatSessionPage, from column rows without ORM objects or model validation
+        rows = await chat_service.get_sessions_page_rows(limit, start, user_id)
+        return Response(page_json(rows, limit, "updated_at"), media_type="application/json")
+
+    sessions = await chat_service.get_sessions_page(limit, start, user_id)
+    return ChatSessionPage(items=sessions, next_cursor=next_cursor(sessions, limit))
+
+@app.get("/api/chats/{session_id}/messages", response_model=ChatMessagePage)
+async def get_chat_messages(
+    session_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(HISTORY_PAGE_DEFAULT_LIMIT, ge=1, le=HISTORY_PAGE_MAX_LIMIT),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Oldest first; pass next_cursor back to get the following page
+    start = _parse_cursor(cursor)
+    chat_service = ChatService(ChatRepository(db), write_queue=message_write_queue, history_cache=history_cache)
+    session = await chat_service.get_session(session_id)
+    # Other users' sessions are reported as missing rather than forbidden
+    if session is None or session.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Chat session not found")
-    return messages
+
+    if format == "ndjson":
+        # Existence is settled above, so the first page is only read by the stream
+        async def fetch_page(page_cursor, page_limit):
+            async with chat_service_scope() as chat_service:
+                return await chat_service.get_history_page(session_id, page_limit, page_cursor)
+
+        return StreamingResponse(stream_ndjson(fetch_page, start), media_type="application/x-ndjson")
+
+    if HISTORY_FAST_JSON:
+        # Same body as ChatMessagePage, from column rows without ORM objects or model validation
+        rows = await chat_service.get_history_page_rows(session_id, limit, start)
+        return Response(page_json(rows, limit, "created_at"), media_type="application/json")
+
+    messages = await chat_service.get_history_page(session_id, limit, start)
+    return ChatMessagePage(items=messages, next_cursor=next_cursor(messages, limit))
+
+@app.post("/api/batch/completions")
+async def batch_completions(
+    request: BatchCompletionRequest,
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Items may only name the caller's own sessions (or new ones), since usage and saved messages land there
+    chat_service = ChatService(ChatRepository(db), write_queue=message_write_queue, history_cache=history_cache)
+    for session_id in {item.session_id for item in request.items if item.session_id}:
+        session = await chat_service.get_session(session_id)
+        if session is not None and session.user_id != current_user.id:
+            raise HTTPException(status_code=404, detail=f"Chat session not found: {session_id}")
+
+    # One NDJSON line per item as it finishes, then a summary line
+    batch_service = BatchCompletionService(groq_service, chat_service_scope)
+    return StreamingResponse(batch_service.stream(request, current_user.id), media_type="application/x-ndjson")
+
+@app.get("/metrics")
+async def get_metrics(admin: DBUser = Depends(get_admin_user)):
+    # Admins only: the snapshot describes every user's traffic
+    return metrics.snapshot()
 
 @app.get("/health")
 async def health_check():
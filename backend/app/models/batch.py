@@ -0,0 +1,17 @@
+# app/models/batch.py
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+from app.config import BATCH_MAX_ITEMS
+
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    prompt: str = Field(..., min_length=1)
+    session_id: Optional[str] = None
+
+
+class BatchCompletionRequest(BaseModel):
+    items: List[BatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    concurrency: Optional[int] = Field(default=None, ge=1)
+    persist: bool = False
@@ -1,5 +1,5 @@
 # app/models/chat.py
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Index, Integer
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, Field
 from datetime import datetime
@@ -7,6 +7,9 @@ from typing import Optional, List
 from app.db.database import Base
 from uuid import uuid4
 
+MESSAGE_KIND = "message"
+SUMMARY_KIND = "summary"
+
 class DBChatSession(Base):
     __tablename__ = "chat_sessions"
     
@@ -14,9 +17,20 @@ class DBChatSession(Base):
     user_id = Column(String, index=True, nullable=True)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    # Maintained with every message write so listings never read chat_messages
+    title = Column(String, nullable=True)
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(DateTime, nullable=True)
     
     messages = relationship("DBChatMessage", back_populates="session", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of the session list, most recently active first
+        Index("ix_chat_sessions_updated_at_id", "updated_at", "id"),
+        # The same for one user's sessions
+        Index("ix_chat_sessions_user_id_updated_at_id", "user_id", "updated_at", "id"),
+    )
+
 class DBChatMessage(Base):
     __tablename__ = "chat_messages"
     
@@ -26,9 +40,20 @@ class DBChatMessage(Base):
     is_user = Column(Boolean, default=True)
     content = Column(Text)
     created_at = Column(DateTime, default=datetime.now)
+    # "message" for conversation turns, "summary" for compacted history
+    kind = Column(String, nullable=False, default=MESSAGE_KIND, server_default=MESSAGE_KIND)
+    # For summaries: created_at of the newest message the summary covers
+    summary_until = Column(DateTime, nullable=True)
     
     session = relationship("DBChatSession", back_populates="messages")
 
+    __table_args__ = (
+        # History fetches and keyset pagination of a session
+        Index("ix_chat_messages_session_created_at_id", "session_id", "created_at", "id"),
+        # Latest compaction summary of a session
+        Index("ix_chat_messages_session_kind_summary_until", "session_id", "kind", "summary_until"),
+    )
+
 class ChatMessage(BaseModel):
     id: Optional[str] = Field(default_factory=lambda: str(uuid4()))
     session_id: Optional[str] = None
@@ -36,6 +61,8 @@ class ChatMessage(BaseModel):
     is_user: bool = True
     content: str = ''
     created_at: Optional[datetime] = None
+    kind: str = MESSAGE_KIND
+    summary_until: Optional[datetime] = None
     
     class Config:
         from_attributes = True
@@ -45,10 +72,21 @@ class ChatSession(BaseModel):
     user_id: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    title: Optional[str] = None
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
 class ChatHistoryResponse(BaseModel):
     session_id: str
-    messages: List[ChatMessage] = []
\ No newline at end of file
+    messages: List[ChatMessage] = []
+
+class ChatMessagePage(BaseModel):
+    items: List[ChatMessage] = []
+    next_cursor: Optional[str] = None
+
+class ChatSessionPage(BaseModel):
+    items: List[ChatSession] = []
+    next_cursor: Optional[str] = None
@@ -0,0 +1,22 @@
+# app/models/search.py
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+
+class SearchHit(BaseModel):
+    message_id: str
+    session_id: Optional[str] = None
+    session_title: Optional[str] = None
+    is_user: bool = True
+    created_at: Optional[datetime] = None
+    # HTML-escaped excerpt with matches wrapped in <mark></mark>
+    snippet: str = ""
+    # Lower is more relevant
+    rank: float = 0.0
+
+
+class SearchResults(BaseModel):
+    query: str
+    items: List[SearchHit] = []
+    next_cursor: Optional[str] = None
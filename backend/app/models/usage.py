@@ -0,0 +1,42 @@
+# app/models/usage.py
+from sqlalchemy import Column, String, Integer, Float, Date
+from pydantic import BaseModel
+from datetime import date
+from typing import List, Optional
+from app.db.database import Base
+
+
+class DBUsageRollup(Base):
+    """Token usage summed per day, user, session and model; unknown ids are stored as ""."""
+
+    __tablename__ = "usage_rollups"
+
+    day = Column(Date, primary_key=True)
+    user_id = Column(String, primary_key=True, default="")
+    session_id = Column(String, primary_key=True, default="")
+    model = Column(String, primary_key=True, default="")
+    requests = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Float, nullable=False, default=0.0)
+
+
+class UsageTotals(BaseModel):
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    avg_latency_ms: float = 0.0
+
+
+class UsageRow(UsageTotals):
+    day: Optional[date] = None
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
+    model: Optional[str] = None
+
+
+class UsageReport(BaseModel):
+    totals: UsageTotals
+    rows: List[UsageRow] = []
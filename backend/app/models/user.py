@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime
+from sqlalchemy import Column, String, Boolean, DateTime, Float
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -14,6 +14,14 @@ class DBUser(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=True)
 
+class DBRevokedToken(Base):
+    """A logged-out token's jti, denied until expires_at (unix time), when the token stops being valid anyway."""
+
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    expires_at = Column(Float, nullable=False, index=True)
+
 class UserCreate(BaseModel):
     email: str
     password: constr(min_length=8) 
@@ -1,7 +1,6 @@
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, status
 import os
 from logging import getLogger
@@ -9,13 +8,15 @@ from uuid import uuid4
 
 from app.models.user import UserCreate, DBUser
 from app.db.repositories.user_repository import UserRepository
+from app.services.principal_cache import principal_cache
+from app.utils.security import PasswordHasherBusyError, password_hasher, pwd_context
 
 logger = getLogger(__name__)
 
 class AuthService:
     def __init__(self, user_repository: UserRepository):
         self.user_repository = user_repository
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.pwd_context = pwd_context
         
         self.SECRET_KEY = os.getenv("SECRET_KEY")
         if not self.SECRET_KEY:
@@ -24,15 +25,17 @@ class AuthService:
         self.ALGORITHM = os.getenv("ALGORITHM", "HS256")
         self.ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         try:
-            return self.pwd_context.verify(plain_password, hashed_password)
+            return await password_hasher.verify(plain_password, hashed_password)
+        except PasswordHasherBusyError:
+            raise
         except Exception as e:
             logger.error(f"Password verification error: {str(e)}")
             return False
 
-    def get_password_hash(self, password: str) -> str:
-        return self.pwd_context.hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        return await password_hasher.hash(password)
 
     async def authenticate_user(self, email: str, password: str) -> Optional[DBUser]:
         try:
@@ -40,7 +43,7 @@ class AuthService:
             if not user:
                 return None
                 
-            if not self.verify_password(password, user.hashed_password):
+            if not await self.verify_password(password, user.hashed_password):
                 return None
                 
             if not user.is_active:
@@ -51,6 +54,8 @@ class AuthService:
                 
             return user
             
+        except PasswordHasherBusyError:
+            raise
         except Exception as e:
             logger.error(f"Authentication error: {str(e)}")
             raise HTTPException(
@@ -117,25 +122,31 @@ class AuthService:
             )
 
     async def verify_token(self, token: str) -> Optional[DBUser]:
+        """
+        The active user a token authenticates as, or None. Repeated calls
+        are served from principal_cache; revoked tokens are rejected.
+        """
         try:
-            payload = jwt.decode(
-                token, 
-                self.SECRET_KEY, 
-                algorithms=[self.ALGORITHM]
-            )
-            
+            await principal_cache.sync_revocations(self.user_repository)
+            payload = principal_cache.decode(token, self.SECRET_KEY, self.ALGORITHM)
+
             email: str = payload.get("sub")
             if not email:
                 return None
-                
-            user = await self.user_repository.get_user_by_email(email)
+
+            user = principal_cache.get_principal(email)
+            if user is None:
+                generation = principal_cache.generation()
+                user = await self.user_repository.get_user_by_email(email)
+                if user is not None:
+                    user = principal_cache.put_principal(email, user, generation)
             if not user or not user.is_active:
                 return None
-                
+
             return user
-            
+
         except JWTError:
             return None
         except Exception as e:
             logger.error(f"Token verification error: {str(e)}")
-            return None
\ No newline at end of file
+            return None
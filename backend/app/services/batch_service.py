@@ -0,0 +1,145 @@
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncContextManager, AsyncIterator, Callable, Dict
+import json
+import logging
+import time
+import uuid
+
+from app.config import BATCH_DEFAULT_CONCURRENCY, BATCH_MAX_CONCURRENCY
+from app.models.batch import BatchCompletionRequest, BatchItem
+from app.models.chat import ChatMessage
+from app.services.chat_service import ChatService
+from app.services.groq_service import GroqService
+from app.services.rate_limiter import PRIORITY_BULK
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class BatchCompletionService:
+    """
+    Runs a batch of prompts through GroqService.get_completion.
+
+    A fixed number of workers pull items, so a large batch never has more
+    than `concurrency` requests in flight, and every request is scheduled at
+    bulk priority behind interactive chat turns. Results are yielded as
+    NDJSON lines in completion order; a failed item produces an error line
+    and does not stop the batch.
+    """
+
+    def __init__(
+        self,
+        groq_service: GroqService,
+        chat_service_scope: Callable[[], AsyncContextManager[ChatService]]
+    ):
+        self.groq_service = groq_service
+        self.chat_service_scope = chat_service_scope
+
+    def _concurrency(self, request: BatchCompletionRequest) -> int:
+        requested = request.concurrency or BATCH_DEFAULT_CONCURRENCY
+        return max(1, min(requested, BATCH_MAX_CONCURRENCY, len(request.items)))
+
+    async def _persist(self, session_id: str, prompt: str, content: str, user_id: str):
+        async with self.chat_service_scope() as chat_service:
+            await chat_service.save_message(ChatMessage(
+                session_id=session_id,
+                user_id=user_id,
+                content=prompt,
+                is_user=True,
+                created_at=datetime.utcnow()
+            ))
+            await chat_service.save_message(ChatMessage(
+                session_id=session_id,
+                user_id=user_id,
+                content=content,
+                is_user=False,
+                created_at=datetime.utcnow()
+            ))
+
+    async def _run_item(
+        self,
+        index: int,
+        item: BatchItem,
+        request: BatchCompletionRequest,
+        user_id: str
+    ) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"type": "result", "index": index, "id": item.id}
+        session_id = item.session_id or (str(uuid.uuid4()) if request.persist else None)
+        start = time.perf_counter()
+        try:
+            content = await self.groq_service.get_completion(
+                item.prompt,
+                user_id=user_id,
+                priority=PRIORITY_BULK,
+                session_id=session_id
+            )
+            result["content"] = content
+
+            if request.persist:
+                await self._persist(session_id, item.prompt, content, user_id)
+                result["session_id"] = session_id
+
+            result["status"] = "ok"
+            metrics.increment("batch.items_succeeded")
+        except Exception as e:
+            logger.error(f"Batch item {index} failed: {str(e)}")
+            result["status"] = "error"
+            result["error"] = str(e)
+            metrics.increment("batch.items_failed")
+
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    async def stream(self, request: BatchCompletionRequest, user_id: str) -> AsyncIterator[str]:
+        """
+        Run the batch on behalf of user_id, which is used for rate limiting,
+        usage and the owner of persisted messages alike.
+        """
+        pending: asyncio.Queue = asyncio.Queue()
+        for index, item in enumerate(request.items):
+            pending.put_nowait((index, item))
+        results: asyncio.Queue = asyncio.Queue()
+        concurrency = self._concurrency(request)
+
+        async def worker():
+            try:
+                while not pending.empty():
+                    index, item = pending.get_nowait()
+                    await results.put(await self._run_item(index, item, request, user_id))
+            finally:
+                await results.put(_DONE)
+
+        start = time.perf_counter()
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        metrics.increment("batch.requests")
+
+        succeeded = failed = 0
+        running = len(workers)
+        try:
+            while running:
+                result = await results.get()
+                if result is _DONE:
+                    running -= 1
+                    continue
+                if result["status"] == "ok":
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            # The client went away or the batch finished; stop any leftover work
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        yield json.dumps({
+            "type": "summary",
+            "items": len(request.items),
+            "succeeded": succeeded,
+            "failed": failed,
+            "concurrency": concurrency,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+        }) + "\n"
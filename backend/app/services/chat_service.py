@@ -1,16 +1,27 @@
 from app.db.repositories.chat_repository import ChatRepository
-from app.models.chat import ChatMessage, ChatSession
-from typing import List, Optional
+from app.models.chat import ChatMessage, ChatSession, SUMMARY_KIND
+from app.services.message_write_queue import MessageWriteQueue
+from app.services.history_cache import CachedHistory, HistoryCache
+from typing import Any, Callable, Dict, List, Optional
 from uuid import uuid4
 import logging
 from datetime import datetime
 
+from app.utils.pagination import Cursor
+
 logger = logging.getLogger(__name__)
 
 class ChatService:
-    def __init__(self, chat_repository: ChatRepository):
+    def __init__(
+        self,
+        chat_repository: ChatRepository,
+        write_queue: Optional[MessageWriteQueue] = None,
+        history_cache: Optional[HistoryCache] = None
+    ):
        
         self.chat_repository = chat_repository
+        self.write_queue = write_queue
+        self.history_cache = history_cache
         logger.info("ChatService initialized")
 
     async def create_session(self) -> str:
@@ -33,31 +44,273 @@ class ChatService:
             if not message.created_at:
                 message.created_at = datetime.utcnow()
 
-            saved_message = await self.chat_repository.add_message(message)
+            if self.write_queue is not None:
+                saved_message = await self.write_queue.enqueue(message)
+            else:
+                saved_message = await self.chat_repository.add_message(message)
 
+            if self.history_cache is not None:
+                self.history_cache.append(saved_message)
             return saved_message
 
         except Exception as e:
             logger.error(f"Error saving message: {str(e)}")
             raise
 
-    async def get_chat_history(self, session_id: str) -> List[ChatMessage]:
+    async def _fill_cache(self, session_id: str, limit: int) -> CachedHistory:
+        """Load a session's newest `limit` messages and latest summary into the history cache."""
+        buffer = self.history_cache.begin_fill(session_id)
+        try:
+            if self.write_queue is not None:
+                # Merged like appends, so they count whether or not they commit during the read
+                buffer.extend(self.write_queue.pending_for_session(session_id))
+            messages = await self.chat_repository.get_recent_messages(session_id, limit + 1)
+            summary = await self.chat_repository.get_latest_summary(session_id)
+        except Exception:
+            self.history_cache.abort_fill(session_id, buffer)
+            raise
+        return self.history_cache.end_fill(session_id, buffer, messages, summary, len(messages) <= limit)
+
+    async def _cached_history(
+        self,
+        session_id: str,
+        covers: Callable[[CachedHistory], bool],
+        need: Optional[int] = None
+    ) -> Optional[CachedHistory]:
+        """
+        The session's history cache entry if it can answer a read (covers),
+        loading it on a miss; None means read from the database instead.
+        A miss loads only the newest `need` messages (default max_messages);
+        a session read again past what a partial entry holds is then loaded
+        up to max_messages.
+        Cached messages are shared and must not be modified.
+        """
+        if self.history_cache is None:
+            return None
+        entry = self.history_cache.get(session_id)
+        hit = entry is not None and covers(entry)
+        self.history_cache.record(hit)
+        if hit:
+            return entry
+        max_messages = self.history_cache.max_messages
+        if entry is None:
+            entry = await self._fill_cache(session_id, min(need or max_messages, max_messages))
+        elif not entry.complete and len(entry.messages) < max_messages:
+            self.history_cache.invalidate(session_id)
+            entry = await self._fill_cache(session_id, max_messages)
+        else:
+            return None
+        return entry if covers(entry) else None
+
+    async def get_chat_history(self, session_id: str, after: Optional[datetime] = None) -> List[ChatMessage]:
       
         try:
-            return await self.chat_repository.get_messages_by_session(session_id)
+            position = CachedHistory.position(after)
+            entry = await self._cached_history(session_id, lambda entry: entry.covers(position))
+            if entry is not None:
+                return entry.after(position)
+
+            if self.write_queue is None:
+                return await self.chat_repository.get_messages_by_session(session_id, after)
+
+            # Snapshot pending rows before reading so a batch committing in
+            # between shows up in at least one of the two results.
+            pending = self.write_queue.pending_for_session(session_id)
+            messages = await self.chat_repository.get_messages_by_session(session_id, after)
+            if pending:
+                stored_ids = {message.id for message in messages}
+                messages.extend(
+                    message for message in pending
+                    if message.id not in stored_ids and (after is None or message.created_at > after)
+                )
+                messages.sort(key=lambda message: message.created_at)
+            return messages
         except Exception as e:
             logger.error(f"Error getting chat history: {str(e)}")
             raise
 
+    async def get_recent_history(self, session_id: str, limit: int) -> List[ChatMessage]:
+        """
+        Newest `limit` messages, oldest first. When the session has been
+        compacted, its latest summary comes first and only messages after
+        the summarized span follow.
+        """
+        try:
+            def covers(entry: CachedHistory) -> bool:
+                position = CachedHistory.position(entry.summary.summary_until if entry.summary else None)
+                # The cache holds the newest messages, so `limit` of them after the summary suffice
+                return entry.covers(position) or len(entry.after(position)) >= limit
+
+            entry = await self._cached_history(session_id, covers, limit)
+            if entry is not None:
+                summary = entry.summary
+                position = CachedHistory.position(summary.summary_until if summary else None)
+                messages = entry.after(position)[-limit:]
+                return [summary] + messages if summary is not None else messages
+
+            summary = await self.chat_repository.get_latest_summary(session_id)
+            after = summary.summary_until if summary is not None else None
+
+            if self.write_queue is None:
+                messages = await self.chat_repository.get_recent_messages(session_id, limit, after)
+            else:
+                pending = self.write_queue.pending_for_session(session_id)
+                messages = await self.chat_repository.get_recent_messages(session_id, limit, after)
+                if pending:
+                    stored_ids = {message.id for message in messages}
+                    messages.extend(
+                        message for message in pending
+                        if message.id not in stored_ids and (after is None or message.created_at > after)
+                    )
+                    messages.sort(key=lambda message: message.created_at)
+                    messages = messages[-limit:]
+
+            if summary is not None:
+                messages.insert(0, summary)
+            return messages
+        except Exception as e:
+            logger.error(f"Error getting recent history: {str(e)}")
+            raise
+
+    async def get_history_page(
+        self,
+        session_id: str,
+        limit: int,
+        cursor: Optional[Cursor] = None
+    ) -> List[ChatMessage]:
+      
+        try:
+            entry = await self._cached_history(session_id, lambda entry: entry.covers(cursor), limit)
+            if entry is not None:
+                return entry.after(cursor)[:limit]
+
+            if self.write_queue is None:
+                return await self.chat_repository.get_messages_page(session_id, limit, cursor)
+
+            pending = self.write_queue.pending_for_session(session_id)
+            messages = await self.chat_repository.get_messages_page(session_id, limit, cursor)
+            if pending:
+                stored_ids = {message.id for message in messages}
+                messages.extend(
+                    message for message in pending
+                    if message.id not in stored_ids
+                    and (cursor is None or (message.created_at, message.id) > cursor)
+                )
+                messages.sort(key=lambda message: (message.created_at, message.id))
+                messages = messages[:limit]
+            return messages
+        except Exception as e:
+            logger.error(f"Error getting chat history page: {str(e)}")
+            raise
+
+    async def get_history_page_rows(
+        self,
+        session_id: str,
+        limit: int,
+        cursor: Optional[Cursor] = None
+    ) -> List[Dict[str, Any]]:
+        """get_history_page as plain dicts of the ChatMessage fields, for direct JSON encoding."""
+        try:
+            entry = await self._cached_history(session_id, lambda entry: entry.covers(cursor), limit)
+            if entry is not None:
+                return [message.model_dump() for message in entry.after(cursor)[:limit]]
+
+            if self.write_queue is None:
+                return await self.chat_repository.get_message_rows_page(session_id, limit, cursor)
+
+            pending = self.write_queue.pending_for_session(session_id)
+            rows = await self.chat_repository.get_message_rows_page(session_id, limit, cursor)
+            if pending:
+                stored_ids = {row["id"] for row in rows}
+                rows.extend(
+                    message.model_dump() for message in pending
+                    if message.id not in stored_ids
+                    and (cursor is None or (message.created_at, message.id) > cursor)
+                )
+                rows.sort(key=lambda row: (row["created_at"], row["id"]))
+                rows = rows[:limit]
+            return rows
+        except Exception as e:
+            logger.error(f"Error getting chat history rows: {str(e)}")
+            raise
+
+    async def get_session(self, session_id: str) -> Optional[ChatSession]:
+        """
+        The session, or None if it does not exist. With write-behind on, a
+        session whose first messages are still queued is reported with the
+        owner of its first queued message.
+        """
+        try:
+            session = await self.chat_repository.get_session(session_id)
+            if session is None and self.write_queue is not None:
+                pending = self.write_queue.pending_for_session(session_id)
+                if pending:
+                    first = min(pending, key=lambda message: message.created_at)
+                    session = ChatSession(id=session_id, user_id=first.user_id, created_at=first.created_at)
+            return session
+        except Exception as e:
+            logger.error(f"Error getting session: {str(e)}")
+            raise
+
+    async def get_sessions_page(
+        self,
+        limit: int,
+        cursor: Optional[Cursor] = None,
+        user_id: Optional[str] = None
+    ) -> List[ChatSession]:
+      
+        try:
+            return await self.chat_repository.get_sessions_page(limit, cursor, user_id)
+        except Exception as e:
+            logger.error(f"Error getting sessions page: {str(e)}")
+            raise
+
+    async def get_sessions_page_rows(
+        self,
+        limit: int,
+        cursor: Optional[Cursor] = None,
+        user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+      
+        try:
+            return await self.chat_repository.get_session_rows_page(limit, cursor, user_id)
+        except Exception as e:
+            logger.error(f"Error getting session rows: {str(e)}")
+            raise
+
+    async def get_latest_summary(self, session_id: str) -> Optional[ChatMessage]:
+      
+        try:
+            return await self.chat_repository.get_latest_summary(session_id)
+        except Exception as e:
+            logger.error(f"Error getting summary: {str(e)}")
+            raise
+
+    async def save_summary(self, session_id: str, content: str, summary_until: datetime) -> ChatMessage:
+        """Store a compaction summary covering every message up to summary_until."""
+        try:
+            # Written directly rather than through the write queue: the
+            # next context rebuild must see it.
+            summary = await self.chat_repository.add_message(ChatMessage(
+                id=str(uuid4()),
+                session_id=session_id,
+                is_user=False,
+                content=content,
+                created_at=datetime.utcnow(),
+                kind=SUMMARY_KIND,
+                summary_until=summary_until
+            ))
+            if self.history_cache is not None:
+                self.history_cache.append(summary)
+            return summary
+        except Exception as e:
+            logger.error(f"Error saving summary: {str(e)}")
+            raise
+
     async def get_all_sessions(self, user_id: Optional[str] = None) -> List[ChatSession]:
        
         try:
-            sessions = await self.chat_repository.get_all_sessions()
-            
-            if user_id:
-                sessions = [session for session in sessions if session.user_id == user_id]
-            
-            return sessions
+            return await self.chat_repository.get_all_sessions(user_id)
         except Exception as e:
             logger.error(f"Error getting sessions: {str(e)}")
             raise
@@ -65,6 +318,8 @@ class ChatService:
     async def delete_session(self, session_id: str) -> bool:
      
         try:
+            if self.history_cache is not None:
+                self.history_cache.invalidate(session_id)
             return await self.chat_repository.delete_session(session_id)
         except Exception as e:
             logger.error(f"Error deleting session: {str(e)}")
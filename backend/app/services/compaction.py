@@ -0,0 +1,151 @@
+import asyncio
+from typing import AsyncContextManager, Callable, Dict, List, Optional
+import logging
+import time
+
+from app.config import (
+    COMPACTION_ENABLED,
+    COMPACTION_KEEP_RECENT_MESSAGES,
+    COMPACTION_SUMMARY_MAX_TOKENS,
+    COMPACTION_CHUNK_MAX_TOKENS
+)
+from app.models.chat import ChatMessage
+from app.services.chat_service import ChatService
+from app.services.context_builder import ContextBuilder, estimate_tokens
+from app.services.groq_service import GroqService
+from app.services.rate_limiter import PRIORITY_BULK
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below so it can replace the original messages "
+    "as context for continuing it. Keep facts, names, decisions, open questions "
+    "and anything the user asked to remember. Write plain prose, no preamble."
+)
+
+
+def _transcript(messages: List[ChatMessage], max_chars: int) -> str:
+    return "\n".join(f"{'User' if m.is_user else 'Assistant'}: {m.content[:max_chars]}" for m in messages)
+
+
+class ConversationCompactor:
+    """
+    Summarizes the older part of long sessions in the background.
+
+    Compaction is incremental: each run folds the previous summary and the
+    messages written since it (except the newest keep_recent) into a new
+    summary, stored in chat_messages with summary_until set to the last
+    message it covers. Messages are never deleted; context assembly reads
+    the latest summary plus the messages after it.
+
+    A span longer than chunk_max_tokens is folded in chunks, oldest first,
+    each one summarized on top of the summary of the chunks before it, so
+    no request outgrows the model's context.
+
+    At most one run per session is in flight, and the summary requests are
+    scheduled at bulk priority behind interactive turns and charged to the
+    session's owner.
+    """
+
+    def __init__(
+        self,
+        groq_service: GroqService,
+        chat_service_scope: Callable[[], AsyncContextManager[ChatService]],
+        context_builder: ContextBuilder,
+        keep_recent: int = COMPACTION_KEEP_RECENT_MESSAGES,
+        summary_max_tokens: int = COMPACTION_SUMMARY_MAX_TOKENS,
+        chunk_max_tokens: int = COMPACTION_CHUNK_MAX_TOKENS,
+        enabled: bool = COMPACTION_ENABLED
+    ):
+        self.groq_service = groq_service
+        self.chat_service_scope = chat_service_scope
+        self.context_builder = context_builder
+        self.keep_recent = keep_recent
+        self.summary_max_tokens = summary_max_tokens
+        self.chunk_max_tokens = chunk_max_tokens
+        self.enabled = enabled
+        self._running: Dict[str, asyncio.Task] = {}
+
+    def schedule(self, session_id: str):
+        if not self.enabled or session_id in self._running:
+            return
+        task = asyncio.create_task(self._run(session_id))
+        self._running[session_id] = task
+        task.add_done_callback(lambda _: self._running.pop(session_id, None))
+
+    async def _run(self, session_id: str):
+        try:
+            await self.compact(session_id)
+        except Exception as e:
+            metrics.increment("compaction.failed")
+            logger.error(f"Compaction of session {session_id} failed: {str(e)}")
+
+    def _chunks(self, span: List[ChatMessage]) -> List[List[ChatMessage]]:
+        """Consecutive runs of span within chunk_max_tokens (an oversized message is a chunk of its own)."""
+        chunks: List[List[ChatMessage]] = []
+        chunk: List[ChatMessage] = []
+        tokens = 0
+        for message in span:
+            cost = estimate_tokens(message.content)
+            if chunk and tokens + cost > self.chunk_max_tokens:
+                chunks.append(chunk)
+                chunk, tokens = [], 0
+            chunk.append(message)
+            tokens += cost
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    async def compact(self, session_id: str) -> Optional[ChatMessage]:
+        """Summarize the span since the last summary; None if there is nothing to fold in."""
+        start = time.perf_counter()
+
+        async with self.chat_service_scope() as chat_service:
+            session = await chat_service.get_session(session_id)
+            previous = await chat_service.get_latest_summary(session_id)
+            after = previous.summary_until if previous is not None else None
+            messages = await chat_service.get_chat_history(session_id, after)
+
+        # Everything since the last summary is still in the kept tail
+        if len(messages) <= self.keep_recent:
+            return None
+        span = messages[:len(messages) - self.keep_recent]
+        user_id = session.user_id if session is not None else None
+
+        summary = previous
+        summarized = 0
+        for chunk in self._chunks(span):
+            prompt = SUMMARY_INSTRUCTIONS + "\n\n"
+            if summary is not None:
+                prompt += f"Summary so far:\n{summary.content}\n\nConversation since then:\n"
+            prompt += _transcript(chunk, self.chunk_max_tokens * 4)
+
+            content = await self.groq_service.get_completion(
+                prompt,
+                user_id=user_id,
+                priority=PRIORITY_BULK,
+                session_id=session_id,
+                max_tokens=self.summary_max_tokens
+            )
+            if not content:
+                break
+
+            async with self.chat_service_scope() as chat_service:
+                summary = await chat_service.save_summary(session_id, content, chunk[-1].created_at)
+            summarized += len(chunk)
+
+        if summarized == 0:
+            return None
+
+        # The next turn rebuilds its window from the new summary
+        self.context_builder.invalidate(session_id)
+
+        metrics.increment("compaction.runs")
+        metrics.increment("compaction.messages_summarized", summarized)
+        metrics.observe("compaction.duration_ms", (time.perf_counter() - start) * 1000)
+        logger.info(f"Compacted {summarized} messages of session {session_id}")
+        return summary
+
+    def stats(self) -> Dict[str, int]:
+        return {"running": len(self._running)}
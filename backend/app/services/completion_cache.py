@@ -0,0 +1,221 @@
+import asyncio
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from app.config import (
+    COMPLETION_CACHE_BACKEND,
+    COMPLETION_CACHE_TTL_SECONDS,
+    COMPLETION_CACHE_MAX_ENTRIES,
+    COMPLETION_CACHE_MAX_BYTES,
+    COMPLETION_CACHE_PATH,
+    COMPLETION_CACHE_REPLAY_CHUNK_CHARS,
+    COMPLETION_CACHE_REPLAY_DELAY_MS
+)
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split()).casefold()
+
+
+def completion_cache_key(
+    prompt: str,
+    model: str,
+    temperature: float,
+    history: Optional[List[Dict[str, str]]] = None,
+    max_tokens: Optional[int] = None
+) -> str:
+    context_hash = hashlib.sha256(
+        json.dumps(history or [], separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    raw = "\x1f".join([normalize_prompt(prompt), model, f"{temperature:.3f}", str(max_tokens), context_hash])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """Base class for completion cache backends; values are full response texts."""
+
+    name = "none"
+
+    def __init__(
+        self,
+        ttl_seconds: float = COMPLETION_CACHE_TTL_SECONDS,
+        max_entries: int = COMPLETION_CACHE_MAX_ENTRIES,
+        max_bytes: int = COMPLETION_CACHE_MAX_BYTES
+    ):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._get(key)
+        if value is None:
+            self.misses += 1
+            metrics.increment("completion_cache.misses")
+        else:
+            self.hits += 1
+            metrics.increment("completion_cache.hits")
+        return value
+
+    async def set(self, key: str, value: str):
+        if len(value.encode("utf-8")) > self.max_bytes:
+            return
+        await self._set(key, value)
+
+    async def _get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def _set(self, key: str, value: str):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class MemoryCompletionCache(CompletionCache):
+    """In-process LRU with TTL, bounded by entry count and total bytes."""
+
+    name = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._entries: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._bytes = 0
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    async def _get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def _set(self, key: str, value: str):
+        if key in self._entries:
+            self._remove(key)
+        size = len(value.encode("utf-8"))
+        self._entries[key] = (time.monotonic() + self.ttl, value, size)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, float]:
+        data = super().stats()
+        data.update({"entries": len(self._entries), "bytes": self._bytes})
+        return data
+
+
+class SQLiteCompletionCache(CompletionCache):
+    """
+    Local on-disk cache in a standalone SQLite file, so entries survive
+    restarts and are shared by workers on the same host. Queries run in a
+    worker thread to keep the event loop free.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = COMPLETION_CACHE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completion_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_completion_cache_last_access ON completion_cache (last_access)"
+        )
+
+    def _get_sync(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM completion_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM completion_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE completion_cache SET last_access = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def _set_sync(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completion_cache (key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now + self.ttl, now)
+            )
+            self._conn.execute("DELETE FROM completion_cache WHERE expires_at < ?", (now,))
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completion_cache"
+            ).fetchone()
+            # Drop least recently used rows until both caps hold
+            while count > self.max_entries or total > self.max_bytes:
+                row = self._conn.execute(
+                    "SELECT key, size FROM completion_cache ORDER BY last_access LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    break
+                self._conn.execute("DELETE FROM completion_cache WHERE key = ?", (row[0],))
+                count -= 1
+                total -= row[1]
+
+    async def _get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def _set(self, key: str, value: str):
+        await asyncio.to_thread(self._set_sync, key, value)
+
+
+def create_completion_cache(backend: str = COMPLETION_CACHE_BACKEND) -> Optional[CompletionCache]:
+    if backend == MemoryCompletionCache.name:
+        return MemoryCompletionCache()
+    if backend == SQLiteCompletionCache.name:
+        return SQLiteCompletionCache()
+    if backend not in ("", "none"):
+        logger.warning(f"Unknown completion cache backend '{backend}', caching disabled")
+    return None
+
+
+async def replay_completion(
+    text: str,
+    chunk_chars: int = COMPLETION_CACHE_REPLAY_CHUNK_CHARS,
+    delay_ms: int = COMPLETION_CACHE_REPLAY_DELAY_MS
+) -> AsyncIterator[str]:
+    """Yield a cached response as a token stream at a configurable pace."""
+    chunk_chars = max(1, chunk_chars)
+    for start in range(0, len(text), chunk_chars):
+        if start and delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+        yield text[start:start + chunk_chars]
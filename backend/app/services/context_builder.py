@@ -0,0 +1,198 @@
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+import logging
+import time
+
+from app.config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_HISTORY_LIMIT,
+    CONTEXT_CACHE_MAX_SESSIONS,
+    CONTEXT_CACHE_IDLE_SECONDS,
+    COMPACTION_THRESHOLD_TOKENS
+)
+from app.models.chat import ChatMessage, SUMMARY_KIND
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Loads the newest `limit` messages of a session, oldest first, preceded by
+# the session's latest summary if it has one.
+HistoryLoader = Callable[[str, int], Awaitable[List[ChatMessage]]]
+
+# Called with a session_id whose unsummarized history crossed the threshold
+CompactionHook = Callable[[str], None]
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+class ConversationTurn:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+        self.tokens = estimate_tokens(content)
+
+    def as_message(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+
+class SessionContext:
+    """
+    Rolling window of the most recent turns that fit in the token budget.
+
+    A summary of compacted history, if any, is pinned ahead of the turns and
+    counts against the budget. unsummarized_tokens tracks everything added
+    since that summary, including turns already trimmed from the window.
+    """
+
+    def __init__(self, token_budget: int):
+        self.token_budget = token_budget
+        self.turns: Deque[ConversationTurn] = deque()
+        self.summary: Optional[ConversationTurn] = None
+        self.tokens = 0
+        self.unsummarized_tokens = 0
+        self.last_access = time.monotonic()
+
+    def set_summary(self, content: str):
+        if self.summary is not None:
+            self.tokens -= self.summary.tokens
+        self.summary = ConversationTurn("system", SUMMARY_PREFIX + content)
+        self.tokens += self.summary.tokens
+        self._trim()
+
+    def append(self, turn: ConversationTurn):
+        self.turns.append(turn)
+        self.tokens += turn.tokens
+        self.unsummarized_tokens += turn.tokens
+        self._trim()
+
+    def _trim(self):
+        while self.tokens > self.token_budget and self.turns:
+            self.tokens -= self.turns.popleft().tokens
+
+    def messages(self) -> List[Dict[str, str]]:
+        history = [turn.as_message() for turn in self.turns]
+        if self.summary is not None:
+            history.insert(0, self.summary.as_message())
+        return history
+
+
+class ContextBuilder:
+    """
+    Assembles the conversation history sent with each prompt.
+
+    Windows are kept per session in an LRU cache with a size cap and idle
+    eviction. A miss rebuilds the window from the session's latest summary
+    and the newest history_limit messages after it.
+
+    When a session's unsummarized history grows past compaction_threshold
+    tokens, on_compaction_needed is called so older turns can be summarized
+    in the background; the window is dropped with invalidate() once the new
+    summary is stored.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        history_limit: int = CONTEXT_HISTORY_LIMIT,
+        max_sessions: int = CONTEXT_CACHE_MAX_SESSIONS,
+        idle_seconds: float = CONTEXT_CACHE_IDLE_SECONDS,
+        compaction_threshold: int = COMPACTION_THRESHOLD_TOKENS
+    ):
+        self.token_budget = token_budget
+        self.history_limit = history_limit
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.compaction_threshold = compaction_threshold
+        self.on_compaction_needed: Optional[CompactionHook] = None
+        self._sessions: "OrderedDict[str, SessionContext]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            session_id, context = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - context.last_access > self.idle_seconds:
+                del self._sessions[session_id]
+            else:
+                break
+
+    def _get(self, session_id: str) -> Optional[SessionContext]:
+        context = self._sessions.get(session_id)
+        if context is not None and time.monotonic() - context.last_access > self.idle_seconds:
+            del self._sessions[session_id]
+            context = None
+        if context is not None:
+            self._sessions.move_to_end(session_id)
+            context.last_access = time.monotonic()
+        return context
+
+    def _put(self, session_id: str, context: SessionContext):
+        self._sessions[session_id] = context
+        self._sessions.move_to_end(session_id)
+        self._evict()
+
+    async def build(self, session_id: str, message: ChatMessage, load_history: HistoryLoader) -> List[Dict[str, str]]:
+        """
+        History to send before message, trimmed to the token budget.
+
+        message is then added to the session window, so it must already be
+        part of the conversation (it is skipped if the rebuild reads it back).
+        """
+        start = time.perf_counter()
+
+        context = self._get(session_id)
+        if context is not None:
+            self.hits += 1
+            metrics.increment("context.cache_hits")
+        else:
+            self.misses += 1
+            metrics.increment("context.cache_misses")
+            context = SessionContext(self.token_budget)
+            for stored in await load_history(session_id, self.history_limit):
+                if stored.kind == SUMMARY_KIND:
+                    context.set_summary(stored.content)
+                elif stored.id != message.id:
+                    context.append(ConversationTurn("user" if stored.is_user else "assistant", stored.content))
+
+        history = context.messages()
+        context.append(ConversationTurn("user", message.content))
+        self._put(session_id, context)
+
+        metrics.observe("context.build_ms", (time.perf_counter() - start) * 1000)
+        metrics.observe("context.history_messages", len(history))
+        return history
+
+    def record_reply(self, session_id: str, content: str):
+        context = self._get(session_id)
+        if context is not None and content:
+            context.append(ConversationTurn("assistant", content))
+            if self.on_compaction_needed is not None and context.unsummarized_tokens > self.compaction_threshold:
+                self.on_compaction_needed(session_id)
+
+    def invalidate(self, session_id: str):
+        """Drop a session's window so the next build reloads it from storage."""
+        self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "sessions": len(self._sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 3),
+        }
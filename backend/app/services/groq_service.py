@@ -1,59 +1,263 @@
-import os
-from groq import AsyncGroq
-from typing import AsyncGenerator
+import httpx
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional
 import logging
-from dotenv import load_dotenv
+import time
+
+from app.config import (
+    GROQ_MODEL,
+    GROQ_FALLBACK_MODEL,
+    GROQ_SINGLE_FLIGHT,
+    GROQ_RATE_LIMIT_ENABLED,
+    GROQ_COMPLETION_TOKEN_ESTIMATE
+)
+from app.services.completion_cache import completion_cache_key, create_completion_cache, replay_completion
+from app.services.context_builder import estimate_tokens
+from app.services.llm_providers import CompletionUsage, UsageCallback, create_provider
+from app.services.rate_limiter import PRIORITY_INTERACTIVE, QueuedCallback, RateLimitScheduler
+from app.services.resilience import ResilientCaller
+from app.services.single_flight import SingleFlight
+from app.services.usage_tracker import usage_tracker
+from app.utils.metrics import metrics
 
-load_dotenv()
 logger = logging.getLogger(__name__)
 
+
+class _UsageMeter:
+    """Model and reported usage for one upstream request, including its retries and hedges."""
+
+    __slots__ = ("model", "usage", "started")
+
+    def __init__(self, model: str):
+        self.model = model
+        self.usage: Optional[CompletionUsage] = None
+        self.started = time.perf_counter()
+
+    def callback(self, model: str) -> UsageCallback:
+        def on_usage(usage: CompletionUsage):
+            self.model = model
+            self.usage = usage
+        return on_usage
+
+
 class GroqService:
+    """
+    Chat completions with caching, rate limiting and retries on top of the
+    configured LLM provider (Groq, or the mock provider when LLM_PROVIDER=mock).
+    """
+
     def __init__(self):
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY not found in environment variables")
-        
-        self.client = AsyncGroq(api_key=api_key)
-        self.model = "llama-3.3-70b-versatile" 
+        self.rate_limiter = RateLimitScheduler() if GROQ_RATE_LIMIT_ENABLED else None
+        if self.rate_limiter is not None:
+            metrics.register_collector("rate_limiter", self.rate_limiter.stats)
+
+        self.provider = create_provider(on_response=self._on_response)
+        self.model = GROQ_MODEL
+        self.temperature = 0.7
+        self.max_tokens = 4096
+        self.completion_cache = create_completion_cache()
+        if self.completion_cache is not None:
+            metrics.register_collector("completion_cache", self.completion_cache.stats)
+        self.single_flight = SingleFlight() if GROQ_SINGLE_FLIGHT else None
+        if self.single_flight is not None:
+            metrics.register_collector("single_flight", self.single_flight.stats)
+        self.resilience = ResilientCaller(self.model, GROQ_FALLBACK_MODEL, is_retryable=self.provider.is_retryable)
+        metrics.register_collector("resilience", self.resilience.stats)
         logger.info("GroqService initialized")
 
-    async def stream_completion(self, user_message: str) -> AsyncGenerator[str, None]:
-       
+    def _build_messages(self, user_message: str, history: Optional[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        messages = list(history) if history else []
+        messages.append({
+            "role": "user",
+            "content": user_message
+        })
+        return messages
+
+    async def _on_response(self, response: httpx.Response):
+        if self.rate_limiter is not None:
+            self.rate_limiter.update_from_headers(response.headers)
+
+    def _request_cost(self, messages: List[Dict[str, str]]) -> int:
+        cost = sum(estimate_tokens(m["content"]) for m in messages)
+        return cost + min(self.max_tokens, GROQ_COMPLETION_TOKEN_ESTIMATE)
+
+    async def _acquire(
+        self,
+        messages: List[Dict[str, str]],
+        user_id: Optional[str],
+        priority: int,
+        on_queued: Optional[QueuedCallback]
+    ):
+        if self.rate_limiter is None:
+            return
+        await self.rate_limiter.acquire(user_id or "anonymous", self._request_cost(messages), priority, on_queued)
+
+    def _record_usage(
+        self,
+        meter: _UsageMeter,
+        messages: List[Dict[str, str]],
+        response: str,
+        user_id: Optional[str],
+        session_id: Optional[str]
+    ):
+        if meter.usage is not None:
+            prompt_tokens, completion_tokens = meter.usage.prompt_tokens, meter.usage.completion_tokens
+        elif response:
+            # Cancelled streams end before the provider reports usage
+            prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+            completion_tokens = estimate_tokens(response)
+        else:
+            return
+        usage_tracker.record(
+            user_id,
+            session_id,
+            meter.model,
+            prompt_tokens,
+            completion_tokens,
+            (time.perf_counter() - meter.started) * 1000
+        )
+
+    async def _metered(
+        self,
+        tokens: AsyncIterator[str],
+        meter: _UsageMeter,
+        messages: List[Dict[str, str]],
+        user_id: Optional[str],
+        session_id: Optional[str]
+    ) -> AsyncGenerator[str, None]:
+        parts = []
         try:
-            stream = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{
-                    "role": "user",
-                    "content": user_message
-                }],
-                stream=True,
-                temperature=0.7,
-                max_tokens=4096
-            )
+            async for token in tokens:
+                parts.append(token)
+                yield token
+        finally:
+            await tokens.aclose()
+            self._record_usage(meter, messages, "".join(parts), user_id, session_id)
 
-            async for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
-                    yield chunk.choices[0].delta.content
+    def _request_key(
+        self,
+        user_message: str,
+        history: Optional[List[Dict[str, str]]],
+        max_tokens: Optional[int] = None
+    ) -> Optional[str]:
+        if self.completion_cache is None and self.single_flight is None:
+            return None
+        return completion_cache_key(user_message, self.model, self.temperature, history, max_tokens or self.max_tokens)
 
-        except Exception as e:
-            logger.error(f"Error in Groq streaming: {str(e)}")
-            raise
+    def _cacheable(self, meter: _UsageMeter) -> bool:
+        # Keys name the primary model: an answer from the fallback model is
+        # not stored, so it stops being served once the primary recovers
+        return self.completion_cache is not None and meter.model == self.model
 
-    async def get_completion(self, user_message: str) -> str:
-      
+    async def stream_completion(
+        self,
+        user_message: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        user_id: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        on_queued: Optional[QueuedCallback] = None,
+        session_id: Optional[str] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream the answer token by token.
+
+        Requests over the rate limit budget wait in the scheduler's queue for
+        user_id; on_queued is awaited with the queue length and estimated wait
+        when that happens. Token usage is recorded against user_id and
+        session_id once the upstream request ends.
+        """
+        request_key = self._request_key(user_message, history)
+        if self.completion_cache is not None:
+            cached = await self.completion_cache.get(request_key)
+            if cached is not None:
+                async for chunk in replay_completion(cached):
+                    yield chunk
+                return
+
+        messages = self._build_messages(user_message, history)
+        meters: List[_UsageMeter] = []
+
+        def open_upstream():
+            # Runs once per upstream request, so requests joined through
+            # single-flight are not counted twice.
+            meter = _UsageMeter(self.model)
+            meters.append(meter)
+
+            async def open_attempt(model: str, hedge: bool):
+                # Every attempt spends rate limit budget, so it waits here, after
+                # the cache and single-flight checks. A hedge is only worth
+                # sending when budget is free right away.
+                if hedge:
+                    if self.rate_limiter is not None and not self.rate_limiter.try_acquire(self._request_cost(messages)):
+                        return None
+                else:
+                    await self._acquire(messages, user_id, priority, on_queued)
+                    meter.model = model
+                return self._stream_upstream(messages, model, meter.callback(model))
+
+            return self._metered(self.resilience.stream(open_attempt), meter, messages, user_id, session_id)
+
+        if self.single_flight is not None:
+            upstream = self.single_flight.stream(request_key, open_upstream)
+        else:
+            upstream = open_upstream()
+
+        parts = []
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{
-                    "role": "user",
-                    "content": user_message
-                }],
-                temperature=0.7,
-                max_tokens=4096
+            async for token in upstream:
+                parts.append(token)
+                yield token
+        finally:
+            # Close explicitly so an early exit aborts the HTTP stream now
+            # rather than whenever the generator is garbage collected.
+            await upstream.aclose()
+
+        # Only reached when the stream ran to the end, never for cancelled
+        # turns. Requests that joined another's upstream leave it to that one.
+        if meters and self._cacheable(meters[0]):
+            await self.completion_cache.set(request_key, "".join(parts))
+
+    def _stream_upstream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        on_usage: Optional[UsageCallback] = None
+    ) -> AsyncGenerator[str, None]:
+        return self.provider.stream(messages, model, self.temperature, self.max_tokens, on_usage)
+
+    async def get_completion(
+        self,
+        user_message: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        user_id: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        session_id: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+      
+        if self.completion_cache is not None:
+            cache_key = self._request_key(user_message, history, max_tokens)
+            cached = await self.completion_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        messages = self._build_messages(user_message, history)
+        meter = _UsageMeter(self.model)
+
+        async def attempt(model: str) -> str:
+            await self._acquire(messages, user_id, priority, None)
+            meter.model = model
+            return await self.provider.complete(
+                messages, model, self.temperature, max_tokens or self.max_tokens, meter.callback(model)
             )
-            
-            return response.choices[0].message.content
 
+        try:
+            content = await self.resilience.call(attempt)
         except Exception as e:
             logger.error(f"Error in Groq completion: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+        self._record_usage(meter, messages, content or "", user_id, session_id)
+
+        if content and self._cacheable(meter):
+            await self.completion_cache.set(cache_key, content)
+        return content
@@ -0,0 +1,271 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+import sys
+import time
+
+from app.config import (
+    HISTORY_CACHE_MAX_BYTES,
+    HISTORY_CACHE_MAX_MESSAGES,
+    HISTORY_CACHE_MAX_SESSIONS,
+    HISTORY_CACHE_TTL_SECONDS,
+)
+from app.models.chat import ChatMessage, SUMMARY_KIND
+from app.utils.metrics import metrics
+from app.utils.pagination import Cursor
+
+logger = logging.getLogger(__name__)
+
+# Measured size of a ChatMessage with its ids and timestamp, excluding content
+_MESSAGE_OVERHEAD_BYTES = 1200
+
+# Estimated size of an entry itself: its CachedHistory, lists and slot in the LRU
+_ENTRY_OVERHEAD_BYTES = 800
+
+# Sorts after every id, so (timestamp, _LAST_ID) follows all keys at that timestamp
+_LAST_ID = chr(sys.maxunicode)
+
+
+def _key(message: ChatMessage) -> Cursor:
+    return message.created_at, message.id
+
+
+def message_bytes(message: ChatMessage) -> int:
+    return _MESSAGE_OVERHEAD_BYTES + sys.getsizeof(message.content or "")
+
+
+class CachedHistory:
+    """
+    The newest messages of one session, oldest first, and its latest summary.
+
+    complete is False once older messages have been dropped to stay within
+    the per-session limit; the entry then only answers reads that start
+    inside the cached span.
+    """
+
+    __slots__ = ("messages", "keys", "summary", "complete", "size", "expires")
+
+    def __init__(
+        self,
+        messages: List[ChatMessage],
+        summary: Optional[ChatMessage],
+        complete: bool,
+        expires: float = float("inf")
+    ):
+        self.messages = sorted(messages, key=_key)
+        self.keys = [_key(message) for message in self.messages]
+        self.summary = summary
+        self.complete = complete
+        self.expires = expires
+        self.size = _ENTRY_OVERHEAD_BYTES + sum(message_bytes(message) for message in self.messages)
+        if summary is not None:
+            self.size += message_bytes(summary)
+
+    def covers(self, after: Optional[Cursor]) -> bool:
+        """Whether every message after the position `after` is cached."""
+        if self.complete:
+            return True
+        return after is not None and bool(self.keys) and after >= self.keys[0]
+
+    def set_summary(self, summary: ChatMessage) -> int:
+        """Keep summary if it is the newest seen; returns the change in bytes."""
+        if self.summary is not None and _key(summary) <= _key(self.summary):
+            return 0
+        delta = message_bytes(summary) - (message_bytes(self.summary) if self.summary is not None else 0)
+        self.summary = summary
+        self.size += delta
+        return delta
+
+    def append(self, message: ChatMessage) -> int:
+        """Add a message in order (skipping duplicates); returns the bytes added."""
+        key = _key(message)
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return 0
+        if not self.complete and index == 0:
+            # Older than anything cached; the gap before it is unknown
+            return 0
+        self.keys.insert(index, key)
+        self.messages.insert(index, message)
+        added = message_bytes(message)
+        self.size += added
+        return added
+
+    def trim(self, max_messages: int) -> int:
+        """Drop the oldest messages beyond max_messages; returns the bytes freed."""
+        freed = 0
+        excess = len(self.messages) - max_messages
+        if excess > 0:
+            freed = sum(message_bytes(message) for message in self.messages[:excess])
+            del self.messages[:excess]
+            del self.keys[:excess]
+            self.complete = False
+            self.size -= freed
+        return freed
+
+    def after(self, after: Optional[Cursor]) -> List[ChatMessage]:
+        start = 0 if after is None else bisect_right(self.keys, after)
+        return self.messages[start:]
+
+    @staticmethod
+    def position(after: Optional[datetime]) -> Optional[Cursor]:
+        """The position just past every message created at or before `after`."""
+        return (after, _LAST_ID) if after is not None else None
+
+
+class HistoryCache:
+    """
+    Per-process read-through cache of recent session histories.
+
+    A miss loads a session's newest messages (as many as the read needs, up
+    to max_messages) and latest summary once; every message saved through
+    ChatService afterwards is appended to the cached list rather than
+    invalidating it, so the history endpoint and context rebuilds keep being
+    served from memory as a conversation grows. Sessions with nothing stored
+    are not cached.
+
+    Entries expire ttl seconds after they were loaded: appends only cover
+    writes made through this process, so an entry can miss messages another
+    worker saved. Sessions are evicted least recently used first once there
+    are more than max_sessions or the estimated size of all entries passes
+    max_bytes.
+
+    Loads are bracketed by begin_fill/end_fill: messages appended while a
+    load is in flight are buffered and merged into what it read, so a write
+    committing during the read cannot be lost.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = HISTORY_CACHE_MAX_BYTES,
+        max_messages: int = HISTORY_CACHE_MAX_MESSAGES,
+        max_sessions: int = HISTORY_CACHE_MAX_SESSIONS,
+        ttl: float = HISTORY_CACHE_TTL_SECONDS
+    ):
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, CachedHistory]" = OrderedDict()
+        self._fills: Dict[str, List[List[ChatMessage]]] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _live(self, session_id: str) -> Optional[CachedHistory]:
+        entry = self._sessions.get(session_id)
+        if entry is not None and entry.expires <= time.monotonic():
+            self.invalidate(session_id)
+            metrics.increment("history_cache.expirations")
+            return None
+        return entry
+
+    def get(self, session_id: str) -> Optional[CachedHistory]:
+        entry = self._live(session_id)
+        if entry is not None:
+            self._sessions.move_to_end(session_id)
+        return entry
+
+    def record(self, hit: bool):
+        if hit:
+            self.hits += 1
+            metrics.increment("history_cache.hits")
+        else:
+            self.misses += 1
+            metrics.increment("history_cache.misses")
+
+    def begin_fill(self, session_id: str) -> List[ChatMessage]:
+        buffer: List[ChatMessage] = []
+        self._fills.setdefault(session_id, []).append(buffer)
+        return buffer
+
+    def _end_buffer(self, session_id: str, buffer: List[ChatMessage]):
+        buffers = self._fills.get(session_id)
+        if buffers is not None:
+            # By identity: concurrent loads' buffers can hold equal contents
+            buffers[:] = [other for other in buffers if other is not buffer]
+            if not buffers:
+                del self._fills[session_id]
+
+    def end_fill(
+        self,
+        session_id: str,
+        buffer: List[ChatMessage],
+        messages: List[ChatMessage],
+        summary: Optional[ChatMessage],
+        complete: bool
+    ) -> CachedHistory:
+        """
+        Cache what a load read, plus anything appended since begin_fill.
+        A session with nothing stored is returned without being cached.
+        """
+        self._end_buffer(session_id, buffer)
+        entry = self._live(session_id)
+        if entry is None:
+            if not messages and summary is None and not buffer:
+                return CachedHistory([], None, complete)
+            entry = CachedHistory(messages, summary, complete, time.monotonic() + self.ttl)
+            self._sessions[session_id] = entry
+            self.size += entry.size
+        for message in buffer:
+            self._append(entry, message)
+        self.size -= entry.trim(self.max_messages)
+        self._sessions.move_to_end(session_id)
+        self._evict()
+        return entry
+
+    def abort_fill(self, session_id: str, buffer: List[ChatMessage]):
+        self._end_buffer(session_id, buffer)
+
+    def _append(self, entry: CachedHistory, message: ChatMessage):
+        if message.kind == SUMMARY_KIND:
+            self.size += entry.set_summary(message)
+        else:
+            self.size += entry.append(message)
+
+    def append(self, message: ChatMessage):
+        """Add a saved message (or summary) to its session's entry and any loads in flight."""
+        for buffer in self._fills.get(message.session_id, ()):
+            buffer.append(message)
+        entry = self._live(message.session_id)
+        if entry is None:
+            return
+        self._append(entry, message)
+        self.size -= entry.trim(self.max_messages)
+        self._evict()
+
+    def invalidate(self, session_id: str):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def _evict(self):
+        while self._sessions and (self.size > self.max_bytes or len(self._sessions) > self.max_sessions):
+            _, entry = self._sessions.popitem(last=False)
+            self.size -= entry.size
+            self.evictions += 1
+            metrics.increment("history_cache.evictions")
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "sessions": len(self._sessions),
+            "messages": sum(len(entry.messages) for entry in self._sessions.values()),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "max_sessions": self.max_sessions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 3),
+            "evictions": self.evictions,
+        }
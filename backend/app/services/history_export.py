@@ -0,0 +1,65 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+import logging
+
+from app.config import HISTORY_EXPORT_BATCH_SIZE
+from app.models.chat import ChatMessage, ChatSession
+from app.utils.fast_json import dumps
+from app.utils.metrics import metrics
+from app.utils.pagination import Cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+Row = Union[ChatMessage, ChatSession]
+
+# Fetches up to `limit` rows after the cursor, in keyset order
+PageFetcher = Callable[[Optional[Cursor], int], Awaitable[List[Row]]]
+
+
+def row_cursor(row: Row) -> Cursor:
+    """Keyset position of a row: sessions are ordered by activity, messages by creation."""
+    if isinstance(row, ChatSession):
+        return row.updated_at, row.id
+    return row.created_at, row.id
+
+
+def next_cursor(rows: List[Row], limit: int) -> Optional[str]:
+    """Cursor for the page after rows, or None when rows was the last page."""
+    if len(rows) < limit:
+        return None
+    return encode_cursor(*row_cursor(rows[-1]))
+
+
+def page_json(rows: List[Dict[str, Any]], limit: int, timestamp_field: str) -> bytes:
+    """
+    A {"items", "next_cursor"} page of plain rows (as returned by the *_rows
+    repository reads) encoded straight to JSON, skipping model validation.
+    """
+    cursor = None
+    if len(rows) >= limit:
+        cursor = encode_cursor(rows[-1][timestamp_field], rows[-1]["id"])
+    return dumps({"items": rows, "next_cursor": cursor})
+
+
+async def stream_ndjson(
+    fetch_page: PageFetcher,
+    cursor: Optional[Cursor] = None,
+    batch_size: int = HISTORY_EXPORT_BATCH_SIZE
+) -> AsyncIterator[str]:
+    """
+    Every row from cursor onwards as NDJSON, one keyset page at a time.
+
+    Only one page is held in memory, and fetch_page is expected to open its
+    own database session per call, so a slow reader does not pin a pooled
+    connection for the whole export.
+    """
+    rows_sent = 0
+    while True:
+        rows = await fetch_page(cursor, batch_size)
+        if not rows:
+            break
+        yield "".join(row.model_dump_json() + "\n" for row in rows)
+        rows_sent += len(rows)
+        if len(rows) < batch_size:
+            break
+        cursor = row_cursor(rows[-1])
+    metrics.increment("history.export_rows", rows_sent)
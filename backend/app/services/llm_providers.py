@@ -0,0 +1,278 @@
+import asyncio
+import os
+import hashlib
+import random
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import logging
+
+import httpx
+from dotenv import load_dotenv
+from groq import AsyncGroq, APIConnectionError, APIStatusError, RateLimitError
+
+from app.config import (
+    LLM_PROVIDER,
+    GROQ_BASE_URL,
+    MOCK_LLM_TTFT_MS,
+    MOCK_LLM_INTER_TOKEN_MS,
+    MOCK_LLM_ERROR_RATE,
+    MOCK_LLM_MIN_TOKENS,
+    MOCK_LLM_MAX_TOKENS,
+    MOCK_LLM_SEED
+)
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+Messages = List[Dict[str, str]]
+ResponseHook = Callable[[httpx.Response], Awaitable[None]]
+
+
+class CompletionUsage:
+    __slots__ = ("prompt_tokens", "completion_tokens")
+
+    def __init__(self, prompt_tokens: int, completion_tokens: int):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    @classmethod
+    def from_response(cls, usage: Any) -> Optional["CompletionUsage"]:
+        """Build from an SDK usage object or a plain dict; None if the fields are missing."""
+        if usage is None:
+            return None
+        if isinstance(usage, dict):
+            prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        else:
+            prompt, completion = getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+        if prompt is None or completion is None:
+            return None
+        return cls(int(prompt), int(completion))
+
+
+# Receives the token counts reported by the provider once a completion ends
+UsageCallback = Callable[[CompletionUsage], None]
+
+
+class ProviderUnavailableError(Exception):
+    """Transient upstream failure that is worth retrying."""
+
+
+class LLMProvider:
+    """Base class for chat completion backends used by GroqService."""
+
+    name = "base"
+
+    def stream(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        on_usage: Optional[UsageCallback] = None
+    ) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def complete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        on_usage: Optional[UsageCallback] = None
+    ) -> str:
+        raise NotImplementedError
+
+    def is_retryable(self, error: BaseException) -> bool:
+        return isinstance(error, ProviderUnavailableError)
+
+
+class GroqProvider(LLMProvider):
+    """
+    Groq's API through the official SDK. GROQ_BASE_URL points it at any
+    server speaking the same OpenAI-style protocol, such as
+    benchmarks/mock_llm_server.py.
+    """
+
+    name = "groq"
+
+    def __init__(self, on_response: Optional[ResponseHook] = None, base_url: Optional[str] = GROQ_BASE_URL):
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY not found in environment variables")
+
+        # Same timeout and pool limits as the SDK's own client, plus a hook
+        # that feeds x-ratelimit-* headers back into the scheduler.
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            event_hooks={"response": [on_response] if on_response else []}
+        )
+        # Retries are handled by GroqService.resilience, which knows whether
+        # any tokens were already streamed; the SDK's own retries are disabled.
+        self.client = AsyncGroq(api_key=api_key, base_url=base_url or None, http_client=http_client, max_retries=0)
+
+    async def stream(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        on_usage: Optional[UsageCallback] = None
+    ) -> AsyncIterator[str]:
+        stream = None
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=True,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content is not None:
+                    yield chunk.choices[0].delta.content
+
+                # Groq reports usage in an x_groq block on the final chunk
+                x_groq = getattr(chunk, "x_groq", None)
+                usage = CompletionUsage.from_response(
+                    x_groq.get("usage") if isinstance(x_groq, dict) else getattr(chunk, "usage", None)
+                )
+                if usage is not None and on_usage is not None:
+                    on_usage(usage)
+
+        except Exception as e:
+            logger.error(f"Error in Groq streaming: {str(e)}")
+            raise
+        finally:
+            # Close the HTTP response right away when the consumer stops early
+            # (cancelled turn, dropped client) so Groq stops generating.
+            if stream is not None:
+                await stream.response.aclose()
+
+    async def complete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        on_usage: Optional[UsageCallback] = None
+    ) -> str:
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        usage = CompletionUsage.from_response(response.usage)
+        if usage is not None and on_usage is not None:
+            on_usage(usage)
+        return response.choices[0].message.content
+
+    def is_retryable(self, error: BaseException) -> bool:
+        """Connection problems, timeouts, 429s and 5xx; client errors are not worth retrying."""
+        if isinstance(error, (APIConnectionError, RateLimitError)):
+            return True
+        return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+_MOCK_WORDS = (
+    "the quick answer depends on context and a few details matter here "
+    "first consider the request then look at the data before deciding "
+    "streaming keeps latency low while the full response is generated"
+).split()
+
+
+class MockProvider(LLMProvider):
+    """
+    Deterministic in-process stand-in for the LLM, for load tests and local
+    development without an API key.
+
+    The same messages always produce the same text and length. Failures are
+    drawn from a seeded generator, so a run with the same seed and request
+    order fails the same requests. Delays model time to first token and the
+    gap between tokens.
+    """
+
+    name = "mock"
+
+    def __init__(
+        self,
+        ttft_ms: float = MOCK_LLM_TTFT_MS,
+        inter_token_ms: float = MOCK_LLM_INTER_TOKEN_MS,
+        error_rate: float = MOCK_LLM_ERROR_RATE,
+        min_tokens: int = MOCK_LLM_MIN_TOKENS,
+        max_tokens: int = MOCK_LLM_MAX_TOKENS,
+        seed: int = MOCK_LLM_SEED
+    ):
+        self.ttft = ttft_ms / 1000
+        self.inter_token = inter_token_ms / 1000
+        self.error_rate = error_rate
+        self.min_tokens = min_tokens
+        self.max_tokens = max(min_tokens, max_tokens)
+        self._random = random.Random(seed)
+
+    def response_tokens(self, messages: Messages, max_tokens: Optional[int] = None) -> List[str]:
+        digest = hashlib.sha256(repr([(m["role"], m["content"]) for m in messages]).encode("utf-8")).digest()
+        seed = int.from_bytes(digest[:8], "big")
+        count = self.min_tokens + seed % (self.max_tokens - self.min_tokens + 1)
+        if max_tokens is not None:
+            count = min(count, max_tokens)
+        words = len(_MOCK_WORDS)
+        return [
+            ("" if i == 0 else " ") + _MOCK_WORDS[(seed >> (i % 32) ^ i) % words]
+            for i in range(count)
+        ]
+
+    def _should_fail(self) -> bool:
+        return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def usage(self, messages: Messages, tokens: List[str]) -> CompletionUsage:
+        prompt_tokens = sum(len(m["content"].split()) for m in messages)
+        return CompletionUsage(prompt_tokens, len(tokens))
+
+    async def stream(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        on_usage: Optional[UsageCallback] = None
+    ) -> AsyncIterator[str]:
+        fail = self._should_fail()
+        await asyncio.sleep(self.ttft)
+        if fail:
+            raise ProviderUnavailableError("Mock provider error")
+
+        tokens = self.response_tokens(messages, max_tokens)
+        for i, token in enumerate(tokens):
+            if i and self.inter_token > 0:
+                await asyncio.sleep(self.inter_token)
+            yield token
+        if on_usage is not None:
+            on_usage(self.usage(messages, tokens))
+
+    async def complete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        on_usage: Optional[UsageCallback] = None
+    ) -> str:
+        fail = self._should_fail()
+        tokens = self.response_tokens(messages, max_tokens)
+        await asyncio.sleep(self.ttft + self.inter_token * max(0, len(tokens) - 1))
+        if fail:
+            raise ProviderUnavailableError("Mock provider error")
+        if on_usage is not None:
+            on_usage(self.usage(messages, tokens))
+        return "".join(tokens)
+
+
+def create_provider(name: str = LLM_PROVIDER, on_response: Optional[ResponseHook] = None) -> LLMProvider:
+    if name == MockProvider.name:
+        logger.info("Using the mock LLM provider")
+        return MockProvider()
+    if name != GroqProvider.name:
+        raise ValueError(f"Unknown LLM_PROVIDER '{name}'")
+    return GroqProvider(on_response=on_response)
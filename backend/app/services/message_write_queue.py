@@ -0,0 +1,227 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import logging
+import time
+
+from app.config import (
+    PERSISTENCE_BATCH_SIZE,
+    PERSISTENCE_FLUSH_INTERVAL_MS,
+    PERSISTENCE_MAX_PENDING,
+    PERSISTENCE_ENQUEUE_TIMEOUT_MS,
+    PERSISTENCE_MAX_RETRIES
+)
+from app.db.database import AsyncSessionLocal
+from app.db.repositories.chat_repository import ChatRepository
+from app.models.chat import ChatMessage
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Longest pause between flush attempts while the database keeps failing
+_MAX_BACKOFF_SECONDS = 5.0
+
+
+class WriteQueueFullError(Exception):
+    """Too many messages are waiting to be saved; the database is not keeping up."""
+
+
+class MessageWriteQueue:
+    """
+    Write-behind buffer for chat messages shared by all connections.
+
+    Messages are flushed as one multi-row insert once batch_size rows are
+    pending or flush_interval_ms has elapsed. Rows stay visible through
+    pending_for_session until their batch has committed, so history reads
+    never miss a message that was already acknowledged to the client.
+
+    Rows leave the queue only once written. A failed batch is split until
+    the rows failing on their own are found; while other rows still get
+    written, such a row is dropped after max_retries failures (logged and
+    kept in dead_letters). When nothing can be written the database is
+    taken to be down: no row is dropped and flushes back off. Once
+    max_pending rows are waiting, enqueue waits for room and fails with
+    WriteQueueFullError after enqueue_timeout_ms.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        batch_size: int = PERSISTENCE_BATCH_SIZE,
+        flush_interval_ms: int = PERSISTENCE_FLUSH_INTERVAL_MS,
+        max_pending: int = PERSISTENCE_MAX_PENDING,
+        enqueue_timeout_ms: int = PERSISTENCE_ENQUEUE_TIMEOUT_MS,
+        max_retries: int = PERSISTENCE_MAX_RETRIES
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self.max_retries = max_retries
+
+        self._pending: List[ChatMessage] = []
+        self._unflushed: Dict[str, Dict[str, ChatMessage]] = {}
+        self._attempts: Dict[str, int] = {}
+        self.dead_letters: Deque[ChatMessage] = deque(maxlen=1000)
+        self._failures = 0
+        self._wakeup = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+        self._closed = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._closed.clear()
+            self._task = asyncio.create_task(self._run())
+            logger.info("MessageWriteQueue started")
+
+    async def stop(self):
+        if self._task is not None:
+            # Not cancelled: the loop finishes the insert it may be in the
+            # middle of and exits, then whatever is left is flushed here.
+            self._closed.set()
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        await self.flush()
+        if self._pending:
+            logger.error(f"MessageWriteQueue stopped with {len(self._pending)} unsaved messages")
+        else:
+            logger.info("MessageWriteQueue stopped, all messages flushed")
+
+    async def enqueue(self, message: ChatMessage) -> ChatMessage:
+        if len(self._pending) >= self.max_pending:
+            await self._wait_for_room()
+
+        self._pending.append(message)
+        self._unflushed.setdefault(message.session_id, {})[message.id] = message
+        metrics.increment("persistence.enqueued")
+
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+        return message
+
+    async def _wait_for_room(self):
+        metrics.increment("persistence.backpressure_waits")
+        if self._task is None:
+            await self.flush()
+        else:
+            deadline = time.monotonic() + self.enqueue_timeout
+            while len(self._pending) >= self.max_pending:
+                self._room.clear()
+                self._wakeup.set()
+                try:
+                    await asyncio.wait_for(self._room.wait(), timeout=max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    break
+
+        if len(self._pending) >= self.max_pending:
+            metrics.increment("persistence.enqueue_rejected")
+            raise WriteQueueFullError(f"{len(self._pending)} messages are waiting to be saved, try again later")
+
+    def pending_for_session(self, session_id: str) -> List[ChatMessage]:
+        return list(self._unflushed.get(session_id, {}).values())
+
+    async def _insert(self, batch: List[ChatMessage]):
+        async with self.session_factory() as db:
+            await ChatRepository(db).add_messages(batch)
+
+    async def _write(self, batch: List[ChatMessage], written: List[ChatMessage], failed: List[ChatMessage]):
+        """Insert batch, splitting it on failure; rows failing on their own end up in failed."""
+        try:
+            await self._insert(batch)
+            written.extend(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                failed.append(batch[0])
+                logger.error(f"Error saving message {batch[0].id}: {str(e)}")
+                return
+            middle = len(batch) // 2
+            await self._write(batch[:middle], written, failed)
+            await self._write(batch[middle:], written, failed)
+
+    def _settle(self, batch: List[ChatMessage], written: List[ChatMessage], failed: List[ChatMessage]) -> int:
+        """Take batch off the head of the queue, putting back rows to retry; returns how many were put back."""
+        del self._pending[:len(batch)]
+
+        done = {message.id for message in written}
+        # A row failing while others were written is at fault; if nothing
+        # could be written the database is, and no row is charged.
+        if written:
+            for message in failed:
+                attempts = self._attempts.get(message.id, 0) + 1
+                self._attempts[message.id] = attempts
+                if attempts >= self.max_retries:
+                    logger.error(f"Dropping message {message.id} after {attempts} failed inserts")
+                    metrics.increment("persistence.dead_lettered")
+                    self.dead_letters.append(message)
+                    done.add(message.id)
+
+        for message in batch:
+            if message.id in done:
+                self._attempts.pop(message.id, None)
+                session_messages = self._unflushed.get(message.session_id)
+                if session_messages is not None:
+                    session_messages.pop(message.id, None)
+                    if not session_messages:
+                        del self._unflushed[message.session_id]
+
+        retry = [message for message in batch if message.id not in done]
+        self._pending[:0] = retry
+        if len(self._pending) < self.max_pending:
+            self._room.set()
+        return len(retry)
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            flushed = 0
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                written: List[ChatMessage] = []
+                failed: List[ChatMessage] = []
+
+                start = time.perf_counter()
+                try:
+                    await self._write(batch, written, failed)
+                finally:
+                    # Also on cancellation: rows not known to be written stay queued
+                    retried = self._settle(batch, written, failed)
+
+                if written:
+                    metrics.observe("persistence.flush_ms", (time.perf_counter() - start) * 1000)
+                    metrics.observe("persistence.batch_size", len(written))
+                flushed += len(written)
+
+                if retried:
+                    self._failures += 1
+                    metrics.increment("persistence.flush_errors")
+                    logger.error(f"Flush left {retried} of {len(batch)} messages unsaved, retrying later")
+                    break
+                self._failures = 0
+
+            return flushed
+
+    async def _run(self):
+        while not self._closed.is_set():
+            if self._failures:
+                # Back off while inserts fail; new rows do not cut the wait short
+                delay = min(self.flush_interval * 2 ** self._failures, _MAX_BACKOFF_SECONDS)
+                try:
+                    await asyncio.wait_for(self._closed.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+
+            if self._pending and not self._closed.is_set():
+                await self.flush()
@@ -0,0 +1,196 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from jose import JWTError, jwt
+import logging
+import time
+
+from app.config import (
+    PRINCIPAL_CACHE_ENABLED,
+    PRINCIPAL_CACHE_TTL_SECONDS,
+    TOKEN_DECODE_CACHE_TTL_SECONDS,
+    PRINCIPAL_CACHE_MAX_ENTRIES,
+    REVOKED_TOKENS_SYNC_SECONDS,
+)
+from app.models.user import DBUser
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRevokedError(JWTError):
+    """The token's jti has been revoked (logout)."""
+
+
+def _snapshot(user: DBUser) -> DBUser:
+    # A transient copy: the row's own instance belongs to a request session
+    # and expires with it. The password hash is deliberately left out.
+    return DBUser(id=user.id, email=user.email, is_active=user.is_active, created_at=user.created_at)
+
+
+class PrincipalCache:
+    """
+    Per-process cache of what a bearer token authenticates as.
+
+    Two layers, both bounded by max_entries (least recently used first):
+    decoded claims by token for token_ttl seconds, so repeated requests
+    skip signature verification, and a copy of the user row by subject
+    (the token's `sub`, the email) for principal_ttl seconds, so they skip
+    the users lookup. Claims never outlive the token's `exp`.
+
+    revoke() denies a token's jti until it would have expired anyway; the
+    check runs on every decode, cached or not. The denylist here mirrors
+    the revoked_tokens table, which the caller writes on logout:
+    sync_revocations() reloads it every sync_seconds, so a token revoked on
+    another worker, or before a restart, is denied within that delay.
+    evict() drops a user's entry when their account changes, so the next
+    request re-reads it; it is local to this process, and other workers
+    pick up account changes once their entry's TTL runs out.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = PRINCIPAL_CACHE_ENABLED,
+        principal_ttl: float = PRINCIPAL_CACHE_TTL_SECONDS,
+        token_ttl: float = TOKEN_DECODE_CACHE_TTL_SECONDS,
+        max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES,
+        sync_seconds: float = REVOKED_TOKENS_SYNC_SECONDS
+    ):
+        self.enabled = enabled
+        self.principal_ttl = principal_ttl
+        self.token_ttl = token_ttl
+        self.max_entries = max_entries
+        self.sync_seconds = sync_seconds
+        # token -> (claims, monotonic expiry)
+        self._tokens: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        # subject -> (user copy, monotonic expiry)
+        self._principals: "OrderedDict[str, Tuple[DBUser, float]]" = OrderedDict()
+        # jti -> unix time the token expires
+        self._revoked: Dict[str, float] = {}
+        # Monotonic time of the last sync_revocations(), None before the first
+        self._synced_at: Optional[float] = None
+        # Bumped by evict(); a lookup that raced an eviction is not cached
+        self._generation = 0
+        self.token_hits = 0
+        self.token_misses = 0
+        self.principal_hits = 0
+        self.principal_misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _get(entries: OrderedDict, key: str) -> Optional[Any]:
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return entry[0]
+
+    def _put(self, entries: OrderedDict, key: str, value: Any, ttl: float):
+        entries[key] = (value, time.monotonic() + ttl)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def decode(self, token: str, secret_key: str, algorithm: str) -> Dict[str, Any]:
+        """Verified claims of token; raises JWTError if it is invalid, expired or revoked."""
+        claims = self._get(self._tokens, token) if self.enabled else None
+        if claims is not None:
+            self.token_hits += 1
+        else:
+            self.token_misses += 1
+            claims = jwt.decode(token, secret_key, algorithms=[algorithm])
+            if self.enabled:
+                ttl = self.token_ttl
+                if isinstance(claims.get("exp"), (int, float)):
+                    ttl = min(ttl, claims["exp"] - time.time())
+                if ttl > 0:
+                    self._put(self._tokens, token, claims, ttl)
+
+        jti = claims.get("jti")
+        if jti is not None and jti in self._revoked:
+            raise TokenRevokedError("Token has been revoked")
+        return claims
+
+    def _prune_revoked(self):
+        now = time.time()
+        for jti in [jti for jti, expires in self._revoked.items() if expires <= now]:
+            del self._revoked[jti]
+
+    def revoke(self, claims: Dict[str, Any]) -> Optional[float]:
+        """
+        Deny the token with these claims from now on. Returns the unix time
+        the denial can be dropped, to persist with the jti, or None if the
+        token has no jti to deny.
+        """
+        self._prune_revoked()
+        jti = claims.get("jti")
+        if jti is None:
+            return None
+        exp = claims.get("exp")
+        expires_at = float(exp) if isinstance(exp, (int, float)) else time.time() + self.token_ttl
+        self._revoked[jti] = expires_at
+        metrics.increment("auth.tokens_revoked")
+        return expires_at
+
+    async def sync_revocations(self, repository):
+        """
+        Merge in the persisted denylist (repository.get_revoked_tokens()) if
+        it was last loaded more than sync_seconds ago.
+        """
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < self.sync_seconds:
+            return
+        # Claimed up front so concurrent requests do not all reload it
+        previous, self._synced_at = self._synced_at, now
+        try:
+            revoked = await repository.get_revoked_tokens()
+        except BaseException:
+            self._synced_at = previous
+            raise
+        self._revoked.update(revoked)
+        self._prune_revoked()
+
+    def get_principal(self, subject: str) -> Optional[DBUser]:
+        user = self._get(self._principals, subject) if self.enabled else None
+        if user is not None:
+            self.principal_hits += 1
+        else:
+            self.principal_misses += 1
+        return user
+
+    def generation(self) -> int:
+        """Pass to put_principal, read before looking the user up."""
+        return self._generation
+
+    def put_principal(self, subject: str, user: DBUser, generation: int) -> DBUser:
+        """Cache a copy of user and return it, unless an eviction happened since generation."""
+        if not self.enabled:
+            return user
+        principal = _snapshot(user)
+        if generation == self._generation:
+            self._put(self._principals, subject, principal, self.principal_ttl)
+        return principal
+
+    def evict(self, *subjects: str):
+        self._generation += 1
+        for subject in subjects:
+            if self._principals.pop(subject, None) is not None:
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        token_lookups = self.token_hits + self.token_misses
+        principal_lookups = self.principal_hits + self.principal_misses
+        return {
+            "enabled": self.enabled,
+            "tokens": len(self._tokens),
+            "token_hit_ratio": round(self.token_hits / token_lookups, 4) if token_lookups else None,
+            "principals": len(self._principals),
+            "principal_hit_ratio": round(self.principal_hits / principal_lookups, 4) if principal_lookups else None,
+            "evictions": self.evictions,
+            "revoked": len(self._revoked),
+        }
+
+
+principal_cache = PrincipalCache()
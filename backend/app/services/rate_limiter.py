@@ -0,0 +1,236 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Mapping, Optional
+import logging
+import re
+import time
+
+from app.config import GROQ_RPM_LIMIT, GROQ_TPM_LIMIT
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+# Called with the queue length and an estimated wait in seconds when a request
+# has to wait for capacity
+QueuedCallback = Callable[[int, float], Awaitable[None]]
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset headers such as "2m59.56s", "7.66s" or "120ms" into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, per_seconds: float = 60.0):
+        self.capacity = capacity
+        self.rate = capacity / per_seconds
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until amount can be taken (requests larger than the bucket wait for a full one)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def limit_to(self, remaining: float):
+        self._refill()
+        self.level = min(self.level, remaining)
+
+
+class _Waiter:
+    __slots__ = ("user_key", "cost", "future", "enqueued_at")
+
+    def __init__(self, user_key: str, cost: float):
+        self.user_key = user_key
+        self.cost = cost
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.perf_counter()
+
+
+class RateLimitScheduler:
+    """
+    Client-side requests-per-minute and tokens-per-minute budget for Groq.
+
+    Requests that fit the budget start immediately. Otherwise they wait in
+    per-user FIFO queues that are served round-robin, so one heavy user
+    cannot starve the others, and interactive work is always served
+    before bulk work. Response headers keep the buckets in line with what
+    Groq reports.
+    """
+
+    def __init__(self, rpm: int = GROQ_RPM_LIMIT, tpm: int = GROQ_TPM_LIMIT):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._queues: Dict[int, "OrderedDict[str, Deque[_Waiter]]"] = {
+            PRIORITY_INTERACTIVE: OrderedDict(),
+            PRIORITY_BULK: OrderedDict(),
+        }
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for queues in self._queues.values() for waiters in queues.values())
+
+    def _delay_for(self, cost: float) -> float:
+        return max(
+            self._paused_until - time.monotonic(),
+            self.requests.delay_for(1),
+            self.tokens.delay_for(cost)
+        )
+
+    def _grant(self, cost: float):
+        self.requests.take(1)
+        self.tokens.take(cost)
+
+    def try_acquire(self, cost: float) -> bool:
+        """Take budget only if it is free right now and nobody is waiting for it."""
+        if self.queued == 0 and self._delay_for(cost) <= 0:
+            self._grant(cost)
+            return True
+        return False
+
+    async def acquire(
+        self,
+        user_key: str,
+        cost: float,
+        priority: int = PRIORITY_INTERACTIVE,
+        on_queued: Optional[QueuedCallback] = None
+    ) -> float:
+        """Wait for budget for one request of roughly cost tokens; returns the seconds waited."""
+        if self.try_acquire(cost):
+            metrics.observe("groq.queue_wait_ms", 0.0)
+            return 0.0
+
+        waiter = _Waiter(user_key, cost)
+        estimated_wait = self._delay_for(cost)
+        self._queues[priority].setdefault(user_key, deque()).append(waiter)
+        self._ensure_dispatcher()
+        metrics.increment("groq.requests_queued")
+
+        try:
+            if on_queued is not None:
+                try:
+                    await on_queued(self.queued, estimated_wait)
+                except Exception as e:
+                    # Only a notice to the caller; the request keeps its place in line
+                    logger.error(f"Queued callback failed: {str(e)}")
+            await waiter.future
+        except BaseException:
+            self._remove(priority, waiter)
+            raise
+
+        waited = time.perf_counter() - waiter.enqueued_at
+        metrics.observe("groq.queue_wait_ms", waited * 1000)
+        return waited
+
+    def _remove(self, priority: int, waiter: _Waiter):
+        waiters = self._queues[priority].get(waiter.user_key)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._queues[priority][waiter.user_key]
+            self._notify()
+
+    def _peek(self) -> Optional[tuple]:
+        for priority in (PRIORITY_INTERACTIVE, PRIORITY_BULK):
+            queues = self._queues[priority]
+            if queues:
+                user_key, waiters = next(iter(queues.items()))
+                return priority, user_key, waiters[0]
+        return None
+
+    def _ensure_dispatcher(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._notify()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            head = self._peek()
+            if head is None:
+                return
+            priority, user_key, waiter = head
+
+            delay = self._delay_for(waiter.cost)
+            if delay > 0:
+                # Re-evaluate early if a higher priority request or a header update arrives
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            queues = self._queues[priority]
+            waiters = queues[user_key]
+            waiters.popleft()
+            # Round-robin: this user goes to the back of the line
+            del queues[user_key]
+            if waiters:
+                queues[user_key] = waiters
+
+            if not waiter.future.done():
+                self._grant(waiter.cost)
+                waiter.future.set_result(None)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Align the buckets with x-ratelimit-* and retry-after response headers."""
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        try:
+            if remaining_requests is not None:
+                self.requests.limit_to(float(remaining_requests))
+            if remaining_tokens is not None:
+                self.tokens.limit_to(float(remaining_tokens))
+        except ValueError:
+            logger.debug("Ignoring malformed rate limit headers")
+
+        retry_after = parse_reset_duration(headers.get("retry-after"))
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            metrics.increment("groq.rate_limited")
+            logger.warning(f"Groq rate limit hit, pausing requests for {retry_after:.1f}s")
+        self._notify()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queued": self.queued,
+            "requests_available": round(self.requests.level, 1),
+            "tokens_available": round(self.tokens.level, 1),
+            "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3),
+        }
@@ -0,0 +1,349 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+import logging
+import random
+import time
+
+from app.config import (
+    GROQ_RETRY_ATTEMPTS,
+    GROQ_RETRY_BASE_MS,
+    GROQ_RETRY_MAX_MS,
+    GROQ_HEDGE_ENABLED,
+    GROQ_HEDGE_PERCENTILE,
+    GROQ_HEDGE_MIN_SAMPLES,
+    GROQ_HEDGE_MIN_DELAY_MS,
+    GROQ_HEDGE_MAX_RATIO,
+    GROQ_BREAKER_FAILURE_THRESHOLD,
+    GROQ_BREAKER_RESET_SECONDS
+)
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Opens one streaming attempt against a model. hedge is True for a hedged
+# duplicate; the factory may return None to decline it (e.g. no rate budget).
+AttemptFactory = Callable[[str, bool], Awaitable[Optional[AsyncIterator[str]]]]
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker for the primary model.
+
+    After failure_threshold failures in a row it opens for reset_seconds;
+    then a single probe request is let through, and its outcome closes or
+    re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = GROQ_BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = GROQ_BREAKER_RESET_SECONDS
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Circuit breaker closed, primary model is healthy again")
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Circuit breaker opened after {self.failures} consecutive failures")
+                metrics.increment("groq.breaker_opened")
+            self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """The probe ended without an outcome (cancelled, or an error that says nothing
+        about the model's health); let another one through."""
+        self.probing = False
+
+
+class LatencyTracker:
+    """Sliding window of recent time-to-first-token samples, in seconds."""
+
+    def __init__(self, size: int = 200):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _Attempt:
+    __slots__ = ("model", "iterator", "started", "pending", "probe")
+
+    def __init__(self, model: str, iterator: AsyncIterator[str], probe: bool):
+        self.model = model
+        self.iterator = iterator
+        self.probe = probe
+        self.started = time.perf_counter()
+        self.pending = asyncio.ensure_future(iterator.__anext__())
+
+    async def close(self):
+        if not self.pending.done():
+            self.pending.cancel()
+            try:
+                await self.pending
+            except BaseException:
+                pass
+        await self.iterator.aclose()
+
+
+class ResilientCaller:
+    """
+    Retries, hedging and model fallback around upstream LLM calls.
+
+    Failures are retried with full-jitter exponential backoff, but only
+    until the first token: once text has reached the client a retry would
+    duplicate it, so later errors are raised. With hedging on, a second
+    request is started when the first token is later than the observed
+    p95 time-to-first-token; whichever answers first wins and the other
+    is closed straight away. Hedges are capped at hedge_max_ratio of all
+    requests so tail latency does not cost double spend. While the circuit
+    breaker is open, requests go to the fallback model.
+    """
+
+    def __init__(
+        self,
+        primary_model: str,
+        fallback_model: Optional[str] = None,
+        is_retryable: Callable[[BaseException], bool] = lambda e: True,
+        retry_attempts: int = GROQ_RETRY_ATTEMPTS,
+        retry_base_ms: int = GROQ_RETRY_BASE_MS,
+        retry_max_ms: int = GROQ_RETRY_MAX_MS,
+        hedge_enabled: bool = GROQ_HEDGE_ENABLED,
+        hedge_percentile: float = GROQ_HEDGE_PERCENTILE,
+        hedge_min_samples: int = GROQ_HEDGE_MIN_SAMPLES,
+        hedge_min_delay_ms: int = GROQ_HEDGE_MIN_DELAY_MS,
+        hedge_max_ratio: float = GROQ_HEDGE_MAX_RATIO,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.primary_model = primary_model
+        self.fallback_model = fallback_model or None
+        self.is_retryable = is_retryable
+        self.retry_attempts = retry_attempts
+        self.retry_base = retry_base_ms / 1000
+        self.retry_max = retry_max_ms / 1000
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay_ms / 1000
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breaker = breaker or CircuitBreaker()
+        self.ttft = LatencyTracker()
+        self.requests = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+
+    def _select_model(self) -> Tuple[str, bool]:
+        """Model for the next attempt, and whether it is the breaker's probe."""
+        if self.fallback_model is None:
+            return self.primary_model, False
+        was_half_open = self.breaker.state == "half_open"
+        if self.breaker.allow():
+            return self.primary_model, was_half_open
+        self.fallbacks += 1
+        metrics.increment("groq.fallback_requests")
+        return self.fallback_model, False
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.retry_max, self.retry_base * (2 ** attempt)))
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge_enabled or len(self.ttft) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.ttft.percentile(self.hedge_percentile))
+
+    def _may_hedge(self) -> bool:
+        return self.hedges < self.hedge_max_ratio * self.requests
+
+    def _record_failure(self, model: str, error: BaseException):
+        if model == self.primary_model and self.is_retryable(error):
+            self.breaker.record_failure()
+
+    def _record_success(self, attempt: _Attempt):
+        ttft = time.perf_counter() - attempt.started
+        metrics.observe("groq.ttft_ms", ttft * 1000)
+        if attempt.model == self.primary_model:
+            self.ttft.add(ttft)
+            self.breaker.record_success()
+
+    async def _open(self, factory: AttemptFactory, hedge: bool) -> Optional[_Attempt]:
+        model, probe = self._select_model()
+        try:
+            iterator = await factory(model, hedge)
+        except BaseException:
+            if probe:
+                self.breaker.release_probe()
+            raise
+        if iterator is None:
+            if probe:
+                self.breaker.release_probe()
+            return None
+        return _Attempt(model, iterator, probe)
+
+    async def _close(self, attempt: _Attempt):
+        if attempt.probe and self.breaker.probing:
+            self.breaker.release_probe()
+        await attempt.close()
+
+    async def _first_token(self, factory: AttemptFactory) -> Tuple[_Attempt, Optional[str]]:
+        """Race the attempt (and maybe a hedge) to the first token."""
+        first = await self._open(factory, False)
+        attempts: List[_Attempt] = [first]
+        hedge_delay = self.hedge_delay()
+        error: Optional[BaseException] = None
+
+        try:
+            while attempts:
+                timeout = None
+                if hedge_delay is not None:
+                    timeout = max(0.0, first.started + hedge_delay - time.perf_counter())
+
+                done, _ = await asyncio.wait(
+                    [attempt.pending for attempt in attempts],
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    # Only ever one hedge per request
+                    hedge_delay = None
+                    if self._may_hedge():
+                        hedge = await self._open(factory, True)
+                        if hedge is not None:
+                            self.hedges += 1
+                            metrics.increment("groq.hedges")
+                            attempts.append(hedge)
+                    continue
+
+                for attempt in [a for a in attempts if a.pending in done]:
+                    try:
+                        token = attempt.pending.result()
+                    except StopAsyncIteration:
+                        token = None
+                    except Exception as e:
+                        error = e
+                        attempts.remove(attempt)
+                        self._record_failure(attempt.model, e)
+                        logger.warning(f"Groq attempt on {attempt.model} failed before first token: {str(e)}")
+                        await self._close(attempt)
+                        continue
+
+                    attempts.remove(attempt)
+                    self._record_success(attempt)
+                    if attempt is not first:
+                        self.hedge_wins += 1
+                        metrics.increment("groq.hedge_wins")
+                    return attempt, token
+        finally:
+            for attempt in attempts:
+                await self._close(attempt)
+
+        raise error
+
+    async def stream(self, factory: AttemptFactory) -> AsyncIterator[str]:
+        self.requests += 1
+        retry = 0
+        while True:
+            try:
+                attempt, token = await self._first_token(factory)
+                break
+            except Exception as e:
+                if retry >= self.retry_attempts or not self.is_retryable(e):
+                    raise
+                delay = self._backoff(retry)
+                retry += 1
+                self.retries += 1
+                metrics.increment("groq.retries")
+                logger.info(f"Retrying Groq request in {delay:.2f}s (attempt {retry + 1})")
+                await asyncio.sleep(delay)
+
+        try:
+            if token is None:
+                return
+            yield token
+            async for token in attempt.iterator:
+                yield token
+        finally:
+            await attempt.close()
+
+    async def call(self, fn: Callable[[str], Awaitable[T]]) -> T:
+        """Non-streaming call with the same retry and fallback rules (no hedging)."""
+        self.requests += 1
+        retry = 0
+        while True:
+            model, probe = self._select_model()
+            try:
+                result = await fn(model)
+            except asyncio.CancelledError:
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            except Exception as e:
+                self._record_failure(model, e)
+                if probe and self.breaker.probing:
+                    self.breaker.release_probe()
+                if retry >= self.retry_attempts or not self.is_retryable(e):
+                    raise
+                delay = self._backoff(retry)
+                retry += 1
+                self.retries += 1
+                metrics.increment("groq.retries")
+                await asyncio.sleep(delay)
+                continue
+
+            if model == self.primary_model:
+                self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, float]:
+        p95 = self.ttft.percentile(0.95)
+        return {
+            "breaker": self.breaker.state,
+            "requests": self.requests,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "ttft_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
@@ -0,0 +1,110 @@
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+import logging
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class SharedStream:
+    """
+    One upstream token stream fanned out to any number of subscribers.
+
+    Every subscriber gets its own queue, pre-filled with the tokens emitted
+    before it joined. The upstream is cancelled only when the last
+    subscriber leaves; an upstream error is raised in every subscriber.
+    """
+
+    def __init__(self, key: str, factory: Callable[[], AsyncIterator[str]], on_finish: Callable[["SharedStream"], None]):
+        self.key = key
+        self.tokens: List[str] = []
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._on_finish = on_finish
+        self._task = asyncio.create_task(self._run(factory))
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def _run(self, factory: Callable[[], AsyncIterator[str]]):
+        upstream = factory()
+        try:
+            async for token in upstream:
+                self.tokens.append(token)
+                for queue in self._subscribers:
+                    queue.put_nowait(token)
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+        except Exception as e:
+            self.error = e
+        finally:
+            await upstream.aclose()
+            self.done = True
+            for queue in self._subscribers:
+                queue.put_nowait(_END)
+            self._on_finish(self)
+
+    def subscribe(self) -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        for token in self.tokens:
+            queue.put_nowait(token)
+        if self.done:
+            queue.put_nowait(_END)
+        self._subscribers.add(queue)
+        return self._follow(queue)
+
+    async def _follow(self, queue: asyncio.Queue) -> AsyncIterator[str]:
+        try:
+            while True:
+                token = await queue.get()
+                if token is _END:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                yield token
+        finally:
+            self._subscribers.discard(queue)
+            if not self._subscribers and not self.done:
+                # Nobody is listening any more; stop paying for the upstream
+                self._on_finish(self)
+                self._task.cancel()
+
+
+class SingleFlight:
+    """Coalesces concurrent requests with the same key onto one upstream stream."""
+
+    def __init__(self):
+        self._inflight: Dict[str, SharedStream] = {}
+        self.upstream_calls = 0
+        self.shared_subscribers = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        shared = self._inflight.get(key)
+        if shared is None:
+            shared = SharedStream(key, factory, self._finish)
+            self._inflight[key] = shared
+            self.upstream_calls += 1
+            metrics.increment("singleflight.upstream_calls")
+        else:
+            self.shared_subscribers += 1
+            metrics.increment("singleflight.upstream_calls_saved")
+        return shared.subscribe()
+
+    def _finish(self, shared: SharedStream):
+        if self._inflight.get(shared.key) is shared:
+            del self._inflight[shared.key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "inflight": len(self._inflight),
+            "upstream_calls": self.upstream_calls,
+            "upstream_calls_saved": self.shared_subscribers,
+        }
@@ -0,0 +1,145 @@
+import asyncio
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from app.config import USAGE_TRACKING_ENABLED, USAGE_FLUSH_INTERVAL_SECONDS
+from app.db.database import AsyncSessionLocal
+from app.db.repositories.usage_repository import UsageRepository
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# (day, user_id, session_id, model)
+UsageKey = Tuple[date, str, str, str]
+
+
+class _Counters:
+    __slots__ = ("requests", "prompt_tokens", "completion_tokens", "latency_ms")
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_ms = 0.0
+
+
+class UsageTracker:
+    """
+    In-memory token usage aggregation, flushed to usage_rollups.
+
+    record() only adds to a dict entry per (day, user, session, model), so
+    a completion costs no I/O. A background task upserts the accumulated
+    rows every flush_interval_seconds in one statement; rows from a failed
+    or cancelled flush are merged back and retried on the next one. stop()
+    lets a flush in progress finish rather than cancelling it, then flushes
+    whatever is left.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        flush_interval_seconds: float = USAGE_FLUSH_INTERVAL_SECONDS,
+        enabled: bool = USAGE_TRACKING_ENABLED
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_seconds
+        self.enabled = enabled
+        self._pending: Dict[UsageKey, _Counters] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = asyncio.Event()
+
+    def record(
+        self,
+        user_id: Optional[str],
+        session_id: Optional[str],
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency_ms: float
+    ):
+        if not self.enabled:
+            return
+        key = (datetime.utcnow().date(), user_id or "", session_id or "", model or "")
+        counters = self._pending.get(key)
+        if counters is None:
+            counters = self._pending[key] = _Counters()
+        counters.requests += 1
+        counters.prompt_tokens += prompt_tokens
+        counters.completion_tokens += completion_tokens
+        counters.latency_ms += latency_ms
+        metrics.increment("usage.prompt_tokens", prompt_tokens)
+        metrics.increment("usage.completion_tokens", completion_tokens)
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._closed.clear()
+            self._task = asyncio.create_task(self._run())
+            logger.info("UsageTracker started")
+
+    async def stop(self):
+        self._closed.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._closed.is_set():
+            try:
+                await asyncio.wait_for(self._closed.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._closed.is_set():
+                return
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Usage flush failed, will retry: {str(e)}")
+
+    def _merge(self, pending: Dict[UsageKey, _Counters]):
+        for key, counters in pending.items():
+            current = self._pending.get(key)
+            if current is None:
+                self._pending[key] = counters
+                continue
+            current.requests += counters.requests
+            current.prompt_tokens += counters.prompt_tokens
+            current.completion_tokens += counters.completion_tokens
+            current.latency_ms += counters.latency_ms
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            rows: List[dict] = [
+                {
+                    "day": day,
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "model": model,
+                    "requests": counters.requests,
+                    "prompt_tokens": counters.prompt_tokens,
+                    "completion_tokens": counters.completion_tokens,
+                    "total_tokens": counters.prompt_tokens + counters.completion_tokens,
+                    "latency_ms": counters.latency_ms,
+                }
+                for (day, user_id, session_id, model), counters in pending.items()
+            ]
+            try:
+                async with self.session_factory() as db:
+                    await UsageRepository(db).upsert_rollups(rows)
+            except BaseException:
+                # Also on cancellation: the rows may not have been written
+                self._merge(pending)
+                raise
+            metrics.increment("usage.rows_flushed", len(rows))
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending_rows": len(self._pending)}
+
+
+usage_tracker = UsageTracker()
+metrics.register_collector("usage", usage_tracker.stats)
@@ -0,0 +1,25 @@
+import json
+from datetime import date, datetime
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Compact UTF-8 JSON of plain dicts/lists/scalars, in the same form as
+    FastAPI's JSONResponse (datetimes as ISO 8601). Uses orjson when it is
+    installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
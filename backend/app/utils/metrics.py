@@ -0,0 +1,72 @@
+import threading
+from typing import Callable, Dict, Any
+
+
+class Summary:
+    """Running count/sum/min/max for a numeric observation."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "avg": round(self.total / self.count, 3) if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+class MetricsRegistry:
+    """In-process counters and summaries exposed through the /metrics endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._summaries: Dict[str, Summary] = {}
+        self._collectors: Dict[str, Callable[[], Any]] = {}
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = Summary()
+            summary.observe(value)
+
+    def register_collector(self, name: str, collector: Callable[[], Any]):
+        """Attach a callable whose result is included in every snapshot under name."""
+        self._collectors[name] = collector
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                "counters": dict(self._counters),
+                "summaries": {name: s.snapshot() for name, s in self._summaries.items()},
+            }
+        for name, collector in self._collectors.items():
+            data[name] = collector()
+        return data
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,50 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+# Position of the last row a client has seen: (timestamp the list is ordered by, id)
+Cursor = Tuple[datetime, str]
+
+# Position in a relevance-ranked list: (rank, id)
+RankCursor = Tuple[float, str]
+
+
+def _encode(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> Tuple[str, str]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    key, row_id = raw.split("|", 1)
+    return key, row_id
+
+
+def encode_cursor(timestamp: datetime, row_id: str) -> str:
+    return _encode(f"{timestamp.isoformat()}|{row_id}")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        timestamp, row_id = _decode(cursor)
+        return datetime.fromisoformat(timestamp), row_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def encode_rank_cursor(rank: float, row_id: str) -> str:
+    # repr round-trips the float exactly, so ties compare equal on the next page
+    return _encode(f"{rank!r}|{row_id}")
+
+
+def decode_rank_cursor(cursor: Optional[str]) -> Optional[RankCursor]:
+    """Inverse of encode_rank_cursor; raises ValueError for a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        rank, row_id = _decode(cursor)
+        return float(rank), row_id
+    except Exception:
+        raise ValueError("Invalid cursor")
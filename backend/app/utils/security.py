@@ -1,9 +1,17 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
 from jose import jwt
+import asyncio
 import os
+import time
+from uuid import uuid4
 
+from app.config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE
+from app.utils.metrics import metrics
+
+# Shared by everything that hashes or verifies passwords
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -26,6 +34,72 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": str(uuid4())})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+
+class PasswordHasherBusyError(Exception):
+    """Every hashing worker is busy and the wait queue is full; retry later."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification on a dedicated thread pool so a
+    login never blocks the event loop (and every token stream on it) for
+    the tens of milliseconds a hash takes. bcrypt releases the GIL, so
+    hashes also run in parallel with the loop.
+
+    At most `workers` hashes run at once and `max_queue` more may wait;
+    beyond that calls fail immediately with PasswordHasherBusyError rather
+    than queueing up behind a login storm. workers=0 hashes inline on the
+    event loop.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def _run(self, operation: str, fn: Callable[..., Any], *args) -> Any:
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            metrics.increment("auth.password_hash_rejected")
+            raise PasswordHasherBusyError("Too many concurrent password checks, try again shortly")
+
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            # Includes time waiting for a worker
+            metrics.observe(f"auth.password_{operation}_ms", (time.perf_counter() - start) * 1000)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", pwd_context.verify, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,103 @@
+"""
+Authenticated request cost with and without the principal cache.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_auth [--requests 2000] [--users 50]
+
+Signs up --users users, then sends --requests GET /api/auth/me requests
+spread over their tokens in-process through the ASGI app, once with
+PRINCIPAL_CACHE_ENABLED=false (every request verifies the JWT signature
+and looks the user up) and once with it on. Each mode runs in its own
+process. Reports requests/sec, p50/p95 latency and SQL statements executed
+per request.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Dict
+
+
+async def _measure(users: int, requests: int) -> Dict:
+    import httpx
+    from sqlalchemy import event
+    from app.db.database import engine, init_db
+    from app.main import app
+
+    await init_db()
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        headers = []
+        for i in range(users):
+            response = await client.post("/api/auth/signup", json={"email": f"user{i}@example.com", "password": "benchmark-password"})
+            response.raise_for_status()
+            headers.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+
+        event.listen(engine.sync_engine, "before_cursor_execute", count)
+        samples = []
+        started = time.perf_counter()
+        for n in range(requests):
+            start = time.perf_counter()
+            (await client.get("/api/auth/me", headers=headers[n % users])).raise_for_status()
+            samples.append((time.perf_counter() - start) * 1000)
+        elapsed = time.perf_counter() - started
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+
+    samples.sort()
+    return {
+        "rps": round(requests / elapsed),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95)], 3),
+        "statements": round(statements / requests, 3),
+    }
+
+
+def _worker(path: str, cached: bool, users: int, requests: int, results):
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    os.environ["PRINCIPAL_CACHE_ENABLED"] = "true" if cached else "false"
+    os.environ.setdefault("SECRET_KEY", "bench-auth")
+    os.environ.setdefault("LLM_PROVIDER", "mock")
+    # Signups hash inline; the pool is not what is measured here
+    os.environ["PASSWORD_HASH_WORKERS"] = "0"
+    import logging
+    logging.disable(logging.INFO)
+    results.put(asyncio.run(_measure(users, requests)))
+
+
+def run_isolated(cached: bool, users: int, requests: int) -> Dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    with tempfile.TemporaryDirectory(prefix="bench_auth_") as tmp:
+        process = context.Process(target=_worker, args=(os.path.join(tmp, "chatbot.db"), cached, users, requests, results))
+        process.start()
+        result = results.get()
+        process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    report = {
+        "uncached": run_isolated(False, args.users, args.requests),
+        "cached": run_isolated(True, args.users, args.requests),
+    }
+    print(f"GET /api/auth/me x {args.requests} over {args.users} users' tokens")
+    for mode, row in report.items():
+        print(f"  {mode:<9} {row['rps']:>6} req/s  p50 {row['p50_ms']:>7.3f} ms  p95 {row['p95_ms']:>7.3f} ms  "
+              f"{row['statements']} SQL statements/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+History reads with and without the in-process history cache.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_history_cache [--sessions 200] [--messages 100] [--reads 2000]
+
+Fills a SQLite database with --sessions sessions of --messages messages,
+then replays the same workload with and without a HistoryCache: reads of
+the first history page (what opening a session in the UI does) and of the
+recent history used to rebuild prompt context, over sessions picked with a
+skew towards recently active ones, interleaved with new messages being saved
+(--write-every). Reports per-read latency, the cache's hit ratio and its
+estimated and measured memory.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+
+async def populate(sessions: int, messages: int):
+    from app.db.database import session_scope
+    from app.db.migrations import run_migrations
+    from app.db.repositories.chat_repository import ChatRepository
+    from app.models.chat import ChatMessage
+
+    await run_migrations()
+    start = datetime(2026, 1, 1)
+    for s in range(sessions):
+        async with session_scope() as db:
+            await ChatRepository(db).add_messages([
+                ChatMessage(
+                    id=f"s{s:05d}-m{i:05d}", session_id=f"s{s:05d}", is_user=i % 2 == 0,
+                    content=f"message {i} of session {s}, " + "a typical sentence of chat text " * 3,
+                    created_at=start + timedelta(seconds=s * messages + i)
+                )
+                for i in range(messages)
+            ])
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 3)
+
+
+async def workload(cached: bool, sessions: int, reads: int, write_every: int, seed: int) -> Dict:
+    from app.db.database import session_scope
+    from app.db.repositories.chat_repository import ChatRepository
+    from app.models.chat import ChatMessage
+    from app.services.chat_service import ChatService
+    from app.services.history_cache import HistoryCache
+
+    rng = random.Random(seed)
+    cache = HistoryCache() if cached else None
+    page, recent = [], []
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for n in range(reads):
+        session_id = f"s{min(sessions - 1, int(rng.expovariate(1 / (sessions / 8)))):05d}"
+        async with session_scope() as db:
+            chat_service = ChatService(ChatRepository(db), history_cache=cache)
+            if write_every and n % write_every == 0:
+                await chat_service.save_message(ChatMessage(session_id=session_id, is_user=True, content=f"new {n}"))
+            start = time.perf_counter()
+            await chat_service.get_history_page(session_id, 50)
+            page.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            await chat_service.get_recent_history(session_id, 50)
+            recent.append((time.perf_counter() - start) * 1000)
+    traced_mb = (tracemalloc.get_traced_memory()[0] - baseline) / (1024 * 1024)
+    tracemalloc.stop()
+
+    result = {
+        "page_p50": percentile(page, 0.5), "page_p95": percentile(page, 0.95),
+        "recent_p50": percentile(recent, 0.5), "recent_p95": percentile(recent, 0.95),
+    }
+    if cache is not None:
+        stats = cache.stats()
+        result.update(hit_ratio=stats["hit_ratio"], sessions=stats["sessions"],
+                      estimated_mb=round(stats["bytes"] / (1024 * 1024), 2), traced_mb=round(traced_mb, 2))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--write-every", type=int, default=5, help="save a message before every Nth read (0: never)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory(prefix="bench_history_cache_") as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tmp, 'chatbot.db')}"
+
+        async def run():
+            await populate(args.sessions, args.messages)
+            return {
+                "database": await workload(False, args.sessions, args.reads, args.write_every, args.seed),
+                "cache": await workload(True, args.sessions, args.reads, args.write_every, args.seed),
+            }
+
+        report = asyncio.run(run())
+
+    print(f"{args.sessions} sessions x {args.messages} messages, {args.reads} reads, "
+          f"a save every {args.write_every} reads")
+    for name, row in report.items():
+        line = (f"  {name:<9} first page p50 {row['page_p50']:>7.3f} ms  p95 {row['page_p95']:>7.3f} ms   "
+                f"recent p50 {row['recent_p50']:>7.3f} ms  p95 {row['recent_p95']:>7.3f} ms")
+        if "hit_ratio" in row:
+            line += (f"   hit ratio {row['hit_ratio']}  {row['sessions']} sessions "
+                     f"~{row['estimated_mb']} MB estimated / {row['traced_mb']} MB traced")
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Latency and memory of paginated vs. full-load chat history at 10k, 100k and 1M messages.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_history_pagination [--sizes 10000 100000 1000000] [--legacy-max 100000]
+
+For each size a fresh SQLite database holds one session with that many
+messages (plus size/10 sessions). Each measurement runs in its own process
+so RSS numbers are not polluted by earlier ones:
+
+  first_page / deep_page  one keyset page at the start / 90% into the history
+  export                  every message through the NDJSON exporter
+  legacy                  get_messages_by_session / get_all_sessions, which load
+                          everything (skipped above --legacy-max)
+
+RSS is reported as the peak increase over the process's baseline.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+try:
+    import psutil
+except ImportError:  # optional dependency
+    psutil = None
+
+SESSION_ID = "bench-session"
+
+
+class PeakRss:
+    """Samples this process's RSS in a thread and keeps the peak."""
+
+    def __init__(self, interval: float = 0.005):
+        self.process = psutil.Process() if psutil is not None else None
+        self.interval = interval
+        self.baseline = self.peak = self._rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _rss(self) -> float:
+        return self.process.memory_info().rss / (1024 * 1024) if self.process is not None else 0.0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+    @property
+    def delta_mb(self):
+        return round(self.peak - self.baseline, 1) if self.process is not None else None
+
+
+def populate(path: str, messages: int):
+    """Create the schema through the models, then bulk-insert rows with sqlite3."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.db.database import Base
+    import app.models.chat  # noqa: F401  (registers the tables)
+
+    async def create_schema():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(create_schema())
+
+    start = datetime(2026, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO chat_sessions (id, user_id, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                 (SESSION_ID, "bench", start.strftime("%Y-%m-%d %H:%M:%S.%f"), start.strftime("%Y-%m-%d %H:%M:%S.%f")))
+    batch = 50_000
+    for offset in range(0, messages, batch):
+        conn.executemany(
+            "INSERT INTO chat_messages (id, session_id, user_id, is_user, content, created_at, kind) "
+            "VALUES (?, ?, ?, ?, ?, ?, 'message')",
+            [
+                (f"m{i:08d}", SESSION_ID, "bench", i % 2 == 0,
+                 f"message {i} with a sentence or two of typical chat text in it",
+                 (start + timedelta(milliseconds=i)).strftime("%Y-%m-%d %H:%M:%S.%f"))
+                for i in range(offset, min(messages, offset + batch))
+            ]
+        )
+    conn.executemany(
+        "INSERT INTO chat_sessions (id, user_id, created_at, updated_at) VALUES (?, ?, ?, ?)",
+        [
+            (f"s{i:08d}", f"user{i % 100}", (start + timedelta(milliseconds=i)).strftime("%Y-%m-%d %H:%M:%S.%f"),
+             (start + timedelta(milliseconds=i)).strftime("%Y-%m-%d %H:%M:%S.%f"))
+            for i in range(messages // 10)
+        ]
+    )
+    conn.commit()
+    conn.close()
+
+
+async def _measure(mode: str, messages: int, page_size: int, rounds: int) -> Dict:
+    from app.db.database import session_scope
+    from app.db.repositories.chat_repository import ChatRepository
+    from app.services.history_export import stream_ndjson
+
+    async def timed_pages(cursor) -> float:
+        samples = []
+        for _ in range(rounds):
+            async with session_scope() as db:
+                start = time.perf_counter()
+                await ChatRepository(db).get_messages_page(SESSION_ID, page_size, cursor)
+                samples.append((time.perf_counter() - start) * 1000)
+        return round(sorted(samples)[len(samples) // 2], 2)
+
+    if mode == "pages":
+        deep = int(messages * 0.9)
+        deep_cursor = (datetime(2026, 1, 1) + timedelta(milliseconds=deep), f"m{deep:08d}")
+        first_page = await timed_pages(None)
+        deep_page = await timed_pages(deep_cursor)
+        async with session_scope() as db:
+            start = time.perf_counter()
+            await ChatRepository(db).get_sessions_page(page_size)
+            sessions_page = round((time.perf_counter() - start) * 1000, 2)
+        return {"first_page_ms": first_page, "deep_page_ms": deep_page, "sessions_first_page_ms": sessions_page}
+
+    if mode == "export":
+        async def fetch_page(cursor, limit):
+            async with session_scope() as db:
+                return await ChatRepository(db).get_messages_page(SESSION_ID, limit, cursor)
+
+        with PeakRss() as rss:
+            start = time.perf_counter()
+            rows = size = 0
+            async for chunk in stream_ndjson(fetch_page):
+                rows += chunk.count("\n")
+                size += len(chunk)
+            elapsed = time.perf_counter() - start
+        return {
+            "export_s": round(elapsed, 3),
+            "export_rows_per_sec": round(rows / elapsed),
+            "export_mb": round(size / (1024 * 1024), 1),
+            "export_rss_delta_mb": rss.delta_mb,
+        }
+
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        async with session_scope() as db:
+            repository = ChatRepository(db)
+            loaded = await repository.get_messages_by_session(SESSION_ID)
+            await repository.get_all_sessions()
+        elapsed = time.perf_counter() - start
+    return {"legacy_full_load_s": round(elapsed, 3), "legacy_rows": len(loaded), "legacy_rss_delta_mb": rss.delta_mb}
+
+
+def _worker(path: str, mode: str, messages: int, page_size: int, rounds: int, results):
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    import logging
+    logging.disable(logging.INFO)
+    results.put(asyncio.run(_measure(mode, messages, page_size, rounds)))
+
+
+def run_isolated(path: str, mode: str, messages: int, page_size: int, rounds: int) -> Dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_worker, args=(path, mode, messages, page_size, rounds, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--legacy-max", type=int, default=100_000,
+                        help="largest size to also measure the full-load path at")
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    if psutil is None:
+        print("psutil is not installed; RSS columns will be empty")
+
+    report: List[Dict] = []
+    for messages in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="bench_history_") as tmp:
+            path = os.path.join(tmp, "chatbot.db")
+            started = time.perf_counter()
+            populate(path, messages)
+            row = {"messages": messages, "populate_s": round(time.perf_counter() - started, 1)}
+            row.update(run_isolated(path, "pages", messages, args.page_size, args.rounds))
+            row.update(run_isolated(path, "export", messages, args.page_size, args.rounds))
+            if messages <= args.legacy_max:
+                row.update(run_isolated(path, "legacy", messages, args.page_size, args.rounds))
+            report.append(row)
+
+        print(
+            f"{messages:>9,} msgs  first page {row['first_page_ms']:>6.2f} ms  "
+            f"deep page {row['deep_page_ms']:>6.2f} ms  sessions page {row['sessions_first_page_ms']:>6.2f} ms  "
+            f"export {row['export_s']:>7.2f} s (+{row['export_rss_delta_mb']} MB)"
+            + (f"  full load {row['legacy_full_load_s']:>7.2f} s (+{row['legacy_rss_delta_mb']} MB)"
+               if "legacy_full_load_s" in row else "")
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
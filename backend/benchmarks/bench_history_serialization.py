@@ -0,0 +1,169 @@
+"""
+Requests/sec and memory of the history and session endpoints, model path vs. fast JSON path.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_history_serialization [--messages 1000] [--requests 300] [--cache]
+
+Fills a SQLite database with one session of --messages messages and
+--sessions other sessions, then serves
+
+  GET /api/chats/{id}/messages?limit=<messages>   the whole history in one page
+  GET /api/chats?limit=<session-page>
+
+in-process through the ASGI app, once with HISTORY_FAST_JSON=false (ORM
+objects -> ChatMessage/ChatSession -> response_model validation -> JSON)
+and once with it on (column rows -> JSON bytes). Each mode runs in its own
+process. The history cache is off unless --cache is given, so every
+request reads the database.
+
+Reported per endpoint: requests/sec, p50 latency, and the median peak of
+memory allocated while serving one request (tracemalloc, in a separate
+pass so it does not skew the timings).
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Dict
+
+SESSION_ID = "bench-session"
+
+
+def populate(path: str, messages: int, sessions: int):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.db.migrations import run_migrations
+
+    async def create_schema():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        await run_migrations(engine)
+        await engine.dispose()
+
+    asyncio.run(create_schema())
+
+    start = datetime(2026, 1, 1)
+    fmt = "%Y-%m-%d %H:%M:%S.%f"
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO chat_sessions (id, user_id, title, message_count, created_at, updated_at, last_message_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(SESSION_ID, "bench", "Benchmark session", messages, start.strftime(fmt),
+          start.strftime(fmt), start.strftime(fmt))] + [
+            (f"s{i:06d}", "bench", f"Session {i}", 10, (start + timedelta(seconds=i)).strftime(fmt),
+             (start + timedelta(seconds=i)).strftime(fmt), (start + timedelta(seconds=i)).strftime(fmt))
+            for i in range(sessions)
+        ]
+    )
+    conn.executemany(
+        "INSERT INTO chat_messages (id, session_id, user_id, is_user, content, created_at, kind) "
+        "VALUES (?, ?, ?, ?, ?, ?, 'message')",
+        [
+            (f"m{i:06d}", SESSION_ID, "bench", i % 2 == 0,
+             f"message {i}: " + "a sentence or two of typical chat text, " * 4,
+             (start + timedelta(milliseconds=i)).strftime(fmt))
+            for i in range(messages)
+        ]
+    )
+    conn.commit()
+    conn.close()
+
+
+async def _measure(urls: Dict[str, str], requests: int, alloc_requests: int) -> Dict:
+    import httpx
+    from app.api.routes.auth import get_current_user
+    from app.main import app
+    from app.models.user import DBUser
+
+    # Requests come from the user owning the data; authentication is not what is measured
+    app.dependency_overrides[get_current_user] = lambda: DBUser(id="bench", email="bench@example.com", is_active=True)
+    report = {}
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for name, url in urls.items():
+            for _ in range(10):
+                (await client.get(url)).raise_for_status()
+
+            samples = []
+            started = time.perf_counter()
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = await client.get(url)
+                samples.append((time.perf_counter() - start) * 1000)
+            elapsed = time.perf_counter() - started
+
+            peaks = []
+            tracemalloc.start()
+            for _ in range(alloc_requests):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                await client.get(url)
+                peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            tracemalloc.stop()
+
+            report[name] = {
+                "rps": round(requests / elapsed),
+                "p50_ms": round(sorted(samples)[len(samples) // 2], 2),
+                "peak_kb": round(sorted(peaks)[len(peaks) // 2] / 1024),
+                "body_kb": round(len(response.content) / 1024),
+            }
+    return report
+
+
+def _worker(path: str, fast: bool, cache: bool, urls: Dict[str, str], requests: int, alloc_requests: int, results):
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    os.environ["HISTORY_FAST_JSON"] = "true" if fast else "false"
+    os.environ["HISTORY_CACHE_ENABLED"] = "true" if cache else "false"
+    os.environ["HISTORY_PAGE_MAX_LIMIT"] = str(max(int(url.rsplit("=", 1)[1]) for url in urls.values()))
+    os.environ.setdefault("LLM_PROVIDER", "mock")
+    import logging
+    logging.disable(logging.INFO)
+    results.put(asyncio.run(_measure(urls, requests, alloc_requests)))
+
+
+def run_isolated(path: str, fast: bool, cache: bool, urls: Dict[str, str], requests: int, alloc_requests: int) -> Dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_worker, args=(path, fast, cache, urls, requests, alloc_requests, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1_000)
+    parser.add_argument("--sessions", type=int, default=1_000)
+    parser.add_argument("--session-page", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--alloc-requests", type=int, default=20)
+    parser.add_argument("--cache", action="store_true", help="leave the history cache on")
+    args = parser.parse_args()
+
+    urls = {
+        f"history ({args.messages} messages)": f"/api/chats/{SESSION_ID}/messages?limit={args.messages}",
+        f"sessions ({args.session_page})": f"/api/chats?limit={args.session_page}",
+    }
+    with tempfile.TemporaryDirectory(prefix="bench_serialization_") as tmp:
+        path = os.path.join(tmp, "chatbot.db")
+        populate(path, args.messages, args.sessions)
+        report = {
+            "model path": run_isolated(path, False, args.cache, urls, args.requests, args.alloc_requests),
+            "fast path": run_isolated(path, True, args.cache, urls, args.requests, args.alloc_requests),
+        }
+
+    print(f"history cache {'on' if args.cache else 'off'}")
+    for name in urls:
+        print(f"\n{name}")
+        for mode, results in report.items():
+            row = results[name]
+            print(f"  {mode:<11} {row['rps']:>6} req/s  p50 {row['p50_ms']:>7.2f} ms  "
+                  f"peak alloc {row['peak_kb']:>6} KB  body {row['body_kb']} KB")
+
+
+if __name__ == "__main__":
+    main()
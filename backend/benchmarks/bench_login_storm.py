@@ -0,0 +1,150 @@
+"""
+Streaming inter-token latency during a login storm, bcrypt on the event loop vs. the hashing pool.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_login_storm [--streams 10] [--login-concurrency 8] [--workers 2] [--duration 10]
+
+For each configuration a uvicorn server is started in a subprocess
+against the mock LLM provider. For --duration seconds, --streams WebSocket
+clients keep streaming replies while --login-concurrency loops hammer
+POST /api/auth/login. Configurations:
+
+  quiet     no logins, for reference
+  inline    PASSWORD_HASH_WORKERS=0: bcrypt runs on the event loop, as before
+  executor  PASSWORD_HASH_WORKERS=--workers with PASSWORD_HASH_MAX_QUEUE=--max-queue
+
+Reported: tokens delivered, time to first token p95 and inter-token gap
+p50/p95/p99/max seen by the stream clients, replies that failed, and login
+count, p50/p95 latency and responses rejected with 503. With bcrypt inline,
+a stalled event loop can also hold a SQLite write open long enough for
+other writers to fail with "database is locked"; those show up as errors.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load_test import BACKEND_DIR, Stats, free_port, percentiles, run_client, wait_until_healthy
+
+EMAIL = "storm@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+def server_env(args, database_url: str, workers: int) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "LLM_PROVIDER": "mock",
+        "MOCK_LLM_TTFT_MS": "50",
+        "MOCK_LLM_INTER_TOKEN_MS": str(args.inter_token_ms),
+        "MOCK_LLM_MIN_TOKENS": str(args.tokens),
+        "MOCK_LLM_MAX_TOKENS": str(args.tokens),
+        "MOCK_LLM_ERROR_RATE": "0",
+        "DATABASE_URL": database_url,
+        "SECRET_KEY": "bench-login-storm",
+        "GROQ_RATE_LIMIT_ENABLED": "false",
+        "GROQ_SINGLE_FLIGHT": "false",
+        "COMPLETION_CACHE_BACKEND": "none",
+        "PASSWORD_HASH_WORKERS": str(workers),
+        "PASSWORD_HASH_MAX_QUEUE": str(args.max_queue),
+    })
+    return env
+
+
+async def login_loop(base_url: str, stop: asyncio.Event, latencies: List[float], statuses: Dict[int, int]):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = await client.post("/api/auth/login", data={"username": EMAIL, "password": PASSWORD})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            elif response.status_code == 503:
+                await asyncio.sleep(0.05)
+
+
+async def stream_loop(url: str, stop: asyncio.Event, stats: Stats):
+    while not stop.is_set():
+        await run_client(url, 1, 0, stats)
+
+
+async def run_configuration(args, name: str, workers: int, logins: int) -> Dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory(prefix="bench_login_storm_") as tmp:
+        database_url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'chatbot.db')}"
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=server_env(args, database_url, workers),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            await wait_until_healthy(base_url)
+            async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+                (await client.post("/api/auth/signup", json={"email": EMAIL, "password": PASSWORD})).raise_for_status()
+
+            stats = Stats()
+            stop = asyncio.Event()
+            latencies: List[float] = []
+            statuses: Dict[int, int] = {}
+            tasks = [
+                asyncio.create_task(stream_loop(f"ws://127.0.0.1:{port}/ws/chat", stop, stats))
+                for _ in range(args.streams)
+            ] + [asyncio.create_task(login_loop(base_url, stop, latencies, statuses)) for _ in range(logins)]
+            await asyncio.sleep(args.duration)
+            stop.set()
+            await asyncio.gather(*tasks)
+        finally:
+            process.terminate()
+            await asyncio.to_thread(process.wait, 30)
+
+    gaps = percentiles(stats.gaps)
+    login = percentiles(latencies)
+    return {
+        "name": name,
+        "tokens": len(stats.gaps) + len(stats.ttft), "ttft_p95": percentiles(stats.ttft)["p95"],
+        "gap_p50": gaps["p50"], "gap_p95": gaps["p95"], "gap_p99": gaps["p99"],
+        "gap_max": round(max(stats.gaps), 1) if stats.gaps else None,
+        "logins": len(latencies), "login_p50": login["p50"], "login_p95": login["p95"],
+        "rejected": statuses.get(503, 0), "errors": stats.errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--streams", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per configuration")
+    parser.add_argument("--tokens", type=int, default=50, help="tokens per reply")
+    parser.add_argument("--inter-token-ms", type=int, default=20)
+    parser.add_argument("--login-concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-queue", type=int, default=32)
+    args = parser.parse_args()
+
+    async def run():
+        return [
+            await run_configuration(args, "quiet", args.workers, 0),
+            await run_configuration(args, "inline", 0, args.login_concurrency),
+            await run_configuration(args, "executor", args.workers, args.login_concurrency),
+        ]
+
+    print(f"{args.streams} streams of {args.tokens}-token replies every {args.inter_token_ms} ms, "
+          f"{args.login_concurrency} concurrent login loops, {args.duration:g} s per configuration")
+    for row in asyncio.run(run()):
+        print(
+            f"  {row['name']:<9} tokens {row['tokens']:>6}  ttft p95 {row['ttft_p95']:>7} ms  gap p50 {row['gap_p50']:>7} ms  p95 {row['gap_p95']:>7} ms  "
+            f"p99 {row['gap_p99']:>7} ms  max {row['gap_max']:>7} ms   "
+            f"logins {row['logins']:>4}  p50 {row['login_p50']} ms  p95 {row['login_p95']} ms  "
+            f"503s {row['rejected']}  failed replies {row['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
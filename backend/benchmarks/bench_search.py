@@ -0,0 +1,230 @@
+"""
+Full-text message search on a synthetic corpus: indexing cost, index size and query latency.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_search [--messages 1000000] [--users 200] [--rounds 50]
+
+Creates a SQLite database through the migrations (so the FTS5 table and its
+triggers exist), then inserts messages drawn from a Zipf-distributed
+vocabulary, letting the triggers index them as the application's writes do.
+Reports:
+
+  indexing   insert throughput with the index maintained, and with the
+             triggers dropped (in a rolled-back transaction) for comparison
+  size       database size and the share taken by the FTS5 tables
+  queries    p50/p95 of SearchRepository.search_messages for rare, common,
+             multi-term and prefix queries, a second (cursor) page of a
+             common query, and an unranked LIKE scan of the same user's
+             messages for each
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Sequence
+
+SYLLABLES = [c + v for c in "bcdfghjklmnprstvz" for v in "aeiou"]
+
+
+def vocabulary(size: int, rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words, key=lambda _: rng.random())
+
+
+def zipf_weights(size: int, exponent: float) -> List[float]:
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, size + 1)))
+
+
+def fmt(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def message_rows(start_index: int, count: int, words: Sequence[str], cum_weights: List[float],
+                 users: int, rng: random.Random):
+    start = datetime(2026, 1, 1)
+    for i in range(start_index, start_index + count):
+        user = i % users
+        text = " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(5, 40)))
+        yield (f"m{i:08d}", f"s{user:04d}-{i // 500:05d}", f"user{user:04d}", i % 2 == 0,
+               text, fmt(start + timedelta(milliseconds=i)), "message")
+
+
+INSERT = ("INSERT INTO chat_messages (id, session_id, user_id, is_user, content, created_at, kind) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+
+def create_schema(url: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.db.migrations import run_migrations
+
+    async def run():
+        engine = create_async_engine(url)
+        await run_migrations(engine)
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def populate(path: str, messages: int, users: int, words, cum_weights, rng) -> float:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    batch = 50_000
+    start = time.perf_counter()
+    for offset in range(0, messages, batch):
+        conn.executemany(INSERT, message_rows(offset, min(batch, messages - offset), words, cum_weights, users, rng))
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.execute("INSERT INTO chat_sessions (id, user_id, title, message_count) "
+                 "SELECT session_id, MAX(user_id), 'session ' || session_id, COUNT(*) "
+                 "FROM chat_messages GROUP BY session_id")
+    conn.commit()
+    conn.close()
+    return elapsed
+
+
+def insert_overhead(path: str, messages: int, count: int, users: int, words, cum_weights, rng) -> Dict:
+    """Rows/s for count more inserts with and without the index triggers; nothing is kept."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    rows = list(message_rows(messages, count, words, cum_weights, users, rng))
+    triggers = [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'chat_messages_fts_%'")]
+    result = {}
+    for label, drop in (("indexed", False), ("unindexed", True)):
+        conn.execute("BEGIN")
+        for name in triggers if drop else []:
+            conn.execute(f"DROP TRIGGER {name}")
+        start = time.perf_counter()
+        conn.executemany(INSERT, rows)
+        result[label] = round(count / (time.perf_counter() - start))
+        conn.execute("ROLLBACK")
+    conn.close()
+    return result
+
+
+def sizes(path: str) -> Dict:
+    conn = sqlite3.connect(path)
+    total = os.path.getsize(path) / (1024 * 1024)
+    try:
+        fts = conn.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'chat_messages_fts%'").fetchone()[0] / (1024 * 1024)
+    except sqlite3.Error:
+        fts = None  # dbstat not compiled in
+    conn.close()
+    return {"db_mb": round(total, 1), "fts_mb": round(fts, 1) if fts is not None else None}
+
+
+def query_terms(words: Sequence[str], rng: random.Random, rounds: int) -> Dict[str, List[str]]:
+    size = len(words)
+    rare = words[int(size * 0.6):]
+    common = words[:5]
+    middle = words[50:500]
+    return {
+        "rare term": [rng.choice(rare) for _ in range(rounds)],
+        "common term": [rng.choice(common) for _ in range(rounds)],
+        "two terms": [f"{rng.choice(middle)} {rng.choice(middle)}" for _ in range(rounds)],
+        "prefix": [rng.choice(middle)[:4] + "*" for _ in range(rounds)],
+    }
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 2)
+
+
+async def measure_queries(url: str, path: str, terms: Dict[str, List[str]], users: int,
+                          page_size: int, rng: random.Random) -> Dict[str, Dict]:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from app.db.repositories.search_repository import SearchRepository
+
+    engine = create_async_engine(url)
+    like = sqlite3.connect(path)
+    report = {}
+    for name, queries in terms.items():
+        fts, scan, second, hits = [], [], [], []
+        for query in queries:
+            user = f"user{rng.randrange(users):04d}"
+            async with AsyncSession(engine) as db:
+                repository = SearchRepository(db)
+                start = time.perf_counter()
+                page = await repository.search_messages(user, query, page_size)
+                fts.append((time.perf_counter() - start) * 1000)
+                hits.append(len(page))
+                if name == "common term" and len(page) == page_size:
+                    start = time.perf_counter()
+                    await repository.search_messages(user, query, page_size, (page[-1].rank, page[-1].message_id))
+                    second.append((time.perf_counter() - start) * 1000)
+
+            clauses = " AND ".join("content LIKE ?" for _ in query.split())
+            patterns = [f"%{word.rstrip('*')}%" for word in query.split()]
+            start = time.perf_counter()
+            like.execute(
+                f"SELECT id, content FROM chat_messages WHERE user_id = ? AND kind = 'message' AND {clauses} "
+                f"ORDER BY created_at, id LIMIT ?", [user, *patterns, page_size]
+            ).fetchall()
+            scan.append((time.perf_counter() - start) * 1000)
+
+        report[name] = {"p50": percentile(fts, 0.5), "p95": percentile(fts, 0.95),
+                        "like_p50": percentile(scan, 0.5), "like_p95": percentile(scan, 0.95),
+                        "mean_hits": round(sum(hits) / len(hits), 1)}
+        if second:
+            report["common term, page 2"] = {"p50": percentile(second, 0.5), "p95": percentile(second, 0.95)}
+    like.close()
+    await engine.dispose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--zipf", type=float, default=1.07, help="exponent of the word frequency distribution")
+    parser.add_argument("--rounds", type=int, default=50, help="queries per query type")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    words = vocabulary(args.vocabulary, rng)
+    cum_weights = zipf_weights(len(words), args.zipf)
+
+    with tempfile.TemporaryDirectory(prefix="bench_search_") as tmp:
+        path = os.path.join(tmp, "chatbot.db")
+        url = f"sqlite+aiosqlite:///{path}"
+        create_schema(url)
+
+        elapsed = populate(path, args.messages, args.users, words, cum_weights, rng)
+        print(f"{args.messages:,} messages, {args.users} users, {args.vocabulary:,} words (zipf {args.zipf})")
+        print(f"\nindexing   populate with triggers {elapsed:.1f} s ({args.messages / elapsed:,.0f} rows/s)")
+        overhead = insert_overhead(path, args.messages, 50_000, args.users, words, cum_weights, rng)
+        print(f"           50k more rows: {overhead['indexed']:,} rows/s indexed, "
+              f"{overhead['unindexed']:,} rows/s without the index")
+
+        size = sizes(path)
+        print(f"size       database {size['db_mb']} MB"
+              + (f", FTS5 tables {size['fts_mb']} MB" if size["fts_mb"] is not None else ""))
+
+        report = asyncio.run(measure_queries(
+            url, path, query_terms(words, rng, args.rounds), args.users, args.page_size, rng))
+        print(f"\nqueries    (page of {args.page_size}, one user's messages)")
+        for name, row in report.items():
+            line = f"  {name:<20} p50 {row['p50']:>8.2f} ms  p95 {row['p95']:>8.2f} ms"
+            if "like_p50" in row:
+                line += (f"   LIKE p50 {row['like_p50']:>8.2f} ms  p95 {row['like_p95']:>8.2f} ms"
+                         f"   hits {row['mean_hits']}")
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Schema step of application boot and history query plans, before and after migrations.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_startup [--messages 200000] [--sessions 2000] [--boots 20]
+
+Builds a SQLite database with the original, pre-versioning schema and
+fills it, then reports:
+
+  before  boot as it used to be (create_all three times) and the query plans
+          and latencies of the history and session listing queries
+  migrate the one-off boot that applies the pending migrations
+  after   boot with the schema current (a single schema_version read) and the
+          same queries against the migrated schema
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+LEGACY_SCHEMA = """
+CREATE TABLE users (
+    id VARCHAR PRIMARY KEY, email VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL,
+    is_active BOOLEAN, created_at DATETIME
+);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE INDEX ix_users_id ON users (id);
+CREATE TABLE chat_sessions (id VARCHAR PRIMARY KEY, user_id VARCHAR, created_at DATETIME, updated_at DATETIME);
+CREATE INDEX ix_chat_sessions_id ON chat_sessions (id);
+CREATE INDEX ix_chat_sessions_user_id ON chat_sessions (user_id);
+CREATE TABLE chat_messages (
+    id VARCHAR PRIMARY KEY, session_id VARCHAR REFERENCES chat_sessions (id), user_id VARCHAR,
+    is_user BOOLEAN, content TEXT, created_at DATETIME
+);
+CREATE INDEX ix_chat_messages_id ON chat_messages (id);
+CREATE INDEX ix_chat_messages_user_id ON chat_messages (user_id);
+"""
+
+# The repository's read queries; {kind} is the message-kind filter, which only
+# exists once the schema is migrated.
+QUERIES = {
+    "session history": (
+        "SELECT * FROM chat_messages WHERE session_id = :session {kind} ORDER BY created_at"
+    ),
+    "recent messages": (
+        "SELECT * FROM chat_messages WHERE session_id = :session {kind} ORDER BY created_at DESC LIMIT 50"
+    ),
+    "user's sessions": (
+        "SELECT * FROM chat_sessions WHERE user_id = :user ORDER BY updated_at DESC LIMIT 50"
+    ),
+}
+
+
+def fmt(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def populate(path: str, messages: int, sessions: int):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    start = datetime(2026, 1, 1)
+    conn.executemany(
+        "INSERT INTO chat_sessions VALUES (?, ?, ?, ?)",
+        [(f"s{i:06d}", f"user{i % 100}", fmt(start), fmt(start + timedelta(seconds=i))) for i in range(sessions)]
+    )
+    batch = 50_000
+    for offset in range(0, messages, batch):
+        conn.executemany(
+            "INSERT INTO chat_messages VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (f"m{i:08d}", f"s{i % sessions:06d}", None, i % 2 == 0,
+                 f"message {i} with some ordinary chat text", fmt(start + timedelta(milliseconds=i)))
+                for i in range(offset, min(messages, offset + batch))
+            ]
+        )
+    conn.commit()
+    conn.close()
+
+
+def query_report(path: str, kind_filter: str, rounds: int) -> Dict[str, Dict]:
+    conn = sqlite3.connect(path)
+    params = {"session": "s000042", "user": "user42"}
+    report = {}
+    for name, sql in QUERIES.items():
+        sql = sql.format(kind=kind_filter)
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+        report[name] = {"plan": plan, "median_ms": round(sorted(samples)[len(samples) // 2], 2)}
+    conn.close()
+    return report
+
+
+def time_boots(url: str, boot: Callable, count: int) -> List[float]:
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async def once() -> float:
+        # A fresh engine per boot, so connecting is part of the cost
+        engine = create_async_engine(url)
+        start = time.perf_counter()
+        await boot(engine)
+        elapsed = (time.perf_counter() - start) * 1000
+        await engine.dispose()
+        return elapsed
+
+    return [asyncio.run(once()) for _ in range(count)]
+
+
+async def legacy_boot(engine):
+    from app.models.user import DBUser
+    from app.models.chat import DBChatSession, DBChatMessage
+
+    # What startup_event did before migrations existed
+    async with engine.begin() as conn:
+        await conn.run_sync(DBUser.metadata.create_all)
+        await conn.run_sync(DBChatSession.metadata.create_all)
+        await conn.run_sync(DBChatMessage.metadata.create_all)
+
+
+def median(samples: List[float]) -> float:
+    return round(sorted(samples)[len(samples) // 2], 2)
+
+
+def print_queries(title: str, report: Dict[str, Dict]):
+    print(f"\n{title}")
+    for name, result in report.items():
+        print(f"  {name:<18}{result['median_ms']:>9.2f} ms  {' / '.join(result['plan'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--sessions", type=int, default=2_000)
+    parser.add_argument("--boots", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20, help="repetitions of each query")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as tmp:
+        path = os.path.join(tmp, "chatbot.db")
+        url = f"sqlite+aiosqlite:///{path}"
+        populate(path, args.messages, args.sessions)
+        print(f"{args.messages:,} messages in {args.sessions:,} sessions")
+
+        # The legacy boot never changes an existing schema, so it can be timed first
+        before_boot = time_boots(url, legacy_boot, args.boots)
+        print(f"\nboot before (create_all x3):        median {median(before_boot):>8.2f} ms")
+        before_queries = query_report(path, "", args.rounds)
+
+        from app.db.migrations import run_migrations
+        migrate = time_boots(url, run_migrations, 1)[0]
+        print(f"first boot after (apply migrations): {migrate:>14.2f} ms")
+        after_boot = time_boots(url, run_migrations, args.boots)
+        print(f"boot after (schema_version check):  median {median(after_boot):>8.2f} ms")
+        after_queries = query_report(path, "AND kind = 'message'", args.rounds)
+
+        print_queries("queries before", before_queries)
+        print_queries("queries after", after_queries)
+
+
+if __name__ == "__main__":
+    main()
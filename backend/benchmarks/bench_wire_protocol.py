@@ -0,0 +1,96 @@
+"""
+Bytes on the wire and server CPU per 1,000 streamed tokens for each frame encoding.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_wire_protocol [--tokens 1000] [--rounds 20]
+
+"+deflate" rows estimate permessage-deflate by compressing every frame with a
+shared zlib context (context takeover), which is what browsers negotiate by
+default.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+import zlib
+
+from app.api.websockets.protocol import available_protocols, create_encoder
+
+WORDS = (
+    "the model streams a short answer about websockets latency and throughput "
+    "with tokens that are mostly small words , punctuation . and numbers 42"
+).split()
+
+
+def token_frames(count: int, session_id: str, request_id: str):
+    rng = random.Random(7)
+    offset = 0
+    for _ in range(count):
+        token = " " + rng.choice(WORDS)
+        offset += len(token)
+        yield {
+            "type": "token",
+            "content": token,
+            "session_id": session_id,
+            "request_id": request_id,
+            "offset": offset
+        }
+
+
+def measure(protocol: str, tokens: int, rounds: int, deflate: bool):
+    session_id, request_id = str(uuid.uuid4()), str(uuid.uuid4())
+    payloads = list(token_frames(tokens, session_id, request_id))
+
+    total_bytes = 0
+    frames = 0
+    start = time.process_time()
+    for _ in range(rounds):
+        encoder = create_encoder(protocol)
+        compressor = zlib.compressobj(wbits=-15) if deflate else None
+        total_bytes = 0
+        frames = 0
+        for payload in payloads:
+            for frame in encoder.encode(payload):
+                data = frame if isinstance(frame, bytes) else frame.encode("utf-8")
+                if compressor is not None:
+                    # permessage-deflate strips the trailing 00 00 ff ff
+                    data = (compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+                total_bytes += len(data)
+                frames += 1
+    cpu = (time.process_time() - start) / rounds
+
+    scale = 1000 / tokens
+    return {
+        "encoding": protocol + ("+deflate" if deflate else ""),
+        "frames": frames,
+        "bytes_per_1k_tokens": round(total_bytes * scale),
+        "cpu_ms_per_1k_tokens": round(cpu * scale * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = [
+        measure(protocol, args.tokens, args.rounds, deflate)
+        for protocol in available_protocols()
+        for deflate in (False, True)
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'encoding':<18}{'frames':>8}{'bytes/1k tok':>14}{'cpu ms/1k tok':>15}")
+    for row in results:
+        print(f"{row['encoding']:<18}{row['frames']:>8}{row['bytes_per_1k_tokens']:>14}{row['cpu_ms_per_1k_tokens']:>15}")
+
+
+if __name__ == "__main__":
+    main()
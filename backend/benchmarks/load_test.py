@@ -0,0 +1,361 @@
+"""
+End-to-end WebSocket load test against the mock LLM provider.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_test [--clients 50] [--turns 5] [--server subprocess] [--output run.json]
+
+Starts the app (in this process, or under uvicorn in a subprocess), opens
+--clients concurrent /ws/chat connections that each send a scripted
+conversation, and reports p50/p95/p99 time to first token, inter-token gap
+and turn time, messages persisted per second and server RSS. Results are
+written as JSON; pass --baseline with an earlier result to compare runs and
+fail on regressions beyond --max-regression percent.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+try:
+    import psutil
+except ImportError:  # optional dependency
+    psutil = None
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROMPTS = [
+    "Hi! Can you explain what a websocket is?",
+    "How is that different from long polling?",
+    "What happens when the connection drops mid answer?",
+    "Give me a short example in JavaScript.",
+    "How would you load test a server like that?",
+    "Thanks, can you summarise the main points?",
+]
+
+# (metric, direction) pairs checked against --baseline; +1 means higher is worse
+REGRESSION_CHECKS = [
+    ("ttft_ms.p95", 1),
+    ("inter_token_ms.p95", 1),
+    ("turn_ms.p95", 1),
+    ("messages_per_sec", -1),
+]
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "count": 0}
+    ordered = sorted(samples)
+
+    def rank(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+
+    return {
+        "p50": rank(0.50),
+        "p95": rank(0.95),
+        "p99": rank(0.99),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "count": len(ordered),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_env(args) -> Dict[str, str]:
+    return {
+        "LLM_PROVIDER": "mock",
+        "MOCK_LLM_TTFT_MS": str(args.ttft_ms),
+        "MOCK_LLM_INTER_TOKEN_MS": str(args.inter_token_ms),
+        "MOCK_LLM_ERROR_RATE": str(args.error_rate),
+        "MOCK_LLM_MIN_TOKENS": str(args.min_tokens),
+        "MOCK_LLM_MAX_TOKENS": str(args.max_tokens),
+        "DATABASE_URL": args.database_url,
+        # The client-side Groq budget would throttle the mock, not measure the server
+        "GROQ_RATE_LIMIT_ENABLED": "false",
+        # Identical scripted prompts would otherwise share one upstream stream
+        "GROQ_SINGLE_FLIGHT": "false",
+        "COMPLETION_CACHE_BACKEND": "none",
+    }
+
+
+class Stats:
+    def __init__(self):
+        self.ttft: List[float] = []
+        self.gaps: List[float] = []
+        self.turns: List[float] = []
+        self.completed = 0
+        self.errors = 0
+
+
+async def run_client(url: str, turns: int, think_ms: float, stats: Stats):
+    session_id = str(uuid.uuid4())
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=30) as ws:
+            json.loads(await ws.recv())  # connection_established
+
+            for turn in range(turns):
+                request_id = str(uuid.uuid4())
+                started = time.perf_counter()
+                first = last = None
+                await ws.send(json.dumps({
+                    "message": PROMPTS[turn % len(PROMPTS)],
+                    "session_id": session_id,
+                    "request_id": request_id
+                }))
+
+                while True:
+                    frame = json.loads(await ws.recv())
+                    now = time.perf_counter()
+                    kind = frame.get("type")
+                    if kind == "token":
+                        if first is None:
+                            first = now
+                            stats.ttft.append((now - started) * 1000)
+                        else:
+                            stats.gaps.append((now - last) * 1000)
+                        last = now
+                    elif kind == "completion":
+                        stats.turns.append((now - started) * 1000)
+                        stats.completed += 1
+                        break
+                    elif kind in ("error", "cancelled"):
+                        stats.errors += 1
+                        break
+
+                if think_ms > 0:
+                    await asyncio.sleep(think_ms / 1000)
+    except Exception as e:
+        stats.errors += 1
+        print(f"client {session_id[:8]} failed: {e}", file=sys.stderr)
+
+
+async def count_messages(database_url: str) -> int:
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.connect() as conn:
+            try:
+                return (await conn.execute(text("SELECT COUNT(*) FROM chat_messages"))).scalar()
+            except Exception:
+                return 0
+    finally:
+        await engine.dispose()
+
+
+class RssSampler:
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.process = psutil.Process(pid) if psutil is not None else None
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self):
+        if self.process is not None:
+            self.samples.append(self.process.memory_info().rss / (1024 * 1024))
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.sample()
+
+    def summary(self) -> Optional[Dict[str, float]]:
+        if not self.samples:
+            return None
+        return {
+            "start": round(self.samples[0], 1),
+            "peak": round(max(self.samples), 1),
+            "end": round(self.samples[-1], 1),
+        }
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {base_url} did not become healthy")
+
+
+async def start_inprocess(args, port: int):
+    os.environ.update(server_env(args))
+    import logging
+    import uvicorn
+    from app.main import app
+
+    logging.getLogger().setLevel(logging.WARNING)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+
+    async def stop():
+        server.should_exit = True
+        await task
+
+    return os.getpid(), stop
+
+
+async def start_subprocess(args, port: int):
+    env = dict(os.environ)
+    env.update(server_env(args))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=None if args.server_logs else subprocess.DEVNULL,
+        stderr=None if args.server_logs else subprocess.DEVNULL
+    )
+
+    async def stop():
+        process.terminate()
+        await asyncio.to_thread(process.wait, 30)
+
+    return process.pid, stop
+
+
+def lookup(results: dict, path: str) -> Optional[float]:
+    value = results
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> bool:
+    ok = True
+    print(f"\n{'metric':<22}{'baseline':>12}{'current':>12}{'change':>10}")
+    for path, direction in REGRESSION_CHECKS:
+        before, after = lookup(baseline, path), lookup(results, path)
+        if not before or after is None:
+            continue
+        change = (after - before) / before * 100
+        regressed = change * direction > max_regression
+        ok = ok and not regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{path:<22}{before:>12.2f}{after:>12.2f}{change:>9.1f}%{flag}")
+    return ok
+
+
+async def run(args) -> dict:
+    port = args.port or free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = start_subprocess if args.server == "subprocess" else start_inprocess
+    pid, stop = await start(args, port)
+
+    try:
+        await wait_until_healthy(base_url)
+        persisted_before = await count_messages(args.database_url)
+        rss = RssSampler(pid)
+        rss.start()
+
+        stats = Stats()
+        url = f"ws://127.0.0.1:{port}/ws/chat"
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            run_client(url, args.turns, args.think_ms, stats) for _ in range(args.clients)
+        ))
+        elapsed = time.perf_counter() - started
+
+        # Let write-behind persistence drain before counting
+        await asyncio.sleep(args.drain_seconds)
+        persisted = await count_messages(args.database_url) - persisted_before
+        await rss.stop()
+    finally:
+        await stop()
+
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "config": {
+            "server": args.server,
+            "clients": args.clients,
+            "turns": args.turns,
+            "think_ms": args.think_ms,
+            "mock_ttft_ms": args.ttft_ms,
+            "mock_inter_token_ms": args.inter_token_ms,
+            "mock_error_rate": args.error_rate,
+            "mock_tokens": [args.min_tokens, args.max_tokens],
+        },
+        "duration_s": round(elapsed, 3),
+        "turns_completed": stats.completed,
+        "errors": stats.errors,
+        "ttft_ms": percentiles(stats.ttft),
+        "inter_token_ms": percentiles(stats.gaps),
+        "turn_ms": percentiles(stats.turns),
+        "messages_persisted": persisted,
+        "messages_per_sec": round(persisted / elapsed, 2) if elapsed else 0.0,
+        "server_rss_mb": rss.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--think-ms", type=float, default=0)
+    parser.add_argument("--server", choices=["inprocess", "subprocess"], default="subprocess")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--server-logs", action="store_true", help="show the subprocess server's log output")
+    parser.add_argument("--database-url", default=None,
+                        help="defaults to a fresh SQLite file in a temporary directory")
+    parser.add_argument("--ttft-ms", type=float, default=200)
+    parser.add_argument("--inter-token-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--min-tokens", type=int, default=20)
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--drain-seconds", type=float, default=0.5)
+    parser.add_argument("--output", default="load_test_results.json")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=10.0,
+                        help="allowed worsening in percent before exiting non-zero")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        args.database_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='load_test_')}/chatbot.db"
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
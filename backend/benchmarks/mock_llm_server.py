@@ -0,0 +1,144 @@
+"""
+Local HTTP server that speaks the Groq/OpenAI chat completions protocol,
+backed by the deterministic MockProvider.
+
+Run from the backend directory:
+
+    python -m benchmarks.mock_llm_server [--port 9000] [--ttft-ms 200] [--inter-token-ms 20]
+
+Then point the backend at it, which exercises the real SDK and HTTP path:
+
+    LLM_PROVIDER=groq GROQ_BASE_URL=http://127.0.0.1:9000 GROQ_API_KEY=mock uvicorn app.main:app
+
+Failed requests return 503, like an overloaded upstream.
+"""
+import argparse
+import json
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.config import (
+    MOCK_LLM_TTFT_MS,
+    MOCK_LLM_INTER_TOKEN_MS,
+    MOCK_LLM_ERROR_RATE,
+    MOCK_LLM_MIN_TOKENS,
+    MOCK_LLM_MAX_TOKENS,
+    MOCK_LLM_SEED
+)
+from app.services.llm_providers import MockProvider, ProviderUnavailableError
+
+
+def create_app(provider: MockProvider) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+
+    def chunk(completion_id: str, model: str, delta: dict, finish_reason=None, usage=None) -> str:
+        body = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        if usage is not None:
+            # Same place Groq reports streaming usage
+            body["x_groq"] = {"usage": usage}
+        return f"data: {json.dumps(body)}\n\n"
+
+    def usage_body(usage) -> dict:
+        return {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.prompt_tokens + usage.completion_tokens,
+        }
+
+    def unavailable() -> JSONResponse:
+        return JSONResponse(
+            status_code=503,
+            content={"error": {"message": "Mock provider error", "type": "service_unavailable"}}
+        )
+
+    @app.post("/openai/v1/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "mock")
+        max_tokens = body.get("max_tokens") or MOCK_LLM_MAX_TOKENS
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        if not body.get("stream"):
+            usage = []
+            try:
+                text = await provider.complete(messages, model, body.get("temperature", 1.0), max_tokens, usage.append)
+            except ProviderUnavailableError:
+                return unavailable()
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage_body(usage[0]),
+            }
+
+        usage = []
+        tokens = provider.stream(messages, model, body.get("temperature", 1.0), max_tokens, usage.append)
+        try:
+            # Wait for the first token so failures can still become a 503
+            first = await tokens.__anext__()
+        except ProviderUnavailableError:
+            return unavailable()
+        except StopAsyncIteration:
+            first = None
+
+        async def events():
+            try:
+                yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+                if first is not None:
+                    yield chunk(completion_id, model, {"content": first})
+                    async for token in tokens:
+                        yield chunk(completion_id, model, {"content": token})
+                yield chunk(completion_id, model, {}, "stop", usage_body(usage[0]) if usage else None)
+                yield "data: [DONE]\n\n"
+            finally:
+                await tokens.aclose()
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--ttft-ms", type=float, default=MOCK_LLM_TTFT_MS)
+    parser.add_argument("--inter-token-ms", type=float, default=MOCK_LLM_INTER_TOKEN_MS)
+    parser.add_argument("--error-rate", type=float, default=MOCK_LLM_ERROR_RATE)
+    parser.add_argument("--min-tokens", type=int, default=MOCK_LLM_MIN_TOKENS)
+    parser.add_argument("--max-tokens", type=int, default=MOCK_LLM_MAX_TOKENS)
+    parser.add_argument("--seed", type=int, default=MOCK_LLM_SEED)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    provider = MockProvider(
+        ttft_ms=args.ttft_ms,
+        inter_token_ms=args.inter_token_ms,
+        error_rate=args.error_rate,
+        min_tokens=args.min_tokens,
+        max_tokens=args.max_tokens,
+        seed=args.seed
+    )
+    uvicorn.run(create_app(provider), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,68 @@
-# Test fixtures and configuration
\ No newline at end of file
+# Test fixtures and configuration
+import os
+import tempfile
+
+# Settings are read when app modules are imported, so the test environment
+# is in place before any of them is.
+_TMP_DIR = tempfile.mkdtemp(prefix="chatbot_tests_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+os.environ["LLM_PROVIDER"] = "mock"
+os.environ["MOCK_LLM_TTFT_MS"] = "0"
+os.environ["MOCK_LLM_INTER_TOKEN_MS"] = "0"
+os.environ["MOCK_LLM_ERROR_RATE"] = "0"
+os.environ["COMPACTION_ENABLED"] = "false"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+# The upstream limits are Groq's free tier; the whole suite goes over them
+os.environ["GROQ_RPM_LIMIT"] = "100000"
+os.environ["GROQ_TPM_LIMIT"] = "100000000"
+
+import uuid
+
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app with its startup and shutdown run once for the whole test session."""
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def signup(client: TestClient) -> dict:
+    """A fresh user; returns their access token, id and auth headers."""
+    response = client.post("/api/auth/signup", json={
+        "email": f"user-{uuid.uuid4().hex[:12]}@example.com",
+        "password": "test-password"
+    })
+    response.raise_for_status()
+    body = response.json()
+    token = body["access_token"]
+    return {"token": token, "id": body["user"]["id"], "headers": {"Authorization": f"Bearer {token}"}}
+
+
+def chat_turn(websocket, message: str, session_id: str, **extra) -> list:
+    """Send one chat message and collect frames until the turn completes or fails."""
+    websocket.send_json({"message": message, "session_id": session_id, **extra})
+    frames = []
+    while True:
+        frame = websocket.receive_json()
+        frames.append(frame)
+        if frame.get("type") in ("completion", "error", "cancelled"):
+            return frames
+
+
+@pytest_asyncio.fixture
+async def db_engine(tmp_path):
+    """A migrated database of its own, for repository and migration tests."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.db.migrations import run_migrations
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    await run_migrations(engine)
+    yield engine
+    await engine.dispose()
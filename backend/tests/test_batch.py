@@ -0,0 +1,61 @@
+import json
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.repositories.chat_repository import ChatRepository
+from app.models.batch import BatchCompletionRequest
+from app.services.batch_service import BatchCompletionService
+from app.services.chat_service import ChatService
+from tests.conftest import chat_turn, signup
+
+
+class RecordingGroqService:
+    def __init__(self):
+        self.calls = []
+
+    async def get_completion(self, prompt, **kwargs):
+        self.calls.append(kwargs)
+        return f"answer to {prompt}"
+
+
+@pytest.mark.asyncio
+async def test_one_user_id_for_limits_usage_and_persisted_messages(db_engine):
+    @asynccontextmanager
+    async def chat_service_scope():
+        async with AsyncSession(db_engine) as db:
+            yield ChatService(ChatRepository(db))
+
+    groq_service = RecordingGroqService()
+    request = BatchCompletionRequest(items=[{"prompt": "one"}, {"prompt": "two"}], persist=True)
+    lines = [json.loads(line) async for line in
+             BatchCompletionService(groq_service, chat_service_scope).stream(request, "u1")]
+
+    assert [call["user_id"] for call in groq_service.calls] == ["u1", "u1"]
+    async with chat_service_scope() as chat_service:
+        for line in lines[:-1]:
+            assert (await chat_service.get_session(line["session_id"])).user_id == "u1"
+            history = await chat_service.get_chat_history(line["session_id"])
+            assert [message.user_id for message in history] == ["u1", "u1"]
+
+
+def test_batch_requires_auth(client):
+    response = client.post("/api/batch/completions", json={"items": [{"prompt": "hi"}]})
+    assert response.status_code == 401
+
+
+def test_batch_cannot_name_another_users_session(client):
+    owner, other = signup(client), signup(client)
+    session_id = str(uuid.uuid4())
+    with client.websocket_connect(f"/ws/chat?token={owner['token']}") as websocket:
+        websocket.receive_json()
+        assert chat_turn(websocket, "hello", session_id)[-1]["type"] == "completion"
+
+    body = {"items": [{"prompt": "injected", "session_id": session_id}], "persist": True}
+    assert client.post("/api/batch/completions", json=body, headers=other["headers"]).status_code == 404
+
+    response = client.post("/api/batch/completions", json=body, headers=owner["headers"])
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["status"] == "ok" and lines[0]["session_id"] == session_id
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.repositories.chat_repository import ChatRepository
+from app.models.chat import ChatMessage, SUMMARY_KIND
+
+
+def make_message(n: int, **fields) -> ChatMessage:
+    return ChatMessage(**{"id": f"m{n}", "session_id": "s1", "user_id": "u1", "is_user": n % 2 == 0,
+                          "content": f"message {n}", "created_at": datetime(2026, 1, 1, 0, 0, n), **fields})
+
+
+@pytest.mark.asyncio
+async def test_every_read_path_returns_the_stored_fields(db_engine):
+    messages = [make_message(n) for n in range(4)]
+    summary = make_message(9, kind=SUMMARY_KIND, summary_until=datetime(2026, 1, 1, 0, 0, 1))
+    async with AsyncSession(db_engine) as db:
+        repository = ChatRepository(db)
+        await repository.add_messages(messages + [summary])
+
+        expected = [message.model_dump() for message in messages]
+        assert [m.model_dump() for m in await repository.get_messages_by_session("s1")] == expected
+        assert [m.model_dump() for m in await repository.get_recent_messages("s1", 10)] == expected
+        assert [m.model_dump() for m in await repository.get_messages_page("s1", 10)] == expected
+        assert await repository.get_message_rows_page("s1", 10) == expected
+        assert (await repository.get_latest_summary("s1")).model_dump() == summary.model_dump()
+
+
+@pytest.mark.asyncio
+async def test_session_summary_columns_follow_message_writes(db_engine):
+    async with AsyncSession(db_engine) as db:
+        repository = ChatRepository(db)
+        await repository.add_messages([make_message(0, content="  What is\nthe weather? "), make_message(1)])
+        await repository.add_message(make_message(2, user_id="someone-else"))
+        await repository.add_message(make_message(3, kind=SUMMARY_KIND, summary_until=datetime(2026, 1, 1)))
+
+        session = await repository.get_session("s1")
+        assert session.title == "What is the weather?"
+        assert session.message_count == 3
+        assert session.last_message_at == datetime(2026, 1, 1, 0, 0, 2)
+        # The creator keeps the session
+        assert session.user_id == "u1"
@@ -0,0 +1,143 @@
+import uuid
+
+import pytest
+
+from tests.conftest import chat_turn
+
+
+@pytest.fixture
+def slow_provider(monkeypatch):
+    """Turns take a second or more, long enough to act on one mid-stream."""
+    from app.main import groq_service
+
+    monkeypatch.setattr(groq_service.provider, "inter_token", 0.05)
+    return groq_service.provider
+
+
+def frames_until(websocket, *types: str) -> list:
+    frames = []
+    while not frames or frames[-1].get("type") not in types:
+        frames.append(websocket.receive_json())
+    return frames
+
+
+def test_malformed_frames_get_an_error_and_keep_the_socket_open(client):
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.receive_json()
+
+        websocket.send_text("{not json")
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_bytes(b"\x00\x01")
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_json(["not", "an", "object"])
+        assert websocket.receive_json()["message"] == "Invalid message format"
+
+        assert chat_turn(websocket, "still here?", str(uuid.uuid4()))[-1]["type"] == "completion"
+
+
+def test_cancel_frame_stops_the_turn(client, slow_provider):
+    session_id = str(uuid.uuid4())
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"message": f"tell me a long story {uuid.uuid4()}", "session_id": session_id,
+                             "request_id": "r1"})
+        frames_until(websocket, "token")
+
+        websocket.send_json({"type": "cancel", "request_id": "r1"})
+        frames = frames_until(websocket, "cancelled", "completion", "error")
+        assert frames[-1] == {"type": "cancelled", "session_id": session_id, "request_id": "r1"}
+
+        # The socket takes new turns after a cancel
+        slow_provider.inter_token = 0
+        assert chat_turn(websocket, "and now a short one", session_id)[-1]["type"] == "completion"
+
+
+def test_concurrent_turns_are_capped_per_connection(client, slow_provider):
+    from app.config import WS_MAX_CONCURRENT_GENERATIONS
+
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.receive_json()
+        request_ids = [f"r{n}" for n in range(WS_MAX_CONCURRENT_GENERATIONS + 1)]
+        for request_id in request_ids:
+            websocket.send_json({"message": f"question {uuid.uuid4()}", "session_id": str(uuid.uuid4()),
+                                 "request_id": request_id})
+
+        streaming, rejected = set(), []
+        while len(streaming) < WS_MAX_CONCURRENT_GENERATIONS or not rejected:
+            frame = websocket.receive_json()
+            if frame["type"] == "token":
+                streaming.add(frame["request_id"])
+            elif frame["type"] == "error":
+                rejected.append(frame)
+        assert streaming == set(request_ids[:-1])
+        assert [frame["request_id"] for frame in rejected] == request_ids[-1:]
+        assert "Too many concurrent generations" in rejected[0]["message"]
+
+        # Cancelling frees the slots
+        websocket.send_json({"type": "cancel"})
+        finished = set()
+        while len(finished) < WS_MAX_CONCURRENT_GENERATIONS:
+            frame = websocket.receive_json()
+            if frame["type"] == "cancelled":
+                finished.add(frame["request_id"])
+        slow_provider.inter_token = 0
+        assert chat_turn(websocket, "one more", str(uuid.uuid4()))[-1]["type"] == "completion"
+
+
+def compact_turn(websocket, message: str, session_id: str, receive=None) -> list:
+    receive = receive or websocket.receive_json
+    websocket.send_json({"message": message, "session_id": session_id})
+    frames = []
+    while not frames or frames[-1]["t"] not in ("c", "e", "x"):
+        frames.append(receive())
+    return frames
+
+
+def assert_compact_turn(frames: list, session_id: str):
+    declaration, received = frames[0], frames[1]
+    assert declaration["t"] == "s" and declaration["session_id"] == session_id
+    assert received == {"t": "a", "s": declaration["s"]}
+    tokens = [frame for frame in frames if frame["t"] == "k"]
+    assert tokens and all(frame["s"] == declaration["s"] for frame in tokens)
+    assert tokens[-1]["o"] == len("".join(frame["c"] for frame in tokens))
+    assert frames[-1] == {"t": "c", "s": declaration["s"]}
+
+
+def test_compact_encoding_from_the_query_string(client):
+    session_id = str(uuid.uuid4())
+    with client.websocket_connect("/ws/chat?protocol=compact") as websocket:
+        established = websocket.receive_json()
+        assert established["protocol"] == "compact" and "compact" in established["protocols"]
+        assert_compact_turn(compact_turn(websocket, "hello compact", session_id), session_id)
+
+
+def test_hello_frame_switches_the_encoding(client):
+    session_id = str(uuid.uuid4())
+    with client.websocket_connect("/ws/chat") as websocket:
+        assert websocket.receive_json()["protocol"] == "json"
+        websocket.send_json({"type": "hello", "protocol": "compact"})
+        assert websocket.receive_json() == {"type": "protocol_ack", "protocol": "compact"}
+        assert_compact_turn(compact_turn(websocket, "hello again", session_id), session_id)
+
+
+def test_unknown_encodings_fall_back_to_json(client):
+    session_id = str(uuid.uuid4())
+    with client.websocket_connect("/ws/chat?protocol=carrier-pigeon") as websocket:
+        assert websocket.receive_json()["protocol"] == "json"
+        websocket.send_json({"type": "hello", "protocol": "smoke-signals"})
+        assert websocket.receive_json() == {"type": "protocol_ack", "protocol": "json"}
+
+        frames = chat_turn(websocket, "plain please", session_id)
+        assert frames[0] == {"type": "message_received", "session_id": session_id, "request_id": frames[0]["request_id"]}
+        assert frames[-1]["type"] == "completion"
+
+
+def test_msgpack_frames_are_binary(client):
+    msgpack = pytest.importorskip("msgpack")
+    session_id = str(uuid.uuid4())
+    with client.websocket_connect("/ws/chat?protocol=msgpack") as websocket:
+        # The handshake frame is always JSON
+        assert websocket.receive_json()["protocol"] == "msgpack"
+        frames = compact_turn(websocket, "hello binary", session_id,
+                              receive=lambda: msgpack.unpackb(websocket.receive_bytes()))
+        assert_compact_turn(frames, session_id)
@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+
+from app.api.websockets.coalescer import TokenCoalescer
+
+
+async def burst(count: int):
+    for n in range(count):
+        yield f"t{n} "
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_first_token_goes_alone_then_tokens_are_batched():
+    coalescer = TokenCoalescer(window_ms=50, max_bytes=1024, enabled=True)
+    chunks = [chunk async for chunk in coalescer.coalesce(burst(20))]
+
+    assert chunks[0] == "t0 "
+    assert "".join(chunks) == "".join(f"t{n} " for n in range(20))
+    assert len(chunks) < 20
+    assert coalescer.stats.tokens == 20 and coalescer.stats.frames == len(chunks)
+
+
+@pytest.mark.asyncio
+async def test_disabled_coalescer_passes_tokens_through():
+    coalescer = TokenCoalescer(window_ms=50, enabled=False)
+    assert [chunk async for chunk in coalescer.coalesce(burst(3))] == ["t0 ", "t1 ", "t2 "]
@@ -0,0 +1,83 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.repositories.chat_repository import ChatRepository
+from app.models.chat import ChatMessage
+from app.services.chat_service import ChatService
+from app.services.compaction import ConversationCompactor
+from app.services.context_builder import ContextBuilder
+
+
+class RecordingGroqService:
+    def __init__(self):
+        self.calls = []
+
+    async def get_completion(self, prompt, **kwargs):
+        self.calls.append({"prompt": prompt, **kwargs})
+        return f"summary {len(self.calls)}"
+
+
+@pytest.fixture
+def chat_service_scope(db_engine):
+    @asynccontextmanager
+    async def scope():
+        async with AsyncSession(db_engine) as db:
+            yield ChatService(ChatRepository(db))
+
+    return scope
+
+
+async def write(chat_service_scope, count: int, words: int = 1):
+    async with chat_service_scope() as chat_service:
+        for n in range(count):
+            await chat_service.save_message(ChatMessage(
+                session_id="s1", user_id="owner", is_user=n % 2 == 0, content=f"message{n} " * words,
+                created_at=datetime(2026, 1, 1, 0, 0, n)
+            ))
+
+
+@pytest.mark.asyncio
+async def test_summaries_are_charged_to_the_session_owner(chat_service_scope):
+    groq_service = RecordingGroqService()
+    compactor = ConversationCompactor(groq_service, chat_service_scope, ContextBuilder(), keep_recent=2)
+    await write(chat_service_scope, 5)
+
+    summary = await compactor.compact("s1")
+    assert summary.content == "summary 1" and summary.summary_until == datetime(2026, 1, 1, 0, 0, 2)
+    assert groq_service.calls[0]["user_id"] == "owner" and groq_service.calls[0]["session_id"] == "s1"
+    assert "message2" in groq_service.calls[0]["prompt"] and "message3" not in groq_service.calls[0]["prompt"]
+
+
+@pytest.mark.asyncio
+async def test_nothing_before_the_kept_tail_means_no_request(chat_service_scope):
+    groq_service = RecordingGroqService()
+    compactor = ConversationCompactor(groq_service, chat_service_scope, ContextBuilder(), keep_recent=4)
+    await write(chat_service_scope, 4)
+
+    assert await compactor.compact("s1") is None
+    assert await compactor.compact("missing") is None
+    assert groq_service.calls == []
+
+
+@pytest.mark.asyncio
+async def test_long_spans_are_folded_in_chunks(chat_service_scope):
+    groq_service = RecordingGroqService()
+    compactor = ConversationCompactor(groq_service, chat_service_scope, ContextBuilder(), keep_recent=1,
+                                      chunk_max_tokens=60)
+    # Each message is about 25 tokens, so two fit in a chunk
+    await write(chat_service_scope, 6, words=10)
+
+    summary = await compactor.compact("s1")
+    assert len(groq_service.calls) == 3
+    assert summary.content == "summary 3" and summary.summary_until == datetime(2026, 1, 1, 0, 0, 4)
+    # Each request carries its own chunk on top of the summary before it
+    assert "message0" in groq_service.calls[0]["prompt"] and "message2" not in groq_service.calls[0]["prompt"]
+    assert "summary 1" in groq_service.calls[1]["prompt"] and "message0" not in groq_service.calls[1]["prompt"]
+    assert "message4" in groq_service.calls[2]["prompt"]
+
+    async with chat_service_scope() as chat_service:
+        latest = await chat_service.get_latest_summary("s1")
+    assert latest.content == "summary 3"
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from app.services.completion_cache import (
+    MemoryCompletionCache,
+    SQLiteCompletionCache,
+    completion_cache_key,
+    replay_completion,
+)
+
+
+def test_key_normalizes_the_prompt_but_not_the_context():
+    assert completion_cache_key("Hello  world", "m", 0.7) == completion_cache_key("hello world ", "m", 0.7)
+    assert completion_cache_key("hi", "m", 0.7) != completion_cache_key("hi", "m", 0.7, [{"role": "user", "content": "x"}])
+    assert completion_cache_key("hi", "m", 0.7) != completion_cache_key("hi", "other", 0.7)
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_evicts_least_recently_used_and_expires():
+    cache = MemoryCompletionCache(ttl_seconds=0.05, max_entries=2, max_bytes=1000)
+    await cache.set("a", "1")
+    await cache.set("b", "2")
+    assert await cache.get("a") == "1"
+    await cache.set("c", "3")
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "1"
+
+    await asyncio.sleep(0.1)
+    assert await cache.get("a") is None
+    assert cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_oversized_values_are_not_stored():
+    cache = MemoryCompletionCache(max_bytes=4)
+    await cache.set("a", "too long")
+    assert await cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_survives_a_restart_and_stays_bounded(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCompletionCache(path=path, max_entries=2)
+    for key in ("a", "b", "c"):
+        await cache.set(key, f"value {key}")
+
+    reopened = SQLiteCompletionCache(path=path, max_entries=2)
+    assert await reopened.get("a") is None
+    assert await reopened.get("c") == "value c"
+
+
+@pytest.mark.asyncio
+async def test_replay_yields_the_text_in_chunks():
+    chunks = [chunk async for chunk in replay_completion("abcdefghij", chunk_chars=4, delay_ms=0)]
+    assert chunks == ["abcd", "efgh", "ij"]
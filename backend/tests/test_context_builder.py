@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from app.models.chat import SUMMARY_KIND, ChatMessage
+from app.services.context_builder import ContextBuilder, SUMMARY_PREFIX
+
+
+class History:
+    """Stored messages per session, counting loads."""
+
+    def __init__(self, **sessions):
+        self.sessions = sessions
+        self.loads = []
+
+    async def __call__(self, session_id, limit):
+        self.loads.append(session_id)
+        return self.sessions.get(session_id, [])[-limit:]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    class _Time:
+        offset = 0.0
+
+        @classmethod
+        def monotonic(cls):
+            return time.monotonic() + cls.offset
+
+        perf_counter = staticmethod(time.perf_counter)
+
+    monkeypatch.setattr("app.services.context_builder.time", _Time)
+    return _Time
+
+
+def message(content: str, is_user: bool = True, **kwargs) -> ChatMessage:
+    return ChatMessage(session_id="s", content=content, is_user=is_user, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_sessions_are_evicted_past_the_cap():
+    builder = ContextBuilder(max_sessions=2)
+    history = History()
+    for session_id in ("a", "b", "a", "c", "a", "b"):
+        await builder.build(session_id, message(f"to {session_id}"), history)
+
+    # b was the least recently used when c arrived
+    assert history.loads == ["a", "b", "c", "b"]
+    assert len(builder) == 2 and builder.hits == 2
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_reloaded(clock):
+    builder = ContextBuilder(idle_seconds=60)
+    history = History(s=[message("stored question"), message("stored answer", is_user=False)])
+
+    await builder.build("s", message("first"), history)
+    clock.offset += 59
+    assert await builder.build("s", message("second"), history) == [
+        {"role": "user", "content": "stored question"},
+        {"role": "assistant", "content": "stored answer"},
+        {"role": "user", "content": "first"},
+    ]
+    assert history.loads == ["s"]
+
+    clock.offset += 61
+    builder.record_reply("s", "dropped while idle")
+    await builder.build("s", message("third"), history)
+    assert history.loads == ["s", "s"]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_pins_the_summary_and_trims_to_the_budget():
+    current = message("x" * 40, id="current")
+    history = History(s=[
+        message("the story so far", is_user=False, kind=SUMMARY_KIND),
+        message("old " * 40),
+        message("recent question"),
+        current,
+    ])
+    builder = ContextBuilder(token_budget=30)
+
+    assert await builder.build("s", current, history) == [
+        {"role": "system", "content": SUMMARY_PREFIX + "the story so far"},
+        {"role": "user", "content": "recent question"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_long_sessions_ask_for_compaction():
+    builder = ContextBuilder(compaction_threshold=20)
+    requested = []
+    builder.on_compaction_needed = requested.append
+
+    await builder.build("s", message("short"), History())
+    builder.record_reply("s", "short reply")
+    assert requested == []
+    builder.record_reply("s", "a much longer reply " * 5)
+    assert requested == ["s"]
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from app.services.completion_cache import MemoryCompletionCache
+from app.services.groq_service import GroqService
+
+
+class CountingProvider:
+    """Wraps the configured (mock) provider, counting upstream requests by model."""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.models = []
+
+    async def complete(self, messages, model, temperature, max_tokens, on_usage=None):
+        self.models.append(model)
+        return await self.provider.complete(messages, model, temperature, max_tokens, on_usage)
+
+    def stream(self, messages, model, temperature, max_tokens, on_usage=None):
+        self.models.append(model)
+        return self.provider.stream(messages, model, temperature, max_tokens, on_usage)
+
+    def is_retryable(self, error):
+        return self.provider.is_retryable(error)
+
+
+def cached_service() -> GroqService:
+    service = GroqService()
+    service.rate_limiter = None
+    service.single_flight = None
+    service.completion_cache = MemoryCompletionCache()
+    service.provider = CountingProvider(service.provider)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_cache_key_includes_max_tokens():
+    service = cached_service()
+    await service.get_completion("a question", max_tokens=16)
+    await service.get_completion("a question", max_tokens=16)
+    assert len(service.provider.models) == 1
+
+    await service.get_completion("a question", max_tokens=512)
+    assert len(service.provider.models) == 2
+
+
+@pytest.mark.asyncio
+async def test_fallback_answers_are_not_cached():
+    service = cached_service()
+    breaker = service.resilience.breaker
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic()
+
+    await service.get_completion("a question")
+    assert [token async for token in service.stream_completion("another question")]
+    assert service.provider.models == [service.resilience.fallback_model] * 2
+
+    breaker.record_success()
+    await service.get_completion("a question")
+    assert [token async for token in service.stream_completion("another question")]
+    assert service.provider.models[2:] == [service.model] * 2
+
+    # Primary answers are cached
+    await service.get_completion("a question")
+    assert [token async for token in service.stream_completion("another question")]
+    assert len(service.provider.models) == 4
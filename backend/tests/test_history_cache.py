@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.repositories.chat_repository import ChatRepository
+from app.models.chat import ChatMessage
+from app.services.chat_service import ChatService
+from app.services.history_cache import HistoryCache, message_bytes
+
+
+class CountingRepository(ChatRepository):
+    def __init__(self, db):
+        super().__init__(db)
+        self.loads = []
+
+    async def get_recent_messages(self, session_id, limit, after=None):
+        self.loads.append(limit)
+        return await super().get_recent_messages(session_id, limit, after)
+
+
+def make_message(n: int, session_id: str = "s1") -> ChatMessage:
+    return ChatMessage(id=f"m{n:04d}", session_id=session_id, is_user=n % 2 == 0, content=f"message {n}",
+                       created_at=datetime(2026, 1, 1, 0, n // 60, n % 60))
+
+
+def test_entries_are_bounded_by_count_and_charged_an_overhead():
+    cache = HistoryCache(max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        cache.end_fill(session_id, cache.begin_fill(session_id), [make_message(1, session_id)], None, True)
+
+    assert len(cache) == 2 and cache.get("a") is None
+    assert cache.size > 2 * message_bytes(make_message(1))
+
+
+def test_empty_sessions_are_not_cached():
+    cache = HistoryCache()
+    entry = cache.end_fill("unknown", cache.begin_fill("unknown"), [], None, True)
+
+    assert entry.messages == [] and entry.complete
+    assert len(cache) == 0 and cache.size == 0
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl():
+    cache = HistoryCache(ttl=0.05)
+    cache.end_fill("s1", cache.begin_fill("s1"), [make_message(1)], None, True)
+    assert cache.get("s1") is not None
+
+    await asyncio.sleep(0.1)
+    cache.append(make_message(2))
+    assert cache.get("s1") is None
+    assert len(cache) == 0 and cache.size == 0
+
+
+@pytest.mark.asyncio
+async def test_a_miss_loads_only_what_the_read_needs(db_engine):
+    async with AsyncSession(db_engine) as db:
+        repository = CountingRepository(db)
+        await repository.add_messages([make_message(n) for n in range(200)])
+        service = ChatService(repository, history_cache=HistoryCache(max_messages=500))
+
+        recent = await service.get_recent_history("s1", 20)
+        assert [message.id for message in recent] == [f"m{n:04d}" for n in range(180, 200)]
+        assert repository.loads == [21]
+
+        # Served from the partial entry
+        await service.get_recent_history("s1", 20)
+        assert repository.loads == [21]
+
+        # Reading past it loads the session in full, once
+        page = await service.get_history_page("s1", 50)
+        assert [message.id for message in page] == [f"m{n:04d}" for n in range(50)]
+        await service.get_history_page("s1", 50)
+        assert repository.loads == [21, 501]
+
+
+@pytest.mark.asyncio
+async def test_reads_of_unknown_sessions_leave_no_entry(db_engine):
+    async with AsyncSession(db_engine) as db:
+        cache = HistoryCache()
+        service = ChatService(ChatRepository(db), history_cache=cache)
+
+        for _ in range(3):
+            assert await service.get_history_page("missing", 50) == []
+        assert len(cache) == 0
@@ -0,0 +1,63 @@
+import json
+import uuid
+
+import pytest
+
+from app.utils.pagination import decode_cursor, encode_cursor
+from tests.conftest import chat_turn, signup
+
+
+@pytest.fixture(scope="module")
+def conversation(client):
+    """A signed-in user's session of three turns (six messages)."""
+    user = signup(client)
+    session_id = str(uuid.uuid4())
+    with client.websocket_connect(f"/ws/chat?token={user['token']}") as websocket:
+        websocket.receive_json()
+        for n in range(3):
+            assert chat_turn(websocket, f"question {n}", session_id)[-1]["type"] == "completion"
+    return user, session_id
+
+
+def test_cursor_round_trip_and_rejects_garbage(client, conversation):
+    user, session_id = conversation
+    cursor = json.loads(client.get(f"/api/chats/{session_id}/messages", params={"limit": 1},
+                                   headers=user["headers"]).text)["next_cursor"]
+    assert encode_cursor(*decode_cursor(cursor)) == cursor
+
+    response = client.get(f"/api/chats/{session_id}/messages", params={"cursor": "not-a-cursor"},
+                          headers=user["headers"])
+    assert response.status_code == 400
+
+
+def test_pages_walk_every_message_once(client, conversation):
+    user, session_id = conversation
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 4, **({"cursor": cursor} if cursor else {})}
+        page = client.get(f"/api/chats/{session_id}/messages", params=params, headers=user["headers"]).json()
+        seen.extend(message["id"] for message in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == len(set(seen)) == 6
+
+
+def test_ndjson_export_matches_the_pages(client, conversation):
+    user, session_id = conversation
+    url = f"/api/chats/{session_id}/messages"
+    exported = [json.loads(line) for line in
+                client.get(url, params={"format": "ndjson"}, headers=user["headers"]).text.splitlines()]
+    paged = client.get(url, params={"limit": 500}, headers=user["headers"]).json()["items"]
+
+    assert [row["id"] for row in exported] == [row["id"] for row in paged]
+    assert [row["content"] for row in exported][::2] == ["question 0", "question 1", "question 2"]
+
+
+def test_unknown_session_is_404_in_every_format(client, conversation):
+    user, _ = conversation
+    for format in ("json", "ndjson"):
+        response = client.get(f"/api/chats/{uuid.uuid4()}/messages", params={"format": format},
+                              headers=user["headers"])
+        assert response.status_code == 404
@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from app.services.llm_providers import MockProvider, ProviderUnavailableError
+
+MESSAGES = [{"role": "user", "content": "what is the plan"}]
+
+
+async def outcome(provider: MockProvider) -> str:
+    try:
+        return "".join([token async for token in provider.stream(MESSAGES, "model", 0.7, 50)])
+    except ProviderUnavailableError:
+        return "error"
+
+
+@pytest.mark.asyncio
+async def test_same_messages_same_answer_within_the_length_bounds():
+    provider = MockProvider(ttft_ms=0, inter_token_ms=0, min_tokens=5, max_tokens=12)
+    usage = []
+    first = [token async for token in provider.stream(MESSAGES, "model", 0.7, 50, on_usage=usage.append)]
+
+    assert first == provider.response_tokens(MESSAGES)
+    assert 5 <= len(first) <= 12
+    assert await provider.complete(MESSAGES, "model", 0.7, 50) == "".join(first)
+    assert usage[0].completion_tokens == len(first) and usage[0].prompt_tokens == 4
+    assert len(provider.response_tokens(MESSAGES, max_tokens=3)) == 3
+
+
+@pytest.mark.asyncio
+async def test_latency_models_time_to_first_token_and_token_gaps():
+    provider = MockProvider(ttft_ms=50, inter_token_ms=10, min_tokens=6, max_tokens=6)
+    start = time.perf_counter()
+    arrivals = [time.perf_counter() - start async for _ in provider.stream(MESSAGES, "model", 0.7, 50)]
+
+    assert len(arrivals) == 6
+    assert arrivals[0] >= 0.045
+    assert arrivals[-1] - arrivals[0] >= 5 * 0.009
+
+    start = time.perf_counter()
+    await provider.complete(MESSAGES, "model", 0.7, 50)
+    assert time.perf_counter() - start >= 0.045 + 5 * 0.009
+
+
+@pytest.mark.asyncio
+async def test_injected_errors_are_retryable_and_follow_the_seed():
+    always = MockProvider(ttft_ms=0, inter_token_ms=0, error_rate=1.0)
+    with pytest.raises(ProviderUnavailableError) as failed:
+        await always.complete(MESSAGES, "model", 0.7, 50)
+    assert always.is_retryable(failed.value)
+    assert await outcome(always) == "error"
+
+    runs = []
+    for _ in range(2):
+        provider = MockProvider(ttft_ms=0, inter_token_ms=0, error_rate=0.5, seed=7)
+        runs.append([await outcome(provider) for _ in range(20)])
+    assert runs[0] == runs[1]
+    assert 0 < runs[0].count("error") < 20
@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.models.chat import ChatMessage
+from app.services.message_write_queue import MessageWriteQueue, WriteQueueFullError
+
+
+class FakeDatabaseQueue(MessageWriteQueue):
+    """Writes to a list instead of the database, with injectable latency and failures."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("flush_interval_ms", 10)
+        super().__init__(**kwargs)
+        self.saved = []
+        self.delay = 0.0
+        self.down = False
+        self.poisoned = set()
+
+    async def _insert(self, batch):
+        await asyncio.sleep(self.delay)
+        if self.down or any(message.id in self.poisoned for message in batch):
+            raise RuntimeError("insert failed")
+        self.saved.extend(batch)
+
+
+def make_message(n: int, session_id: str = "s1") -> ChatMessage:
+    return ChatMessage(id=f"m{n}", session_id=session_id, is_user=True, content=f"message {n}",
+                       created_at=datetime(2026, 1, 1, 0, 0, n))
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_the_flush_in_progress():
+    queue = FakeDatabaseQueue()
+    queue.delay = 0.2
+    await queue.start()
+    for n in range(5):
+        await queue.enqueue(make_message(n))
+
+    await asyncio.sleep(0.05)  # the background flush is now inside its insert
+    await queue.stop()
+
+    assert [message.id for message in queue.saved] == [f"m{n}" for n in range(5)]
+    assert queue.pending_for_session("s1") == []
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_keeps_its_rows():
+    queue = FakeDatabaseQueue()
+    queue.delay = 1.0
+    for n in range(3):
+        await queue.enqueue(make_message(n))
+
+    flush = asyncio.create_task(queue.flush())
+    await asyncio.sleep(0.05)
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+
+    assert len(queue.pending_for_session("s1")) == 3
+    queue.delay = 0
+    assert await queue.flush() == 3
+
+
+@pytest.mark.asyncio
+async def test_failing_row_is_isolated_and_dropped_after_max_retries():
+    queue = FakeDatabaseQueue(max_retries=2)
+    queue.poisoned = {"m2"}
+    for n in range(5):
+        await queue.enqueue(make_message(n))
+
+    await queue.flush()
+    assert sorted(message.id for message in queue.saved) == ["m0", "m1", "m3", "m4"]
+    assert [message.id for message in queue.pending_for_session("s1")] == ["m2"]
+
+    await queue.enqueue(make_message(5))
+    await queue.flush()
+    assert [message.id for message in queue.dead_letters] == ["m2"]
+    assert "m5" in {message.id for message in queue.saved}
+    assert queue.pending_for_session("s1") == []
+
+
+@pytest.mark.asyncio
+async def test_outage_drops_nothing():
+    queue = FakeDatabaseQueue(max_retries=1)
+    queue.down = True
+    for n in range(4):
+        await queue.enqueue(make_message(n))
+
+    for _ in range(5):
+        assert await queue.flush() == 0
+    assert not queue.dead_letters
+    assert len(queue.pending_for_session("s1")) == 4
+
+    queue.down = False
+    assert await queue.flush() == 4
+
+
+@pytest.mark.asyncio
+async def test_enqueue_waits_for_room_then_fails_while_writes_fail():
+    queue = FakeDatabaseQueue(max_pending=3, enqueue_timeout_ms=50)
+    queue.down = True
+    await queue.start()
+    for n in range(3):
+        await queue.enqueue(make_message(n))
+
+    with pytest.raises(WriteQueueFullError):
+        await queue.enqueue(make_message(3))
+    assert len(queue.pending_for_session("s1")) == 3
+
+    queue.down = False
+    await queue.stop()
+    assert len(queue.saved) == 3
+
+
+@pytest.mark.asyncio
+async def test_enqueue_resumes_once_a_flush_makes_room():
+    queue = FakeDatabaseQueue(max_pending=2, enqueue_timeout_ms=2000)
+    queue.delay = 0.05
+    await queue.start()
+    for n in range(5):
+        await queue.enqueue(make_message(n))
+    await queue.stop()
+
+    assert len(queue.saved) == 5
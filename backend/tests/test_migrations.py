@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, MetaData, String, Table, Text, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.migrations import LATEST_VERSION, run_migrations
+
+
+def initial_schema() -> MetaData:
+    """The tables as create_all made them before versioning existed (version 0)."""
+    metadata = MetaData()
+    Table("users", metadata,
+          Column("id", String, primary_key=True, index=True),
+          Column("email", String, unique=True, index=True, nullable=False),
+          Column("hashed_password", String, nullable=False),
+          Column("is_active", Boolean),
+          Column("created_at", DateTime))
+    Table("chat_sessions", metadata,
+          Column("id", String, primary_key=True, index=True),
+          Column("user_id", String, index=True),
+          Column("created_at", DateTime),
+          Column("updated_at", DateTime))
+    Table("chat_messages", metadata,
+          Column("id", String, primary_key=True, index=True),
+          Column("session_id", String, ForeignKey("chat_sessions.id")),
+          Column("user_id", String, index=True),
+          Column("is_user", Boolean),
+          Column("content", Text),
+          Column("created_at", DateTime))
+    return metadata
+
+
+def snapshot(conn) -> dict:
+    inspector = inspect(conn)
+    return {
+        table: (
+            sorted((c["name"], str(c["type"]), c["nullable"], c["default"]) for c in inspector.get_columns(table)),
+            sorted(index["name"] for index in inspector.get_indexes(table)),
+        )
+        for table in inspector.get_table_names()
+    }
+
+
+@pytest.mark.asyncio
+async def test_upgraded_schema_matches_a_fresh_one(tmp_path, db_engine):
+    old = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+    async with old.begin() as conn:
+        await conn.run_sync(initial_schema().create_all)
+        await conn.execute(text(
+            "INSERT INTO chat_messages (id, session_id, user_id, is_user, content, created_at) "
+            "VALUES ('m1', 's1', 'u1', 1, 'hello there', :created_at)"
+        ), {"created_at": datetime(2026, 1, 1)})
+
+    assert await run_migrations(old) == LATEST_VERSION
+    async with old.connect() as conn:
+        upgraded = await conn.run_sync(snapshot)
+        row = (await conn.execute(text("SELECT kind, search_rowid FROM chat_messages"))).one()
+        session = (await conn.execute(text("SELECT title, message_count FROM chat_sessions"))).one()
+    async with db_engine.connect() as conn:
+        fresh = await conn.run_sync(snapshot)
+    await old.dispose()
+
+    assert upgraded == fresh
+    assert tuple(row) == ("message", 1)
+    assert tuple(session) == ("hello there", 1)
+
+
+@pytest.mark.asyncio
+async def test_current_database_is_left_alone(db_engine):
+    assert await run_migrations(db_engine) == LATEST_VERSION
+
+
+@pytest.mark.asyncio
+async def test_newer_schema_is_refused(db_engine):
+    async with db_engine.begin() as conn:
+        await conn.execute(text("UPDATE schema_version SET version = :version"), {"version": LATEST_VERSION + 1})
+    with pytest.raises(RuntimeError):
+        await run_migrations(db_engine)
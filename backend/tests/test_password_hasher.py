@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+from app.utils.security import PasswordHasher, PasswordHasherBusyError
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_rejects_beyond_workers_and_queue():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    try:
+        results = await asyncio.gather(hasher.hash("one"), hasher.hash("two"), return_exceptions=True)
+    finally:
+        hasher.shutdown()
+
+    assert isinstance(results[0], str)
+    assert isinstance(results[1], PasswordHasherBusyError)
+    assert hasher.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_hashes_verify_off_the_event_loop():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    try:
+        hashed = await hasher.hash("correct horse")
+        assert await hasher.verify("correct horse", hashed)
+        assert not await hasher.verify("wrong horse", hashed)
+    finally:
+        hasher.shutdown()
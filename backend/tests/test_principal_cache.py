@@ -0,0 +1,123 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from jose import ExpiredSignatureError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.repositories.user_repository import UserRepository
+from app.models.user import DBUser
+from app.services.principal_cache import PrincipalCache, TokenRevokedError
+from tests.conftest import signup
+
+SECRET = "test-secret-key"
+
+
+def token(seconds: float = 60, jti: str = "j1") -> str:
+    return jwt.encode({"sub": "a@example.com", "jti": jti, "exp": int(time.time() + seconds)}, SECRET,
+                      algorithm="HS256")
+
+
+class Clock:
+    """Moves the cache's clock and the one jose checks exp against together."""
+
+    def __init__(self, monkeypatch):
+        self.offset = 0.0
+        clock = self
+
+        class _Time:
+            @staticmethod
+            def time():
+                return time.time() + clock.offset
+
+            @staticmethod
+            def monotonic():
+                return time.monotonic() + clock.offset
+
+        class _Datetime(datetime):
+            @classmethod
+            def utcnow(cls):
+                return datetime.utcnow() + timedelta(seconds=clock.offset)
+
+        monkeypatch.setattr("app.services.principal_cache.time", _Time)
+        monkeypatch.setattr("jose.jwt.datetime", _Datetime)
+
+    def advance(self, seconds: float):
+        self.offset += seconds
+
+
+def test_logout_revokes_the_token_even_while_it_is_cached(client):
+    user = signup(client)
+    assert client.get("/api/auth/me", headers=user["headers"]).status_code == 200
+
+    assert client.post("/api/auth/logout", headers=user["headers"]).json() == {"revoked": True}
+    assert client.get("/api/auth/me", headers=user["headers"]).status_code == 401
+    assert client.get("/api/chats", headers=user["headers"]).status_code == 401
+
+
+def test_revoked_tokens_are_refused_from_the_cache():
+    cache = PrincipalCache(enabled=True, token_ttl=60)
+    claims = cache.decode(token(), SECRET, "HS256")
+    assert cache.decode(token(), SECRET, "HS256") == claims
+    assert cache.token_hits == 1
+
+    assert cache.revoke(claims) == claims["exp"]
+    with pytest.raises(TokenRevokedError):
+        cache.decode(token(), SECRET, "HS256")
+
+
+def test_cached_claims_never_outlive_the_token(monkeypatch):
+    clock = Clock(monkeypatch)
+    cache = PrincipalCache(enabled=True, token_ttl=60)
+    short = token(seconds=30)
+    cache.decode(short, SECRET, "HS256")
+
+    clock.advance(20)
+    cache.decode(short, SECRET, "HS256")
+    assert cache.token_hits == 1
+
+    clock.advance(15)
+    with pytest.raises(ExpiredSignatureError):
+        cache.decode(short, SECRET, "HS256")
+    assert cache.token_misses == 2
+
+
+def test_a_lookup_that_raced_an_eviction_is_not_cached():
+    cache = PrincipalCache(enabled=True)
+    user = DBUser(id="u1", email="a@example.com", is_active=True)
+
+    generation = cache.generation()
+    cache.evict("a@example.com")
+    cache.put_principal("a@example.com", user, generation)
+    assert cache.get_principal("a@example.com") is None
+
+    cache.put_principal("a@example.com", user, cache.generation())
+    cached = cache.get_principal("a@example.com")
+    assert cached.id == "u1" and cached.hashed_password is None
+
+
+@pytest.mark.asyncio
+async def test_revocations_reach_other_workers_and_survive_a_restart(db_engine, monkeypatch):
+    clock = Clock(monkeypatch)
+    worker, other = PrincipalCache(sync_seconds=5), PrincipalCache(sync_seconds=5)
+    async with AsyncSession(db_engine) as db:
+        repository = UserRepository(db)
+        await other.sync_revocations(repository)
+        assert other.decode(token(), SECRET, "HS256")["jti"] == "j1"
+
+        claims = worker.decode(token(), SECRET, "HS256")
+        await repository.revoke_token("j1", worker.revoke(claims))
+
+        # Within the sync interval the other worker has not reloaded yet
+        await other.sync_revocations(repository)
+        other.decode(token(), SECRET, "HS256")
+        clock.advance(5)
+        await other.sync_revocations(repository)
+        with pytest.raises(TokenRevokedError):
+            other.decode(token(), SECRET, "HS256")
+
+        restarted = PrincipalCache()
+        await restarted.sync_revocations(repository)
+        with pytest.raises(TokenRevokedError):
+            restarted.decode(token(), SECRET, "HS256")
+        assert restarted.decode(token(jti="j2"), SECRET, "HS256")["jti"] == "j2"
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from app.services.rate_limiter import PRIORITY_BULK, PRIORITY_INTERACTIVE, RateLimitScheduler
+
+
+def drained(rpm: int = 600) -> RateLimitScheduler:
+    """A scheduler with no budget left, refilling one request every 60/rpm seconds."""
+    scheduler = RateLimitScheduler(rpm=rpm, tpm=10_000_000)
+    while scheduler.try_acquire(1):
+        pass
+    return scheduler
+
+
+@pytest.mark.asyncio
+async def test_failing_on_queued_callback_keeps_the_request_waiting():
+    scheduler = drained()
+
+    async def on_queued(queued, estimated_wait):
+        raise ConnectionError("socket closed")
+
+    waited = await asyncio.wait_for(scheduler.acquire("u1", 1, on_queued=on_queued), timeout=2)
+    assert waited > 0
+    assert scheduler.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_first_then_users_round_robin():
+    scheduler = drained()
+    order = []
+
+    async def request(name, user_key, priority):
+        await scheduler.acquire(user_key, 1, priority)
+        order.append(name)
+
+    tasks = [
+        asyncio.create_task(request("a1", "a", PRIORITY_BULK)),
+        asyncio.create_task(request("a2", "a", PRIORITY_BULK)),
+        asyncio.create_task(request("b1", "b", PRIORITY_BULK)),
+        asyncio.create_task(request("chat", "c", PRIORITY_INTERACTIVE)),
+    ]
+    await asyncio.wait_for(asyncio.gather(*tasks), timeout=5)
+    assert order == ["chat", "a1", "b1", "a2"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place():
+    scheduler = drained()
+    waiter = asyncio.create_task(scheduler.acquire("u1", 1))
+    await asyncio.sleep(0.01)
+    assert scheduler.queued == 1
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_retry_after_header_pauses_grants():
+    scheduler = RateLimitScheduler(rpm=600, tpm=10_000_000)
+    scheduler.update_from_headers({"retry-after": "0.3s"})
+
+    waited = await asyncio.wait_for(scheduler.acquire("u1", 1), timeout=2)
+    assert waited >= 0.25
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.services.resilience import CircuitBreaker, ResilientCaller
+
+
+class Unavailable(Exception):
+    pass
+
+
+def caller(**kwargs) -> ResilientCaller:
+    kwargs.setdefault("retry_base_ms", 1)
+    kwargs.setdefault("retry_max_ms", 1)
+    return ResilientCaller("primary", "fallback", is_retryable=lambda e: isinstance(e, Unavailable), **kwargs)
+
+
+def test_breaker_opens_after_threshold_and_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_call_retries_then_goes_to_the_fallback_once_the_breaker_opens():
+    resilient = caller(retry_attempts=5, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+    models = []
+
+    async def call(model):
+        models.append(model)
+        if model == "primary":
+            raise Unavailable()
+        return f"answer from {model}"
+
+    assert await resilient.call(call) == "answer from fallback"
+    assert models == ["primary", "primary", "fallback"]
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_are_raised_at_once():
+    resilient = caller(retry_attempts=5)
+    calls = 0
+
+    async def call(model):
+        nonlocal calls
+        calls += 1
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        await resilient.call(call)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_retries_only_before_the_first_token():
+    resilient = caller(retry_attempts=3)
+    opened = 0
+
+    async def tokens(fail_after):
+        for n in range(3):
+            if n == fail_after:
+                raise Unavailable()
+            yield f"t{n}"
+            await asyncio.sleep(0)
+
+    async def factory(model, hedge):
+        nonlocal opened
+        opened += 1
+        # The first attempt fails before any token, the second midway
+        return tokens(0 if opened == 1 else 2)
+
+    received = []
+    with pytest.raises(Unavailable):
+        async for token in resilient.stream(factory):
+            received.append(token)
+    assert received == ["t0", "t1"]
+    assert opened == 2
+
+
+@pytest.mark.asyncio
+async def test_a_probe_failing_with_a_non_retryable_error_lets_the_next_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.0)
+    breaker.record_failure()
+    resilient = caller(retry_attempts=0, breaker=breaker)
+
+    async def bad_request(model):
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        await resilient.call(bad_request)
+    assert breaker.state == "half_open" and not breaker.probing
+
+    async def factory(model, hedge):
+        async def tokens():
+            raise ValueError("bad request")
+            yield
+        return tokens()
+
+    with pytest.raises(ValueError):
+        async for _ in resilient.stream(factory):
+            pass
+    assert breaker.state == "half_open" and not breaker.probing
+
+    async def ok(model):
+        return model
+
+    assert await resilient.call(ok) == "primary"
+    assert breaker.state == "closed"
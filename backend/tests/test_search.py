@@ -0,0 +1,76 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.db.migrations import MIGRATIONS, run_migrations
+from app.db.repositories.chat_repository import ChatRepository
+from app.db.repositories.search_repository import SearchRepository
+from app.models.chat import ChatMessage
+from tests.conftest import chat_turn, signup
+
+
+def test_search_is_scoped_to_authenticated_writes(client):
+    owner, other = signup(client), signup(client)
+    with client.websocket_connect(f"/ws/chat?token={owner['token']}") as websocket:
+        websocket.receive_json()
+        assert chat_turn(websocket, "pineapple smoothie recipe", str(uuid.uuid4()))[-1]["type"] == "completion"
+    # Anonymous writes claiming the owner's id land as anonymous rows
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.receive_json()
+        chat_turn(websocket, "pineapple planted by someone else", str(uuid.uuid4()), user_id=owner["id"])
+
+    hits = client.get("/api/search", params={"q": "pineapple"}, headers=owner["headers"]).json()["items"]
+    assert [hit["snippet"] for hit in hits] == ["<mark>pineapple</mark> smoothie recipe"]
+    assert client.get("/api/search", params={"q": "pineapple"}, headers=other["headers"]).json()["items"] == []
+    assert client.get("/api/search", params={"q": "pineapple"}).status_code == 401
+
+
+def make_message(n: int, content: str, user_id: str = "u1") -> ChatMessage:
+    return ChatMessage(id=f"m{n:03d}", session_id="s1", user_id=user_id, is_user=True, content=content,
+                       created_at=datetime(2026, 1, 1, 0, 0, n))
+
+
+@pytest.mark.asyncio
+async def test_hits_point_at_the_right_messages_after_deletes_and_vacuum(db_engine):
+    async with AsyncSession(db_engine) as db:
+        await ChatRepository(db).add_messages([make_message(n, f"filler {n}") for n in range(20)])
+        await ChatRepository(db).add_messages([make_message(20, "needle in the haystack")])
+        await db.execute(text("DELETE FROM chat_messages WHERE id < 'm015'"))
+        await db.commit()
+
+    async with db_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM"))
+        await conn.execute(text("INSERT INTO chat_messages_fts (chat_messages_fts, rank) VALUES ('integrity-check', 1)"))
+
+    async with AsyncSession(db_engine) as db:
+        hits = await SearchRepository(db).search_messages("u1", "needle", 10)
+        assert [(hit.message_id, hit.snippet) for hit in hits] == [("m020", "<mark>needle</mark> in the haystack")]
+        hits = await SearchRepository(db).search_messages("u1", "filler", 10)
+        assert sorted((hit.message_id, hit.snippet) for hit in hits) == \
+            [(f"m{n:03d}", f"<mark>filler</mark> {n}") for n in range(15, 20)]
+
+
+@pytest.mark.asyncio
+async def test_upgrade_from_the_rowid_keyed_index(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+    # Build the migration 5 layout, then let run_migrations take it to the latest
+    async with engine.begin() as conn:
+        await conn.run_sync(MIGRATIONS[0].upgrade)
+        for migration in MIGRATIONS[1:5]:
+            await conn.run_sync(migration.upgrade)
+        await conn.execute(text("CREATE TABLE schema_version (version INTEGER NOT NULL)"))
+        await conn.execute(text("INSERT INTO schema_version (version) VALUES (5)"))
+    async with AsyncSession(engine) as db:
+        await ChatRepository(db).add_messages([make_message(1, "written before the upgrade")])
+
+    await run_migrations(engine)
+    async with AsyncSession(engine) as db:
+        await ChatRepository(db).add_messages([make_message(2, "written after the upgrade")])
+        hits = await SearchRepository(db).search_messages("u1", "upgrade", 10)
+        assert sorted(hit.message_id for hit in hits) == ["m001", "m002"]
+        assert (await db.execute(text("SELECT COUNT(*) FROM chat_messages WHERE search_rowid IS NULL"))).scalar() == 0
+    await engine.dispose()
@@ -0,0 +1,90 @@
+import uuid
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from tests.conftest import chat_turn, signup
+
+
+@pytest.fixture(scope="module")
+def owner(client):
+    return signup(client)
+
+
+@pytest.fixture(scope="module")
+def other(client):
+    return signup(client)
+
+
+@pytest.fixture(scope="module")
+def owned_session(client, owner):
+    session_id = str(uuid.uuid4())
+    with client.websocket_connect(f"/ws/chat?token={owner['token']}") as websocket:
+        websocket.receive_json()
+        frames = chat_turn(websocket, "hello from the owner", session_id)
+    assert frames[-1]["type"] == "completion"
+    return session_id
+
+
+def test_invalid_token_refuses_the_socket(client):
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect("/ws/chat?token=not-a-token") as websocket:
+            websocket.receive_json()
+    assert refused.value.code == 1008
+
+
+def test_user_id_in_frames_does_not_grant_ownership(client, owner, owned_session):
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.receive_json()
+        frames = chat_turn(websocket, "injected", owned_session, user_id=owner["id"])
+    assert frames[-1]["type"] == "error"
+    assert "another user" in frames[-1]["message"]
+
+
+def test_other_user_cannot_append(client, other, owned_session):
+    with client.websocket_connect(f"/ws/chat?token={other['token']}") as websocket:
+        websocket.receive_json()
+        frames = chat_turn(websocket, "injected", owned_session)
+    assert frames[-1]["type"] == "error"
+
+
+def test_anonymous_sessions_have_no_owner(client, other):
+    session_id = str(uuid.uuid4())
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.receive_json()
+        assert chat_turn(websocket, "anonymous", session_id, user_id=other["id"])[-1]["type"] == "completion"
+
+    listed = client.get("/api/chats", headers=other["headers"]).json()["items"]
+    assert session_id not in {session["id"] for session in listed}
+
+
+def test_signed_in_sockets_cannot_write_to_anonymous_sessions(client, other):
+    session_id = str(uuid.uuid4())
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.receive_json()
+        assert chat_turn(websocket, "anonymous", session_id)[-1]["type"] == "completion"
+
+    with client.websocket_connect(f"/ws/chat?token={other['token']}") as websocket:
+        websocket.receive_json()
+        frames = chat_turn(websocket, "claimed", session_id)
+    assert frames[-1]["type"] == "error" and "another user" in frames[-1]["message"]
+
+
+def test_session_list_requires_auth_and_is_scoped(client, owner, other, owned_session):
+    assert client.get("/api/chats").status_code == 401
+
+    owned = client.get("/api/chats", headers=owner["headers"]).json()["items"]
+    assert owned_session in {session["id"] for session in owned}
+    assert all(session["user_id"] == owner["id"] for session in owned)
+
+    assert client.get("/api/chats", headers=other["headers"]).json()["items"] == []
+
+
+def test_message_list_is_only_for_the_owner(client, owner, other, owned_session):
+    url = f"/api/chats/{owned_session}/messages"
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=other["headers"]).status_code == 404
+
+    messages = client.get(url, headers=owner["headers"]).json()["items"]
+    assert messages[0]["content"] == "hello from the owner"
+    assert all(message["user_id"] == owner["id"] for message in messages)
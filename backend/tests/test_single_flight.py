@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_upstream():
+    flight = SingleFlight()
+    started = 0
+    release = asyncio.Event()
+
+    async def upstream():
+        nonlocal started
+        started += 1
+        yield "a"
+        await release.wait()
+        yield "b"
+
+    async def consume():
+        return [token async for token in flight.stream("key", upstream)]
+
+    first = asyncio.create_task(consume())
+    await asyncio.sleep(0.01)
+    # Joins late and still gets the tokens emitted before it subscribed
+    second = asyncio.create_task(consume())
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await first == await second == ["a", "b"]
+    assert started == 1
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_upstream_is_cancelled_when_the_last_subscriber_leaves():
+    flight = SingleFlight()
+    closed = asyncio.Event()
+
+    async def upstream():
+        try:
+            while True:
+                yield "t"
+                await asyncio.sleep(0.01)
+        finally:
+            closed.set()
+
+    stream = flight.stream("key", upstream)
+    assert await stream.__anext__() == "t"
+    await stream.aclose()
+
+    await asyncio.wait_for(closed.wait(), timeout=1)
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_upstream_errors_reach_every_subscriber():
+    flight = SingleFlight()
+
+    async def upstream():
+        yield "a"
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream failed")
+
+    async def consume():
+        return [token async for token in flight.stream("key", upstream)]
+
+    results = await asyncio.gather(consume(), consume(), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+
+from app.api.websockets.protocol import CompactFrameEncoder
+from app.api.websockets.stream_pump import POLICY_DROP, StreamPump, StreamStats
+from app.utils.metrics import metrics
+from tests.conftest import signup
+
+
+async def upstream(count: int):
+    for n in range(count):
+        yield f"t{n} "
+        await asyncio.sleep(0)
+
+
+def counter(name: str) -> float:
+    return metrics.snapshot()["counters"].get(name, 0)
+
+
+@pytest.mark.asyncio
+async def test_disconnect_is_not_counted_as_a_slow_consumer():
+    async def send(chunk):
+        raise ConnectionError("client went away")
+
+    slow, failed = counter("ws.slow_consumers_dropped"), counter("ws.send_failures")
+    stats = StreamStats("c1")
+    text = await StreamPump(upstream(20), send, stats).run()
+
+    assert text == "".join(f"t{n} " for n in range(20))
+    assert stats.dropped
+    assert counter("ws.slow_consumers_dropped") == slow
+    assert counter("ws.send_failures") == failed + 1
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_drops_a_slow_consumer():
+    async def send(chunk):
+        await asyncio.sleep(0.05)
+
+    slow = counter("ws.slow_consumers_dropped")
+    stats = StreamStats("c2")
+    text = await StreamPump(upstream(50), send, stats, maxsize=2, policy=POLICY_DROP).run()
+
+    assert text == "".join(f"t{n} " for n in range(50))
+    assert stats.dropped
+    assert counter("ws.slow_consumers_dropped") == slow + 1
+
+
+def test_compact_stream_ids_are_forgotten_after_the_final_frame():
+    encoder = CompactFrameEncoder()
+    for n in range(100):
+        frames = [json.loads(frame) for frame in encoder.encode({"type": "token", "content": "x",
+                                                                 "session_id": "s1", "request_id": f"r{n}"})]
+        assert frames[0] == {"t": "s", "s": n + 1, "session_id": "s1", "request_id": f"r{n}"}
+        encoder.encode({"type": "completion", "session_id": "s1", "request_id": f"r{n}"})
+    assert encoder._stream_ids == {}
+
+
+def test_compact_stream_ids_are_not_reused_while_streams_overlap():
+    encoder = CompactFrameEncoder()
+
+    def stream_id(payload):
+        return json.loads(encoder.encode(payload)[-1])["s"]
+
+    first = stream_id({"type": "token", "content": "a", "session_id": "s1", "request_id": "r1"})
+    second = stream_id({"type": "token", "content": "b", "session_id": "s1", "request_id": "r2"})
+    stream_id({"type": "cancelled", "session_id": "s1", "request_id": "r1"})
+    third = stream_id({"type": "token", "content": "c", "session_id": "s1", "request_id": "r3"})
+
+    assert len({first, second, third}) == 3
+    assert stream_id({"type": "token", "content": "d", "session_id": "s1", "request_id": "r2"}) == second
+
+
+def test_metrics_are_for_admins_and_do_not_name_sessions(client, monkeypatch):
+    admin, user = signup(client), signup(client)
+    email = client.get("/api/auth/me", headers=admin["headers"]).json()["user"]["email"]
+    monkeypatch.setattr("app.api.routes.auth.ADMIN_EMAILS", {email})
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers=user["headers"]).status_code == 403
+    with client.websocket_connect("/ws/chat") as websocket:
+        session_id = websocket.receive_json()["session_id"]
+        snapshot = client.get("/metrics", headers=admin["headers"])
+        assert snapshot.status_code == 200
+        assert snapshot.json()["connections"] and session_id not in snapshot.text
+
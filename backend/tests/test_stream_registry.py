@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from app.api.websockets.stream_registry import ResumableStream, StreamRegistry
+
+
+def test_resume_from_an_offset_until_it_is_evicted():
+    stream = ResumableStream("s1", "r1", capacity=3)
+    for token in ("ab", "cd", "ef"):
+        stream.append(token)
+    assert stream.since(3) == "def"
+    assert stream.since(6) == ""
+
+    stream.append("gh")
+    assert stream.since(1) is None
+    assert stream.since(2) == "cdefgh"
+
+
+@pytest.mark.asyncio
+async def test_subscribers_follow_live_tokens_until_finish():
+    registry = StreamRegistry(ttl_seconds=0.05)
+    stream = registry.start("s1", "r1", owner_id="u1")
+    live = stream.subscribe()
+    stream.append("a")
+    stream.append("b")
+    registry.finish(stream, "completed")
+
+    assert [token async for token in live] == ["a", "b"]
+    assert registry.get("s1") is stream
+    await asyncio.sleep(0.1)
+    assert registry.get("s1") is None
@@ -0,0 +1,99 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.services.usage_tracker import UsageTracker
+from tests.conftest import chat_turn, signup
+
+
+class SlowSessions:
+    """A session factory whose sessions take `delay` seconds to open."""
+
+    def __init__(self, engine, delay: float):
+        self.sessions = async_sessionmaker(engine)
+        self.delay = delay
+
+    def __call__(self):
+        factory = self
+
+        class _Session:
+            async def __aenter__(self):
+                await asyncio.sleep(factory.delay)
+                self.db = factory.sessions()
+                return await self.db.__aenter__()
+
+            async def __aexit__(self, *exc):
+                return await self.db.__aexit__(*exc)
+
+        return _Session()
+
+
+async def stored_requests(engine) -> int:
+    async with engine.connect() as conn:
+        return (await conn.execute(text("SELECT COALESCE(SUM(requests), 0) FROM usage_rollups"))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_keeps_its_rows(db_engine):
+    sessions = SlowSessions(db_engine, delay=10)
+    tracker = UsageTracker(session_factory=sessions, enabled=True)
+    tracker.record("u1", "s1", "model", 10, 20, 5.0)
+
+    flush = asyncio.create_task(tracker.flush())
+    await asyncio.sleep(0.05)
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+
+    assert tracker.stats()["pending_rows"] == 1
+    sessions.delay = 0
+    await tracker.flush()
+    assert await stored_requests(db_engine) == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_the_flush_in_progress(db_engine):
+    tracker = UsageTracker(session_factory=SlowSessions(db_engine, delay=0.2), flush_interval_seconds=0.01,
+                           enabled=True)
+    await tracker.start()
+    tracker.record("u1", "s1", "model", 10, 20, 5.0)
+    await asyncio.sleep(0.05)  # the background flush is now opening its session
+    tracker.record("u1", "s1", "model", 10, 20, 5.0)
+    await tracker.stop()
+
+    assert tracker.stats()["pending_rows"] == 0
+    assert await stored_requests(db_engine) == 2
+
+
+def test_usage_reports_require_auth(client):
+    user, other = signup(client), signup(client)
+    assert client.get(f"/api/usage/users/{user['id']}").status_code == 401
+    assert client.get(f"/api/usage/users/{user['id']}", headers=user["headers"]).status_code == 200
+    assert client.get(f"/api/usage/users/{user['id']}", headers=other["headers"]).status_code == 403
+    assert client.get("/api/usage/daily", headers=user["headers"]).status_code == 403
+    assert client.get("/api/usage/top-users", headers=user["headers"]).status_code == 403
+
+
+def test_session_usage_is_for_its_owner(client):
+    owner, other = signup(client), signup(client)
+    session_id = str(uuid.uuid4())
+    with client.websocket_connect(f"/ws/chat?token={owner['token']}") as websocket:
+        websocket.receive_json()
+        assert chat_turn(websocket, "hello", session_id)[-1]["type"] == "completion"
+
+    url = f"/api/usage/sessions/{session_id}"
+    assert client.get(url, headers=owner["headers"]).status_code == 200
+    assert client.get(url, headers=other["headers"]).status_code == 404
+
+
+def test_admins_read_everyone(client, monkeypatch):
+    admin, user = signup(client), signup(client)
+    email = client.get("/api/auth/me", headers=admin["headers"]).json()["user"]["email"]
+    monkeypatch.setattr("app.api.routes.auth.ADMIN_EMAILS", {email})
+
+    assert client.get(f"/api/usage/users/{user['id']}", headers=admin["headers"]).status_code == 200
+    assert client.get("/api/usage/daily", headers=admin["headers"]).status_code == 200
+    assert client.get("/api/usage/top-users", headers=admin["headers"]).status_code == 200
@@ -7,19 +7,25 @@ class WebSocketService {
       this.maxReconnectAttempts = 5;
       this.reconnectTimeout = null;
       this.status = 'disconnected';
+      // In-flight answer, so a reconnect can resume it instead of losing it
+      this.activeStream = null;
     }
   
     connect() {
       if (this.ws?.readyState === WebSocket.OPEN) return;
   
       try {
-        this.ws = new WebSocket(this.url);
+        // Signed-in users own the sessions they write; browsers cannot set
+        // headers on a WebSocket, so the token goes in the query string.
+        const token = localStorage.getItem('token');
+        this.ws = new WebSocket(token ? `${this.url}?token=${encodeURIComponent(token)}` : this.url);
         this.status = 'connecting';
   
         this.ws.onopen = () => {
           this.status = 'connected';
           this.reconnectAttempts = 0;
           this.emit('connect');
+          this.resumeActiveStream();
         };
   
         this.ws.onclose = () => {
@@ -63,16 +69,35 @@ class WebSocketService {
         
         case 'token':
           const content = data.content;
+          if (data.session_id && typeof data.offset === 'number') {
+            this.activeStream = { sessionId: data.session_id, offset: data.offset };
+          }
           if (content !== undefined && content !== null) {
             this.emit('token', content.toString());
           }
           break;
         
         case 'completion':
+        case 'cancelled':
+          this.activeStream = null;
           this.emit('completion');
           break;
         
+        case 'queued':
+          this.emit('queued', data);
+          break;
+
+        case 'resumed':
+          this.emit('resumed', data);
+          break;
+        
+        case 'resume_failed':
+          this.activeStream = null;
+          this.emit('resume_failed', data);
+          break;
+        
         case 'error':
+          this.activeStream = null;
           this.emit('error', data.message || 'An error occurred');
           break;
         
@@ -81,6 +106,15 @@ class WebSocketService {
       }
     }
   
+    resumeActiveStream() {
+      if (!this.activeStream) return;
+      this.send({
+        type: 'resume',
+        session_id: this.activeStream.sessionId,
+        offset: this.activeStream.offset
+      });
+    }
+  
     attemptReconnect() {
       if (this.reconnectAttempts >= this.maxReconnectAttempts) {
         console.log('Max reconnection attempts reached');